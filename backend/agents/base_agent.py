@@ -1,7 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple, Union
 import asyncio
+import inspect
 import logging
+import time
+from .llm_client import llm_client, LLMError, LLMResponseError, LLMTimeoutError, DeadlineExceeded
+from .llm_cache import llm_cache
+from .rate_limiter import rate_limiter
+from .circuit_breaker import circuit_breakers, CircuitOpenError
+from .metrics import agent_metrics
+from .deadline import current_deadline, DEFAULT_CALL_TIMEOUT
+from .cancellation import current_token
+from .cassette import cassette
+from .prompt_budget import prompt_budget
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -10,9 +22,13 @@ class BaseAgent(ABC):
     
     def __init__(self, name: str, api_key: str, model: str = "openai/gpt-4o"):
         self.name = name
+        self.role = name.lower()
         self.api_key = api_key
         self.model = model
         self.memory: List[Dict[str, Any]] = []
+        self.use_cache = True
+        # Extra models raced against `model` by `race_llm` (opt-in)
+        self.race_models: List[str] = []
         
     def add_to_memory(self, role: str, content: str):
         """Add a message to agent's memory"""
@@ -34,39 +50,344 @@ class BaseAgent(ABC):
         """Execute the agent's main task"""
         pass
     
-    async def call_llm(self, messages: List[Dict[str, str]], system_prompt: str = None) -> str:
-        """Call the LLM API"""
-        import httpx
-        import os
+    async def call_llm(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = None,
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+        use_cache: Optional[bool] = None,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        cache_if: Optional[Callable[[str], Union[bool, Awaitable[bool]]]] = None
+    ) -> str:
+        """Call the LLM API (`model` overrides the agent's model)
+        
+        When `on_token` is given the completion is streamed (`stream: true`) and
+        every content delta is forwarded to the callback as it arrives.
+        Identical requests are served from the response cache unless
+        `use_cache` (or `self.use_cache`) is False. Empty completions, and
+        those rejected by `cache_if` (e.g. unparseable), are not cached, so a
+        retry gets a fresh answer.
+        
+        Calls are queued by the shared rate limiter and retried on 429/5xx/
+        timeouts; an `LLMError` is raised once retries are exhausted. While the
+        model's circuit breaker is open, calls go to its fallback model (or
+        fail fast with `CircuitOpenError`).
+        
+        Each attempt is bounded by `timeout` (default 120s) and by the current
+        deadline (`deadline_scope`); `DeadlineExceeded` is raised when the
+        budget runs out.
+        
+        While a cancellation token is in scope (`cancellation_scope`), the call
+        (queueing, retries and the upstream request) is raced against it and
+        `RunCancelled` is raised as soon as it fires.
+        
+        Inside a traced run (`tracing.trace_scope`) the call is recorded as an
+        "llm" span with its queue time, time to first token, tokens and cost.
+        
+        Messages exceeding the model's context window are compacted
+        (`prompt_budget.fit_messages`) instead of being rejected upstream.
+        """
+        with tracing.span(self.role, kind="llm", model=model or self.model, stream=bool(on_token)):
+            return await self._call_llm(messages, system_prompt, on_token, use_cache, model, timeout, cache_if)
+    
+    async def _call_llm(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: Optional[str],
+        on_token: Optional[Callable[[str], Awaitable[None]]],
+        use_cache: Optional[bool],
+        model: Optional[str],
+        timeout: Optional[float],
+        cache_if: Optional[Callable[[str], Union[bool, Awaitable[bool]]]] = None
+    ) -> str:
+        token = current_token()
+        if token:
+            token.raise_if_cancelled()
         
         full_messages = []
         if system_prompt:
             full_messages.append({"role": "system", "content": system_prompt})
         full_messages.extend(messages)
         
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://openrouter.ai/api/v1/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "HTTP-Referer": os.environ.get('FRONTEND_URL', 'http://localhost:3000'),
-                        "X-Title": "Devora",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": full_messages
-                    },
-                    timeout=120.0
+        primary = model or self.model
+        # Oversized prompts are compacted rather than rejected by the provider
+        full_messages = prompt_budget.fit_messages(full_messages, primary)
+        payload = {
+            "model": primary,
+            "messages": full_messages
+        }
+        
+        if use_cache is None:
+            use_cache = self.use_cache
+        # A cassette must see every call, cache hits included
+        use_cache = use_cache and not cassette.active
+        cache_key = llm_cache.make_key(payload) if use_cache else None
+        
+        if cache_key:
+            cached = await llm_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"[{self.name}] LLM cache hit ({cache_key[:12]})")
+                agent_metrics.record_cache_hit(self.role, primary)
+                tracing.annotate(cache_hit=True)
+                if on_token:
+                    await on_token(cached)
+                return cached
+        
+        emitted = False
+        
+        async def forward(delta: str):
+            nonlocal emitted
+            emitted = True
+            await on_token(delta)
+        
+        model = primary
+        # Queue time is measured from here, after the cache lookup and prompt fitting
+        queued_at = time.perf_counter()
+        while True:
+            attempt_payload = {**payload, "model": model}
+            if model != primary:
+                # The fallback model may have a smaller context window
+                attempt_payload["messages"] = prompt_budget.fit_messages(payload["messages"], model)
+            try:
+                # A stream that already emitted tokens can't be replayed transparently
+                request = rate_limiter.run(
+                    self.api_key,
+                    model,
+                    lambda: self._attempt_llm(attempt_payload, forward if on_token else None, timeout, queued_at),
+                    retry_if=lambda error: not emitted
                 )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result["choices"][0]["message"]["content"]
-                else:
-                    logger.error(f"LLM API error: {response.status_code} - {response.text}")
-                    return f"Error: {response.status_code}"
-        except Exception as e:
-            logger.error(f"LLM call failed: {str(e)}")
-            return f"Error: {str(e)}"
+                # Cancelling the request closes the upstream connection and frees its slot
+                content = await (token.run(request) if token else request)
+                break
+            except LLMError as e:
+                fallback = circuit_breakers.fallback_for(model)
+                # A half-open breaker whose probes are taken rejects calls without being "open"
+                rejected = isinstance(e, CircuitOpenError) or circuit_breakers.get(model).is_open
+                if emitted or not fallback or model != primary or not rejected:
+                    logger.error(f"[{self.name}] LLM call failed: {type(e).__name__}: {str(e)}")
+                    raise
+                logger.warning(f"[{self.name}] Circuit open for {model}, falling back to {fallback}")
+                model = fallback
+        
+        if cache_key and await self._cacheable(content, cache_if):
+            # Fallback answers are cached under their own model
+            key = cache_key if model == primary else llm_cache.make_key({**payload, "model": model})
+            await llm_cache.set(key, content, model)
+        return content
+    
+    @staticmethod
+    async def _cacheable(content: str, cache_if: Optional[Callable[[str], Union[bool, Awaitable[bool]]]]) -> bool:
+        """Whether a completion may be cached: not empty, and accepted by `cache_if`"""
+        if not content.strip():
+            return False
+        if cache_if is None:
+            return True
+        try:
+            accepted = cache_if(content)
+            if inspect.isawaitable(accepted):
+                accepted = await accepted
+        except Exception:
+            return False
+        return bool(accepted)
+    
+    async def race_llm(
+        self,
+        messages: List[Dict[str, str]],
+        system_prompt: str = None,
+        validate: Optional[Callable[[str], Union[bool, Awaitable[bool]]]] = None,
+        use_cache: Optional[bool] = None
+    ) -> str:
+        """Send the same request to `model` and every `race_models` entry at once
+        
+        The first response accepted by `validate` wins and the other requests
+        are cancelled. If no response validates, the first one received is
+        returned; if every model fails, the primary model's error is raised.
+        Responses rejected by `validate` are not cached.
+        """
+        models = list(dict.fromkeys([self.model, *self.race_models]))
+        if len(models) == 1:
+            return await self.call_llm(messages, system_prompt, use_cache=use_cache, cache_if=validate)
+        
+        started = time.perf_counter()
+        tasks = {
+            asyncio.create_task(
+                self.call_llm(messages, system_prompt, use_cache=use_cache, model=model, cache_if=validate)
+            ): model
+            for model in models
+        }
+        errors: Dict[str, LLMError] = {}
+        unvalidated = None
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Ties go to the model listed first
+                for task in sorted(done, key=lambda t: models.index(tasks[t])):
+                    model = tasks[task]
+                    try:
+                        response = task.result()
+                    except LLMError as e:
+                        errors[model] = e
+                        continue
+                    try:
+                        valid = validate is None or validate(response)
+                        if inspect.isawaitable(valid):
+                            valid = await valid
+                    except Exception:
+                        valid = False
+                    if valid:
+                        logger.info(
+                            f"[{self.name}] Race won by {model} in "
+                            f"{(time.perf_counter() - started) * 1000:.0f}ms ({len(models)} models)"
+                        )
+                        return response
+                    logger.warning(f"[{self.name}] Race: {model} returned an invalid response")
+                    if unvalidated is None:
+                        unvalidated = response
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if unvalidated is not None:
+            return unvalidated
+        raise errors.get(self.model) or next(iter(errors.values()))
+    
+    async def _attempt_llm(
+        self,
+        payload: Dict[str, Any],
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+        timeout: Optional[float] = None,
+        queued_at: Optional[float] = None
+    ) -> str:
+        """One request through the model's circuit breaker
+        
+        Streams are judged on their time to first token, other calls on their
+        total latency. `queued_at` is when the call started waiting for the
+        rate limiter (perf_counter), recorded as the span's queue time.
+        """
+        deadline = current_deadline()
+        call_timeout = deadline.timeout(timeout or DEFAULT_CALL_TIMEOUT)
+        breaker = circuit_breakers.get(payload["model"])
+        breaker.acquire()
+        started = time.perf_counter()
+        first_token = None
+        
+        span = tracing.current_span()
+        if span is not None:
+            attempts = span.attributes.get("attempts", 0) + 1
+            span.set(attempts=attempts, model=payload["model"])
+            if attempts == 1 and queued_at is not None:
+                # Time spent in the rate limiter queue before the first request
+                span.set(queue_ms=round((started - queued_at) * 1000, 1))
+        
+        async def on_delta(delta: str):
+            nonlocal first_token
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            await on_token(delta)
+        
+        if on_token:
+            request = self._stream_llm(payload, on_delta, call_timeout)
+        else:
+            request = self._complete_llm(payload, call_timeout)
+        
+        try:
+            if deadline.bounded:
+                # httpx timeouts apply per read; the deadline bounds the whole call
+                try:
+                    content, usage = await asyncio.wait_for(request, call_timeout)
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"Call to {payload['model']} cut at the deadline ({call_timeout:.1f}s)")
+            else:
+                content, usage = await request
+        except LLMError as e:
+            if isinstance(e, LLMTimeoutError) and deadline.expired:
+                e = DeadlineExceeded(str(e))
+            latency = time.perf_counter() - started
+            breaker.record_failure(e, latency)
+            agent_metrics.record_call(self.role, payload["model"], latency, error=True)
+            tracing.annotate(last_error=f"{type(e).__name__}: {str(e)[:200]}")
+            raise e
+        except BaseException:
+            breaker.release()
+            raise
+        latency = time.perf_counter() - started
+        breaker.record_success(first_token if first_token is not None else latency)
+        usage = usage or self._estimate_usage(payload, content)
+        agent_metrics.record_call(self.role, payload["model"], latency, usage)
+        tracing.annotate(
+            latency_ms=round(latency * 1000, 1),
+            ttft_ms=round(first_token * 1000, 1) if first_token is not None else None,
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            estimated_usage=bool(usage.get("estimated")),
+            cost=tracing.cost_of(payload["model"], usage)
+        )
+        return content
+    
+    async def _complete_llm(
+        self,
+        payload: Dict[str, Any],
+        timeout: float = DEFAULT_CALL_TIMEOUT
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Request a completion, returning its content and token usage"""
+        if cassette.replaying:
+            return await cassette.replay_completion(self.role, payload)
+        started = time.perf_counter()
+        # OpenRouter only reports the cost when asked to
+        request = {**payload, "usage": {"include": True}}
+        result = await llm_client.chat_completion(self.api_key, request, timeout=timeout)
+        try:
+            content, usage = result["choices"][0]["message"]["content"] or "", result.get("usage")
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMResponseError(f"Unexpected completion format: {str(result)[:200]}") from e
+        if cassette.recording:
+            cassette.record(self.role, payload, content, usage, time.perf_counter() - started)
+        return content, usage
+    
+    async def _stream_llm(
+        self,
+        payload: Dict[str, Any],
+        on_token: Callable[[str], Awaitable[None]],
+        timeout: float = DEFAULT_CALL_TIMEOUT
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """Stream a completion, forwarding deltas and returning the full content and token usage"""
+        if cassette.replaying:
+            return await cassette.replay_stream(self.role, payload, on_token)
+        started = time.perf_counter()
+        # (offset, delta) of every chunk, kept when recording
+        timeline = [] if cassette.recording else None
+        parts = []
+        usage = None
+        # OpenRouter sends token usage in the last chunk when asked to
+        request = {**payload, "usage": {"include": True}}
+        async for chunk in llm_client.stream_chat_completion(self.api_key, request, timeout=timeout):
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                parts.append(delta)
+                if timeline is not None:
+                    timeline.append((time.perf_counter() - started, delta))
+                await on_token(delta)
+        content = "".join(parts)
+        if timeline is not None:
+            latency = time.perf_counter() - started
+            cassette.record(self.role, payload, content, usage, latency, timeline[0][0] if timeline else None, timeline)
+        return content, usage
+    
+    @staticmethod
+    def _estimate_usage(payload: Dict[str, Any], content: str) -> Dict[str, Any]:
+        """Rough token counts (~4 characters per token) when the API reports none"""
+        prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+        return {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(content) // 4,
+            "estimated": True
+        }
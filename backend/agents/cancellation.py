@@ -0,0 +1,140 @@
+from typing import Dict, Any, Optional, Awaitable, TypeVar
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RunCancelled(Exception):
+    """The run was cancelled (client gone or cancel endpoint), not an LLM failure"""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(f"Run cancelled: {reason}")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cooperative cancellation of one agentic run
+
+    `cancel()` is idempotent and keeps the first reason. LLM calls made while
+    the token is in scope (see `cancellation_scope`) are raced against it, so
+    cancelling closes the upstream request at once.
+    """
+
+    def __init__(self):
+        self._event = asyncio.Event()
+        self.reason: Optional[str] = None
+        self.cancelled_at: Optional[float] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Cancel the run, returning False if it already was"""
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self.cancelled_at = time.monotonic()
+        self._event.set()
+        return True
+
+    async def wait(self):
+        await self._event.wait()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RunCancelled(self.reason)
+
+    async def run(self, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable`, cancelling it and raising RunCancelled if the token fires first"""
+        task = asyncio.ensure_future(awaitable)
+        if self.cancelled:
+            task.cancel()
+        waiter = asyncio.ensure_future(self._event.wait())
+        try:
+            await asyncio.wait({task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            cut = not task.done()
+            if cut:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if cut or (self.cancelled and task.cancelled()):
+            raise RunCancelled(self.reason)
+        return task.result()
+
+
+_current: ContextVar[Optional[CancellationToken]] = ContextVar("agent_cancellation", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    """Cancellation token of the running task (tasks inherit it when created)"""
+    return _current.get()
+
+
+@contextmanager
+def cancellation_scope(token: Optional[CancellationToken]):
+    """Make `token` the current cancellation token"""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+class RunRegistry:
+    """Cancellation tokens of the runs executing in this process, by run id"""
+
+    def __init__(self):
+        self._runs: Dict[str, CancellationToken] = {}
+        self._started: Dict[str, float] = {}
+        self.cancelled = 0
+
+    def register(self, run_id: str, token: Optional[CancellationToken] = None) -> CancellationToken:
+        token = token or CancellationToken()
+        self._runs[run_id] = token
+        self._started[run_id] = time.monotonic()
+        return token
+
+    def unregister(self, run_id: str, token: Optional[CancellationToken] = None):
+        """Forget a finished run (only if `token` is still the registered one)"""
+        if token is not None and self._runs.get(run_id) is not token:
+            return
+        self._runs.pop(run_id, None)
+        self._started.pop(run_id, None)
+
+    def cancel(self, run_id: str, reason: str = "cancelled") -> bool:
+        """Cancel a running run, returning False if it is not running here"""
+        token = self._runs.get(run_id)
+        if token is None:
+            return False
+        if token.cancel(reason):
+            self.cancelled += 1
+            logger.info(f"[Runs] Cancelling {run_id}: {reason}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "active": len(self._runs),
+            "cancelled": self.cancelled,
+            "runs": [
+                {
+                    "run_id": run_id,
+                    "running_for_s": round(now - self._started[run_id], 1),
+                    "cancelling": token.cancelled,
+                    "reason": token.reason
+                }
+                for run_id, token in self._runs.items()
+            ]
+        }
+
+
+# Instance globale partagée par tous les runs du processus
+run_registry = RunRegistry()
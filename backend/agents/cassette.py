@@ -0,0 +1,193 @@
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+from datetime import datetime, timezone
+from pathlib import Path
+import asyncio
+import json
+import logging
+
+from .llm_client import LLMError
+from .llm_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+# Size of the chunks a non-streamed recording is replayed as a stream in
+REPLAY_CHUNK_CHARS = 16
+
+
+class CassetteMiss(LLMError):
+    """Replay found no recording for a request"""
+    pass
+
+
+class Cassette:
+    """Record/replay of LLM calls, for offline and deterministic benchmarks
+
+    In "record" mode every completion that reaches OpenRouter is appended to a
+    JSONL file with its timing (latency, first token, offset of each stream
+    chunk). In "replay" mode no request leaves the process: calls are served
+    from the file, matched on (model, messages) and, when the prompt changed
+    since the recording, on the next recording of the same agent role and
+    model. With `realtime` the recorded latencies are reproduced.
+    """
+
+    def __init__(self, mode: str = "off", path: Optional[str] = None, realtime: bool = False):
+        self.mode = "off"
+        self.path: Optional[Path] = None
+        self.realtime = realtime
+        self._by_key: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_role: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._cursors: Dict[Any, int] = {}
+        self.recorded = 0
+        self.replayed = 0
+        self.fallbacks = 0
+        self.misses = 0
+        self.configure(mode=mode, path=path)
+
+    def configure(self, mode: Optional[str] = None, path: Optional[str] = None, realtime: Optional[bool] = None):
+        """Switch mode/file (a replay cassette is loaded immediately)"""
+        if mode is not None:
+            mode = (mode or "off").lower()
+            if mode not in MODES:
+                raise ValueError(f"Unknown cassette mode '{mode}' (expected one of {', '.join(MODES)})")
+            self.mode = mode
+        if path is not None:
+            self.path = Path(path)
+        if realtime is not None:
+            self.realtime = realtime
+        if self.mode != "off" and self.path is None:
+            raise ValueError(f"A cassette path is required in {self.mode} mode")
+        if self.mode == "replay":
+            self.load()
+        elif self.mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            logger.warning(f"[Cassette] Recording LLM calls to {self.path}")
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Same key whether the call was streamed or not"""
+        return LLMResponseCache.make_key({"model": payload.get("model"), "messages": payload.get("messages")})
+
+    def load(self):
+        """Index the recordings of the cassette file"""
+        self._by_key.clear()
+        self._by_role.clear()
+        self._cursors.clear()
+        count = 0
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._by_key.setdefault(entry["key"], []).append(entry)
+                self._by_role.setdefault((entry.get("role"), entry.get("model")), []).append(entry)
+                count += 1
+        logger.warning(f"[Cassette] Replaying {count} recorded LLM call(s) from {self.path} (realtime={self.realtime})")
+
+    def record(
+        self,
+        role: str,
+        payload: Dict[str, Any],
+        content: str,
+        usage: Optional[Dict[str, Any]],
+        latency: float,
+        first_token: Optional[float] = None,
+        chunks: Optional[List[Tuple[float, str]]] = None
+    ):
+        """Append one completed call to the cassette"""
+        entry = {
+            "key": self.make_key(payload),
+            "role": role,
+            "model": payload.get("model"),
+            "stream": chunks is not None,
+            "content": content,
+            "usage": usage,
+            "latency": round(latency, 4),
+            "first_token": round(first_token, 4) if first_token is not None else None,
+            "chunks": [[round(offset, 4), delta] for offset, delta in chunks] if chunks is not None else None,
+            "recorded_at": datetime.now(timezone.utc).isoformat()
+        }
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.recorded += 1
+
+    def _next(self, index: Any, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Recordings of a key are served in order, then cycled (repeated benchmark runs)"""
+        cursor = self._cursors.get(index, 0)
+        self._cursors[index] = cursor + 1
+        return entries[cursor % len(entries)]
+
+    def take(self, role: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Recording answering a request, raising CassetteMiss if there is none"""
+        key = self.make_key(payload)
+        if key in self._by_key:
+            self.replayed += 1
+            return self._next(key, self._by_key[key])
+        entries = self._by_role.get((role, payload.get("model")))
+        if entries:
+            # The prompt changed since the recording: keep the call sequence of the role
+            self.replayed += 1
+            self.fallbacks += 1
+            return self._next((role, payload.get("model")), entries)
+        self.misses += 1
+        raise CassetteMiss(f"No recording for {role} on {payload.get('model')} in {self.path}")
+
+    async def replay_completion(self, role: str, payload: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        entry = self.take(role, payload)
+        if self.realtime:
+            await asyncio.sleep(entry.get("latency") or 0.0)
+        return entry["content"], entry.get("usage")
+
+    async def replay_stream(
+        self,
+        role: str,
+        payload: Dict[str, Any],
+        on_token: Callable[[str], Awaitable[None]]
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        entry = self.take(role, payload)
+        chunks = entry.get("chunks")
+        if chunks is None:
+            # Recorded without streaming: spread the content over the recorded latency
+            content = entry["content"]
+            parts = [content[i:i + REPLAY_CHUNK_CHARS] for i in range(0, len(content), REPLAY_CHUNK_CHARS)]
+            latency = entry.get("latency") or 0.0
+            chunks = [[latency * (i + 1) / len(parts), part] for i, part in enumerate(parts)]
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for offset, delta in chunks:
+            if self.realtime:
+                delay = started + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await on_token(delta)
+        return entry["content"], entry.get("usage")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "path": str(self.path) if self.path else None,
+            "realtime": self.realtime,
+            "recordings": sum(len(entries) for entries in self._by_key.values()),
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "fallbacks": self.fallbacks,
+            "misses": self.misses
+        }
+
+
+# Instance globale partagée par tous les agents
+cassette = Cassette()
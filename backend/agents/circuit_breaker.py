@@ -0,0 +1,241 @@
+from typing import Dict, Any, Optional, Deque, Tuple
+from collections import deque
+import logging
+import time
+
+from .llm_client import (
+    LLMError, LLMHTTPError, LLMTimeoutError, LLMConnectionError, LLMResponseError, DeadlineExceeded
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(LLMError):
+    """The model's breaker is open; the call was rejected without reaching OpenRouter"""
+
+    def __init__(self, model: str, retry_in: float):
+        super().__init__(f"Circuit open for {model}, next probe in {retry_in:.0f}s")
+        self.model = model
+        self.retry_in = retry_in
+
+
+def is_model_failure(error: LLMError) -> bool:
+    """Errors that say something about the model's health
+
+    Client errors (bad key, bad request) and 429s (per-key throttling, handled
+    by the rate limiter) must not open the breaker for everybody, and neither
+    must a caller's own deadline running out.
+    """
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, (LLMTimeoutError, LLMConnectionError, LLMResponseError)):
+        return True
+    return isinstance(error, LLMHTTPError) and error.status_code >= 500
+
+
+class CircuitBreaker:
+    """Rolling-window breaker of one model
+
+    Opens when, over the last `window_seconds` and at least `min_calls` calls,
+    the error rate or the slow-call rate reaches its threshold. After
+    `open_seconds` it lets `half_open_max_calls` probes through: a successful
+    probe closes it, a failed or slow one opens it again.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        window_seconds: float = 60.0,
+        min_calls: int = 5,
+        error_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 60.0,
+        slow_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.model = model
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        # (timestamp, failed, slow, latency)
+        self._calls: Deque[Tuple[float, bool, bool, float]] = deque()
+        self.trips = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info(f"[CircuitBreaker] {self.model} half-open, probing")
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def acquire(self):
+        """Reserve the right to call the model, raising CircuitOpenError if rejected"""
+        state = self.state
+        if state == OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(self.model, self.open_seconds - (time.monotonic() - self._opened_at))
+        if state == HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.model, 0.0)
+            self._probes += 1
+
+    def release(self):
+        """Give back a reservation whose outcome says nothing about the model"""
+        if self._state == HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def record_success(self, latency: float):
+        slow = latency >= self.slow_call_seconds
+        if self._state == HALF_OPEN:
+            self.release()
+            if slow:
+                self._trip(f"slow probe ({latency:.1f}s)")
+            else:
+                self._close()
+            return
+        self._record(False, slow, latency)
+
+    def record_failure(self, error: LLMError, latency: float = 0.0):
+        if not is_model_failure(error):
+            self.release()
+            return
+        self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+        if self._state == HALF_OPEN:
+            self.release()
+            self._trip("failed probe")
+            return
+        self._record(True, False, latency)
+
+    def _record(self, failed: bool, slow: bool, latency: float):
+        now = time.monotonic()
+        self._calls.append((now, failed, slow, latency))
+        self._prune(now)
+        if self._state != CLOSED or len(self._calls) < self.min_calls:
+            return
+        error_rate, slow_rate = self._rates()
+        if error_rate >= self.error_rate_threshold:
+            self._trip(f"error rate {error_rate:.0%}")
+        elif slow_rate >= self.slow_rate_threshold:
+            self._trip(f"slow-call rate {slow_rate:.0%}")
+
+    def _prune(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _rates(self) -> Tuple[float, float]:
+        total = len(self._calls)
+        if not total:
+            return 0.0, 0.0
+        failed = sum(1 for call in self._calls if call[1])
+        slow = sum(1 for call in self._calls if call[2])
+        return failed / total, slow / total
+
+    def _trip(self, reason: str):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes = 0
+        self._calls.clear()
+        self.trips += 1
+        logger.warning(f"[CircuitBreaker] {self.model} opened ({reason}) for {self.open_seconds:.0f}s")
+
+    def _close(self):
+        self._state = CLOSED
+        self._probes = 0
+        self._calls.clear()
+        logger.info(f"[CircuitBreaker] {self.model} closed")
+
+    def stats(self) -> Dict[str, Any]:
+        self._prune(time.monotonic())
+        error_rate, slow_rate = self._rates()
+        latencies = [call[3] for call in self._calls if not call[1]]
+        state = self.state
+        return {
+            "model": self.model,
+            "state": state,
+            "calls_in_window": len(self._calls),
+            "error_rate": round(error_rate, 3),
+            "slow_rate": round(slow_rate, 3),
+            "avg_latency_s": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "open_for_s": round(max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)), 1) if state == OPEN else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
+
+
+class CircuitBreakerRegistry:
+    """Breakers of every model, shared by all agents of the process"""
+
+    BREAKER_OPTIONS = (
+        "window_seconds", "min_calls", "error_rate_threshold", "slow_call_seconds",
+        "slow_rate_threshold", "open_seconds", "half_open_max_calls"
+    )
+
+    def __init__(self, **options):
+        self.options: Dict[str, Any] = {}
+        self.fallback_model: Optional[str] = None
+        self.fallback_models: Dict[str, str] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.configure(**options)
+
+    def configure(self, fallback_model: Optional[str] = None, fallback_models: Optional[Dict[str, str]] = None, **options):
+        """Update breaker options (applies to breakers created afterwards) and fallback routes"""
+        for key, value in options.items():
+            if key in self.BREAKER_OPTIONS and value is not None:
+                self.options[key] = value
+        if fallback_model is not None:
+            self.fallback_model = fallback_model or None
+        if fallback_models is not None:
+            self.fallback_models = dict(fallback_models)
+        self._breakers.clear()
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = CircuitBreaker(model, **self.options)
+            self._breakers[model] = breaker
+        return breaker
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        """Model to route to while `model`'s breaker is open"""
+        fallback = self.fallback_models.get(model) or self.fallback_model
+        return fallback if fallback and fallback != model else None
+
+    def reset(self, model: Optional[str] = None):
+        """Forget the state of one breaker (or all of them)"""
+        if model is None:
+            self._breakers.clear()
+        else:
+            self._breakers.pop(model, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "options": self.options,
+            "fallback_model": self.fallback_model,
+            "fallback_models": self.fallback_models,
+            "breakers": [breaker.stats() for breaker in self._breakers.values()]
+        }
+
+
+# Instance globale partagée par tous les agents
+circuit_breakers = CircuitBreakerRegistry()
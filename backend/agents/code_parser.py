@@ -0,0 +1,158 @@
+from typing import Dict, List, Optional
+import re
+
+OPENING_FENCE = re.compile(r'^(?P<indent> {0,3})(?P<fence>`{3,}|~{3,})\s*(?P<info>[^`]*?)\s*$')
+
+# Filename markers accepted on the first line of a block
+FILENAME_MARKERS = [
+    re.compile(r'^//\s*(?:file(?:name)?\s*:\s*)?(?P<name>[\w./-]+\.\w+)\s*$', re.IGNORECASE),
+    re.compile(r'^#\s*file(?:name)?\s*:\s*(?P<name>[\w./-]+\.\w+)\s*$', re.IGNORECASE),
+    re.compile(r'^<!--\s*(?:file(?:name)?\s*:\s*)?(?P<name>[\w./-]+\.\w+)\s*-->\s*$', re.IGNORECASE),
+    re.compile(r'^/\*+\s*(?:file(?:name)?\s*:\s*)?(?P<name>[\w./-]+\.\w+)\s*\*+/\s*$', re.IGNORECASE),
+]
+# Filename given in the info string: ```html index.html, ```js:app.js, ```css title="a.css"
+INFO_FILENAME = re.compile(r'^(?P<lang>[\w+#-]*)(?:[\s:]+(?:(?:title|file(?:name)?)=)?["\']?(?P<name>[\w./-]+\.\w+)["\']?)?$')
+
+LANGUAGE_ALIASES = {
+    "js": "javascript",
+    "mjs": "javascript",
+    "jsx": "javascript",
+    "htm": "html",
+    "": "plaintext",
+}
+LANGUAGE_EXTENSIONS = {
+    "javascript": "js",
+    "typescript": "ts",
+    "plaintext": "txt",
+    "markdown": "md",
+    "python": "py",
+}
+
+
+class CodeBlockParser:
+    """Incremental, linear-time parser for fenced code blocks
+
+    Feed the completion chunk by chunk; each file is returned as soon as its
+    closing fence arrives. Nested fences inside a block (e.g. a README with
+    code samples) are tracked so they don't close the outer block early.
+    Tagged blocks without a filename are named `file.<ext>`, unless
+    `fallback_names` is False, in which case they are skipped.
+    """
+
+    def __init__(self, fallback_names: bool = True):
+        self.fallback_names = fallback_names
+        self._buffer = ""
+        self._block: Optional[Dict] = None
+        self.files: List[Dict[str, str]] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, str]]:
+        """Consume a chunk of the stream, returning the files completed by it"""
+        self._buffer += chunk
+        completed = []
+        start = 0
+        while True:
+            end = self._buffer.find("\n", start)
+            if end == -1:
+                break
+            file = self._consume_line(self._buffer[start:end])
+            if file:
+                completed.append(file)
+            start = end + 1
+        self._buffer = self._buffer[start:]
+        return completed
+
+    def close(self) -> List[Dict[str, str]]:
+        """Flush the last line; an unterminated block is returned as-is"""
+        completed = []
+        if self._buffer:
+            file = self._consume_line(self._buffer)
+            self._buffer = ""
+            if file:
+                completed.append(file)
+        if self._block is not None and self._block["lines"]:
+            file = self._finish_block()
+            if file:
+                completed.append(file)
+        self._block = None
+        return completed
+
+    def _consume_line(self, line: str) -> Optional[Dict[str, str]]:
+        line = line.rstrip("\r")
+        block = self._block
+
+        if block is None:
+            match = OPENING_FENCE.match(line)
+            if match:
+                self._open_block(match)
+            return None
+
+        stripped = line.strip()
+        fence = block["fence"]
+        info = stripped[len(fence):] if stripped.startswith(fence) else ""
+        if stripped and set(stripped) == {fence[0]} and len(stripped) >= len(fence):
+            if block["depth"] == 0:
+                return self._finish_block()
+            block["depth"] -= 1
+        elif info.strip() and fence[0] not in info:
+            # ``` followed by an info string inside a block opens a nested fence
+            block["depth"] += 1
+        elif not block["lines"] and not stripped:
+            return None  # leading blank lines
+        elif block["filename"] is None and not block["lines"] and not block["marker_checked"]:
+            block["marker_checked"] = True
+            for marker in FILENAME_MARKERS:
+                found = marker.match(stripped)
+                if found:
+                    block["filename"] = found.group("name")
+                    return None
+
+        block["lines"].append(line)
+        return None
+
+    def _open_block(self, match):
+        info = match.group("info")
+        language, filename = info, None
+        found = INFO_FILENAME.match(info)
+        if found:
+            language = found.group("lang")
+            filename = found.group("name")
+        self._block = {
+            "fence": match.group("fence"),
+            "language": language.lower(),
+            "filename": filename,
+            "depth": 0,
+            "marker_checked": False,
+            "lines": []
+        }
+
+    def _finish_block(self) -> Optional[Dict[str, str]]:
+        block = self._block
+        self._block = None
+
+        # Untagged blocks without a filename are prose/examples, not files
+        if not block["language"] and not block["filename"]:
+            return None
+
+        language = LANGUAGE_ALIASES.get(block["language"], block["language"])
+        filename = block["filename"]
+        if not filename and not self.fallback_names:
+            return None
+        if not filename:
+            ext = LANGUAGE_EXTENSIONS.get(language, language or "txt")
+            filename = f"file.{ext}"
+
+        file = {
+            "name": filename,
+            "content": "\n".join(block["lines"]).strip(),
+            "language": language or "plaintext"
+        }
+        self.files.append(file)
+        return file
+
+
+def parse_code_blocks(response: str, fallback_names: bool = True) -> List[Dict[str, str]]:
+    """Parse every fenced code block of a complete response"""
+    parser = CodeBlockParser(fallback_names)
+    parser.feed(response)
+    parser.close()
+    return parser.files
@@ -1,7 +1,10 @@
 from .base_agent import BaseAgent
+from .patcher import parse_edits, apply_edits, is_edit_block
+from .code_parser import CodeBlockParser, parse_code_blocks
+from .prompt_budget import prompt_budget
 from typing import Dict, Any, List
+import asyncio
 import json
-import re
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,6 +20,12 @@ class CoderAgent(BaseAgent):
         plan = task.get("plan", {})
         current_files = task.get("current_files", [])
         step = task.get("step", None)
+        target_files = task.get("target_files", [])
+        on_token = task.get("on_token")
+        on_file = task.get("on_file")
+        
+        if task.get("mode") == "edit" and current_files:
+            return await self.execute_edits(task)
         
         system_prompt = """You are an expert full-stack developer specializing in HTML, CSS, and JavaScript.
 Your role is to generate clean, production-ready code based on the execution plan.
@@ -57,9 +66,21 @@ Current Files:
 
 """
         
-        if step:
+        if target_files:
+            files_by_name = {f['name']: f for f in current_files}
+            context_message += "\nFiles to fix (current content):\n"
+            for name in target_files:
+                file = files_by_name.get(name, {})
+                context_message += f"\nFile: {name}\n```{file.get('language', '')}\n{file.get('content', '')}\n```\n"
+            context_message += (
+                "\nApply the fix instructions. Only output the corrected files listed above, "
+                "each one complete. Do not output any other file."
+            )
+        elif step:
             context_message += f"\nCurrent Step: {json.dumps(step, indent=2)}\n"
             context_message += f"\nGenerate code for this specific step."
+            if step.get("files"):
+                context_message += f" Only output these files: {', '.join(step['files'])}."
         else:
             context_message += "\nGenerate all necessary code to implement the complete solution."
         
@@ -67,10 +88,51 @@ Current Files:
         
         logger.info(f"[Coder] Generating code...")
         
-        response = await self.call_llm(messages, system_prompt)
+        if self.race_models:
+            # Racing streams can't be forwarded live: the winner is replayed
+            response = await self.race_llm(
+                messages,
+                system_prompt,
+                validate=lambda r: bool(parse_code_blocks(r))
+            )
+            files = self.parse_code_blocks(response)
+            if on_token:
+                await on_token(response)
+            if on_file:
+                for file in files:
+                    await on_file(file)
+            logger.info(f"[Coder] Generated {len(files)} file(s)")
+            return {
+                "success": True,
+                "files": files,
+                "raw_response": response
+            }
+        
+        # Parse code blocks incrementally: each file is emitted as soon as its
+        # closing fence has been streamed
+        parser = CodeBlockParser()
+        
+        async def on_chunk(delta: str):
+            if on_token:
+                await on_token(delta)
+            for file in parser.feed(delta):
+                if on_file:
+                    await on_file(file)
         
-        # Parse code blocks from response
-        files = self.parse_code_blocks(response)
+        response = await self.call_llm(
+            messages,
+            system_prompt,
+            on_token=on_chunk if (on_token or on_file) else None,
+            cache_if=lambda r: bool(parse_code_blocks(r))
+        )
+        
+        if on_token or on_file:
+            for file in parser.close():
+                if on_file:
+                    await on_file(file)
+            files = parser.files
+        else:
+            files = self.parse_code_blocks(response)
         
         logger.info(f"[Coder] Generated {len(files)} file(s)")
         
@@ -80,30 +142,152 @@ Current Files:
             "raw_response": response
         }
     
-    def parse_code_blocks(self, response: str) -> List[Dict[str, str]]:
-        """Parse code blocks from LLM response"""
-        files = []
-        code_block_regex = r'```(\w+)\n?(?:\/\/\s*filename:\s*(.+)\n)?([\s\S]*?)```'
-        
-        matches = re.findall(code_block_regex, response)
-        
-        for match in matches:
-            language, filename, code = match
-            code = code.strip()
-            
-            if filename:
-                filename = filename.strip()
-            else:
-                # Try to determine filename from language
-                ext = language if language else 'txt'
-                if ext == 'javascript':
-                    ext = 'js'
-                filename = f'file.{ext}'
-            
-            files.append({
-                "name": filename,
-                "content": code,
-                "language": language or 'plaintext'
+    async def execute_edits(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Edit existing files through SEARCH/REPLACE blocks or unified diffs
+        
+        Only changed and new files are returned. Files whose edits cannot be
+        applied are regenerated in full with a targeted second call.
+        """
+        plan = task.get("plan", {})
+        current_files = task.get("current_files", [])
+        target_files = task.get("target_files", [])
+        on_token = task.get("on_token")
+        
+        system_prompt = """You are an expert full-stack developer specializing in HTML, CSS, and JavaScript.
+You are editing an existing project. Never re-emit files or code that do not change.
+
+For every existing file you change, output one or more SEARCH/REPLACE blocks:
+// filename: index.html
+<<<<<<< SEARCH
+exact lines copied from the current file
+=======
+new lines
+>>>>>>> REPLACE
+
+Rules:
+1. The SEARCH part must match the current file exactly, including indentation
+2. Keep each SEARCH part small but unique within the file
+3. Use several blocks for several changes; they are applied in order
+4. Unified diffs (```diff with --- a/file and +++ b/file headers) are also accepted
+5. To create a new file, use a normal fenced code block:
+```javascript
+// filename: new-file.js
+[code here]
+```"""
+        
+        editable = [f for f in current_files if not target_files or f['name'] in target_files]
+        plan_text = json.dumps(plan, indent=2)
+        file_names = json.dumps([f['name'] for f in current_files])
+        # Edits only touch the lines they quote, so low-priority regions can be elided safely
+        budget = prompt_budget.budget_for(self.model) - prompt_budget.count_tokens(system_prompt + plan_text + file_names) - 200
+        files_content, elided = prompt_budget.render_files(editable, budget, priority=target_files)
+        context_message = f"""Execution Plan:
+{plan_text}
+
+All Project Files:
+{file_names}
+
+Current Content:
+{files_content}
+
+Apply the plan{" and the fix instructions" if plan.get("fix_instructions") else ""} with minimal edits."""
+        if elided:
+            context_message += "\nElided regions are unchanged and hidden: never quote them in a SEARCH part."
+        
+        logger.info(f"[Coder] Editing {len(editable)} file(s)...")
+        
+        messages = [{"role": "user", "content": context_message}]
+        if self.race_models:
+            response = await self.race_llm(
+                messages,
+                system_prompt,
+                validate=lambda r: asyncio.to_thread(self._edits_apply, r, current_files)
+            )
+            if on_token:
+                await on_token(response)
+        else:
+            response = await self.call_llm(
+                messages,
+                system_prompt,
+                on_token=on_token,
+                cache_if=lambda r: bool(parse_edits(r) or parse_code_blocks(r, fallback_names=False))
+            )
+        
+        edits = parse_edits(response)
+        # Fuzzy matching of drifted SEARCH blocks is CPU-bound: keep it off the event loop
+        updated, failed = await asyncio.to_thread(apply_edits, current_files, edits)
+        
+        languages = {f['name']: f.get('language', 'plaintext') for f in current_files}
+        
+        # Full code blocks (new files or complete rewrites) override edits; a block
+        # without an explicit filename would otherwise create a bogus `file.<ext>`
+        for file in parse_code_blocks(response, fallback_names=False):
+            if file["language"] == "diff" or is_edit_block(file["content"]):
+                continue
+            updated[file["name"]] = file["content"]
+            languages[file["name"]] = file["language"]
+            if file["name"] in failed:
+                failed.remove(file["name"])
+        
+        files = [
+            {"name": name, "content": content, "language": languages.get(name) or self.language_for(name)}
+            for name, content in updated.items()
+        ]
+        
+        if failed:
+            logger.info(f"[Coder] Edits failed for {failed}, regenerating them in full")
+            fallback = await self.execute({
+                **task,
+                "mode": "full",
+                "target_files": failed
             })
+            files = self.merge_files(files, fallback.get("files", []))
+        
+        logger.info(f"[Coder] Edited {len(files)} file(s) ({sum(len(e) for e in edits.values())} edit block(s))")
+        
+        return {
+            "success": True,
+            "files": files,
+            "raw_response": response,
+            "edits_applied": {name: len(edits.get(name, [])) for name in updated},
+            "fallback_files": failed
+        }
+    
+    @staticmethod
+    def _edits_apply(response: str, current_files: List[Dict[str, str]]) -> bool:
+        """True if a response holds edits that all apply, or full files"""
+        if parse_code_blocks(response, fallback_names=False) and not parse_edits(response):
+            return True
+        edits = parse_edits(response)
+        return bool(edits) and not apply_edits(current_files, edits)[1]
+    
+    @staticmethod
+    def language_for(filename: str) -> str:
+        """Guess the language of a file from its extension"""
+        extension = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+        return {
+            "html": "html",
+            "htm": "html",
+            "css": "css",
+            "js": "javascript",
+            "mjs": "javascript",
+            "json": "json",
+            "md": "markdown"
+        }.get(extension, "plaintext")
+    
+    @staticmethod
+    def merge_files(*file_lists: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Merge file lists by name
         
-        return files
+        Later lists win for files with the same name; files keep the position of
+        their first appearance so the result is deterministic.
+        """
+        merged: Dict[str, Dict[str, str]] = {}
+        for files in file_lists:
+            for file in files:
+                merged[file["name"]] = file
+        return list(merged.values())
+    
+    def parse_code_blocks(self, response: str) -> List[Dict[str, str]]:
+        """Parse code blocks from LLM response"""
+        return parse_code_blocks(response)
@@ -0,0 +1,76 @@
+from typing import Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import math
+import time
+
+from .llm_client import DeadlineExceeded
+
+# Timeout of a single LLM call when no deadline is set
+DEFAULT_CALL_TIMEOUT = 120.0
+# Calls are never started with less time than this
+MIN_CALL_TIMEOUT = 1.0
+# A phase gets at least this much (or whatever is left), whatever its share
+MIN_PHASE_SECONDS = 2.0
+
+
+class Deadline:
+    """Absolute point in time by which a run must be finished
+
+    `Deadline(None)` never expires. Phases get a share of what is left with
+    `child()`, and LLM calls derive their timeout from the innermost deadline
+    in scope (see `deadline_scope`).
+    """
+
+    def __init__(self, seconds: Optional[float] = None, expires_at: Optional[float] = None):
+        if expires_at is None and seconds is not None:
+            expires_at = time.monotonic() + seconds
+        self.expires_at = expires_at
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def child(self, fraction: float) -> "Deadline":
+        """Deadline giving `fraction` of the remaining budget (at least MIN_PHASE_SECONDS)"""
+        if self.expires_at is None:
+            return Deadline()
+        remaining = self.remaining()
+        return Deadline(max(remaining * fraction, min(remaining, MIN_PHASE_SECONDS)))
+
+    def timeout(self, default: float = DEFAULT_CALL_TIMEOUT) -> float:
+        """Timeout for a call started now; raises DeadlineExceeded if too little is left"""
+        remaining = self.remaining()
+        if remaining < MIN_CALL_TIMEOUT:
+            raise DeadlineExceeded(f"Deadline exceeded ({remaining:.1f}s left)")
+        return min(default, remaining)
+
+
+_current: ContextVar[Deadline] = ContextVar("agent_deadline", default=Deadline())
+
+
+def current_deadline() -> Deadline:
+    """Innermost deadline of the running task (tasks inherit it when created)"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Deadline):
+    """Make `deadline` (capped by the enclosing one) the current deadline"""
+    parent = _current.get()
+    if parent.bounded and (not deadline.bounded or deadline.expires_at > parent.expires_at):
+        deadline = parent
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, Tuple
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LLMResponseCache:
+    """Content-addressed cache of LLM completions
+
+    Tier 1 is a bounded in-process LRU, tier 2 an optional Mongo collection
+    (TTL-indexed) shared by every backend instance.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: int = 86400, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.collection = None
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    def configure(self, **options):
+        """Update cache options"""
+        for key, value in options.items():
+            if value is not None and hasattr(self, key):
+                setattr(self, key, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def attach(self, collection):
+        """Attach the Mongo collection used as persistent tier"""
+        self.collection = collection
+
+    async def ensure_indexes(self):
+        """Create the unique key index and the TTL index on the persistent tier"""
+        if self.collection is None:
+            return
+        try:
+            await self.collection.create_index("key", unique=True)
+            await self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"[LLMCache] Could not create indexes: {str(e)}")
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Hash of (model, messages incl. system prompt, sampling params)"""
+        canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, content: str):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, content)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for `key`, or None"""
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, content = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return content
+            del self._entries[key]
+
+        if self.collection is not None:
+            try:
+                doc = await self.collection.find_one({"key": key}, {"_id": 0, "content": 1, "created_at": 1})
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"[LLMCache] Persistent lookup failed: {str(e)}")
+                doc = None
+
+            if doc is not None:
+                created_at = doc.get("created_at")
+                if created_at is not None and created_at.tzinfo is None:
+                    created_at = created_at.replace(tzinfo=timezone.utc)
+                # Mongo's TTL monitor only runs once a minute
+                if created_at is None or created_at + timedelta(seconds=self.ttl_seconds) > datetime.now(timezone.utc):
+                    self._remember(key, doc["content"])
+                    self.persistent_hits += 1
+                    return doc["content"]
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, content: str, model: str = None):
+        """Store a completion in both tiers (empty completions are never cached)"""
+        if not self.enabled or not (content or "").strip():
+            return
+
+        self._remember(key, content)
+        self.writes += 1
+
+        if self.collection is not None:
+            try:
+                await self.collection.update_one(
+                    {"key": key},
+                    {"$set": {
+                        "key": key,
+                        "model": model,
+                        "content": content,
+                        "created_at": datetime.now(timezone.utc)
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"[LLMCache] Persistent write failed: {str(e)}")
+
+    async def clear(self):
+        """Drop every cached completion"""
+        self._entries.clear()
+        if self.collection is not None:
+            await self.collection.delete_many({})
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters"""
+        hits = self.memory_hits + self.persistent_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "persistent_tier": self.collection is not None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+
+# Instance globale partagée par tous les agents
+llm_cache = LLMResponseCache()
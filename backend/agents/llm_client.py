@@ -0,0 +1,324 @@
+from typing import Dict, Any, Optional, AsyncIterator, Mapping
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import httpx
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# Statuses worth retrying: throttling, timeouts and transient upstream failures
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504, 529}
+
+
+class LLMError(Exception):
+    """Base class of every failed LLM call"""
+    retryable = False
+
+
+class LLMHTTPError(LLMError):
+    """Non-200 response from OpenRouter"""
+
+    def __init__(self, status_code: int, body: str = ""):
+        super().__init__(f"{status_code} - {body[:500]}")
+        self.status_code = status_code
+        self.body = body
+        self.retryable = status_code in RETRYABLE_STATUSES
+
+
+class LLMRateLimitError(LLMHTTPError):
+    """429 from OpenRouter; `retry_after` is in seconds when the server sent one"""
+
+    def __init__(self, status_code: int, body: str = "", retry_after: Optional[float] = None):
+        super().__init__(status_code, body)
+        self.retry_after = retry_after
+
+
+class LLMTimeoutError(LLMError):
+    """The request did not complete in time"""
+    retryable = True
+
+
+class DeadlineExceeded(LLMTimeoutError):
+    """The caller's time budget ran out (says nothing about the model)"""
+    retryable = False
+
+
+class LLMConnectionError(LLMError):
+    """OpenRouter could not be reached"""
+    retryable = True
+
+
+class LLMResponseError(LLMError):
+    """200 response without a usable completion"""
+    pass
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delay in seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def error_from_response(status_code: int, body: str, headers: Mapping[str, str]) -> LLMHTTPError:
+    """Build the typed error for a non-200 response"""
+    if status_code == 429:
+        return LLMRateLimitError(status_code, body, parse_retry_after(headers.get("retry-after")))
+    return LLMHTTPError(status_code, body)
+
+
+class LLMClient:
+    """Long-lived, pooled HTTP client shared by every OpenRouter call in the process"""
+
+    def __init__(
+        self,
+        base_url: str = OPENROUTER_BASE_URL,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True
+    ):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Pool usage metrics
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests_total = 0
+        self._errors_total = 0
+        self._latency_total = 0.0
+        self._clients_created = 0
+
+    def configure(self, **options):
+        """Update pool options (only applies to the next client created)"""
+        for key, value in options.items():
+            if value is not None and hasattr(self, key):
+                setattr(self, key, value)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = self.http2 and HTTP2_AVAILABLE
+        if self.http2 and not HTTP2_AVAILABLE:
+            logger.warning("[LLMClient] 'h2' package not installed, falling back to HTTP/1.1")
+
+        self._clients_created += 1
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(120.0, connect=10.0)
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the shared client, creating it lazily outside of the app lifespan"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def start(self):
+        """Open the shared client (called on application startup)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+            logger.info(
+                f"[LLMClient] Started pool for {self.base_url} "
+                f"(http2={self.http2 and HTTP2_AVAILABLE}, max_connections={self.max_connections})"
+            )
+
+    async def close(self):
+        """Close the shared client (called on application shutdown)"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def headers(self, api_key: str) -> Dict[str, str]:
+        """Default OpenRouter headers"""
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "HTTP-Referer": os.environ.get('FRONTEND_URL', 'http://localhost:3000'),
+            "X-Title": "Devora",
+            "Content-Type": "application/json"
+        }
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        api_key: str,
+        json: Optional[Dict[str, Any]] = None,
+        timeout: float = 120.0
+    ) -> httpx.Response:
+        """Send a request to OpenRouter through the shared pool"""
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        self._requests_total += 1
+        start = time.perf_counter()
+
+        try:
+            return await self.client.request(
+                method,
+                path,
+                headers=self.headers(api_key),
+                json=json,
+                timeout=timeout
+            )
+        except httpx.TimeoutException as e:
+            self._errors_total += 1
+            raise LLMTimeoutError(f"{method} {path} timed out after {timeout}s") from e
+        except httpx.TransportError as e:
+            self._errors_total += 1
+            raise LLMConnectionError(f"{method} {path} failed: {str(e) or type(e).__name__}") from e
+        except Exception:
+            self._errors_total += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._latency_total += time.perf_counter() - start
+
+    async def chat_completion(
+        self,
+        api_key: str,
+        payload: Dict[str, Any],
+        timeout: float = 120.0
+    ) -> Dict[str, Any]:
+        """POST /chat/completions, returning the decoded body
+
+        Raises LLMHTTPError (LLMRateLimitError for 429) on non-200 responses.
+        """
+        response = await self.request("POST", "/chat/completions", api_key, json=payload, timeout=timeout)
+        if response.status_code != 200:
+            self._errors_total += 1
+            raise error_from_response(response.status_code, response.text, response.headers)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LLMResponseError(f"Invalid JSON body: {response.text[:200]}") from e
+
+    async def stream_chat_completion(
+        self,
+        api_key: str,
+        payload: Dict[str, Any],
+        timeout: float = 120.0
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """POST /chat/completions with stream=true, yielding each parsed SSE chunk"""
+        self._in_flight += 1
+        self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        self._requests_total += 1
+        start = time.perf_counter()
+
+        try:
+            async with self.client.stream(
+                "POST",
+                "/chat/completions",
+                headers=self.headers(api_key),
+                json={**payload, "stream": True},
+                timeout=timeout
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode(errors="replace")
+                    raise error_from_response(response.status_code, body, response.headers)
+
+                async for line in response.aiter_lines():
+                    # SSE comments (": OPENROUTER PROCESSING") and blank separators
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        logger.warning(f"[LLMClient] Skipping malformed stream chunk: {data[:100]}")
+                        continue
+                    error = chunk.get("error") if isinstance(chunk, dict) else None
+                    if isinstance(error, dict):
+                        # Failures after the 200 headers arrive as an error chunk
+                        code = error.get("code")
+                        status_code = code if isinstance(code, int) else 502
+                        raise error_from_response(status_code, str(error.get("message", "")), {})
+                    yield chunk
+        except httpx.TimeoutException as e:
+            self._errors_total += 1
+            raise LLMTimeoutError(f"Stream timed out after {timeout}s") from e
+        except httpx.TransportError as e:
+            self._errors_total += 1
+            raise LLMConnectionError(f"Stream failed: {str(e) or type(e).__name__}") from e
+        except Exception:
+            self._errors_total += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._latency_total += time.perf_counter() - start
+
+    async def list_models(self, api_key: str, timeout: float = 30.0) -> httpx.Response:
+        """GET /models"""
+        return await self.request("GET", "/models", api_key, timeout=timeout)
+
+    def _pool_state(self) -> Dict[str, int]:
+        """Best-effort snapshot of the underlying connection pool"""
+        state = {"connections_open": 0, "connections_idle": 0, "connections_http2": 0}
+        if self._client is None or self._client.is_closed:
+            return state
+
+        pool = getattr(self._client._transport, "_pool", None)
+        for connection in getattr(pool, "connections", []) or []:
+            state["connections_open"] += 1
+            try:
+                if connection.is_idle():
+                    state["connections_idle"] += 1
+                if "HTTP/2" in repr(connection):
+                    state["connections_http2"] += 1
+            except Exception:
+                pass
+        return state
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage metrics"""
+        completed = self._requests_total - self._in_flight
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2 and HTTP2_AVAILABLE,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "requests_total": self._requests_total,
+            "errors_total": self._errors_total,
+            "avg_latency_ms": round(self._latency_total / completed * 1000, 1) if completed else 0.0,
+            "clients_created": self._clients_created,
+            **self._pool_state()
+        }
+
+
+# Instance globale partagée par tous les agents
+llm_client = LLMClient()
@@ -0,0 +1,106 @@
+from typing import Dict, Any, Optional, Deque, Tuple
+from collections import deque
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per (role, model) for percentiles
+LATENCY_SAMPLES = 500
+
+
+def percentile(samples, fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class _ModelStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_calls = 0
+        self.latency_total = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def to_dict(self) -> Dict[str, Any]:
+        succeeded = self.calls - self.errors
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_completion_tokens": round(self.completion_tokens / succeeded) if succeeded else 0,
+            "estimated_token_calls": self.estimated_calls,
+            "avg_latency_ms": round(self.latency_total / self.calls * 1000, 1) if self.calls else None,
+            "p50_latency_ms": _ms(percentile(self.latencies, 0.5)),
+            "p95_latency_ms": _ms(percentile(self.latencies, 0.95))
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class AgentMetrics:
+    """Latency and token counters per agent role and model
+
+    Used to tune the role → model mapping (e.g. whether the tester and
+    reviewer can run on a cheaper model).
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], _ModelStats] = {}
+
+    def _get(self, role: str, model: str) -> _ModelStats:
+        key = (role, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = _ModelStats()
+            self._stats[key] = stats
+        return stats
+
+    def record_call(
+        self,
+        role: str,
+        model: str,
+        latency: float,
+        usage: Optional[Dict[str, Any]] = None,
+        error: bool = False
+    ):
+        """Record one request to OpenRouter (`usage` as returned by the API)"""
+        stats = self._get(role, model)
+        stats.calls += 1
+        stats.latency_total += latency
+        stats.latencies.append(latency)
+        if error:
+            stats.errors += 1
+            return
+        usage = usage or {}
+        stats.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+        stats.completion_tokens += int(usage.get("completion_tokens") or 0)
+        if usage.get("estimated"):
+            stats.estimated_calls += 1
+
+    def record_cache_hit(self, role: str, model: str):
+        self._get(role, model).cache_hits += 1
+
+    def reset(self):
+        self._stats.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        roles: Dict[str, Dict[str, Any]] = {}
+        for (role, model), stats in sorted(self._stats.items()):
+            roles.setdefault(role, {})[model] = stats.to_dict()
+        return {"roles": roles}
+
+
+# Instance globale partagée par tous les agents
+agent_metrics = AgentMetrics()
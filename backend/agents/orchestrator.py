@@ -2,117 +2,570 @@ from .planner import PlannerAgent
 from .coder import CoderAgent
 from .tester import TesterAgent
 from .reviewer import ReviewerAgent
+from .scheduler import run_step_dag, resolve_dependencies, step_ids
+from .llm_client import LLMError, DeadlineExceeded
+from .deadline import Deadline, deadline_scope
+from .cancellation import CancellationToken, RunCancelled, cancellation_scope, current_token
+from .tracing import RunTrace, trace_scope, span
+from . import static_analysis
 from typing import Dict, Any, List, Callable
 import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Share of the remaining time budget given to each phase
+PHASE_BUDGET = {"plan": 0.2, "code": 0.6, "test": 0.5, "review": 0.5}
+# A fix iteration is only started if at least this much time is left
+MIN_ITERATION_SECONDS = 10.0
+
 class OrchestratorAgent:
     """Main orchestrator that coordinates all agents"""
     
-    def __init__(self, api_key: str, model: str = "openai/gpt-4o"):
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "openai/gpt-4o",
+        use_cache: bool = True,
+        max_parallel_steps: int = 3,
+        edit_mode: bool = False,
+        race_models: List[str] = None,
+        role_models: Dict[str, str] = None,
+        run_id: str = None,
+        checkpoint_store: Any = None,
+        trace_store: Any = None
+    ):
         self.api_key = api_key
         self.model = model
         
+        # Per-role models (planner/coder/tester/reviewer), defaulting to `model`
+        self.role_models = {role: role_model for role, role_model in (role_models or {}).items() if role_model}
+        
         # Initialize all agents
-        self.planner = PlannerAgent(api_key, model)
-        self.coder = CoderAgent(api_key, model)
-        self.tester = TesterAgent(api_key, model)
-        self.reviewer = ReviewerAgent(api_key, model)
+        self.planner = PlannerAgent(api_key, self.model_for("planner"))
+        self.coder = CoderAgent(api_key, self.model_for("coder"))
+        self.tester = TesterAgent(api_key, self.model_for("tester"))
+        self.reviewer = ReviewerAgent(api_key, self.model_for("reviewer"))
+        
+        # Per-request bypass of the LLM response cache
+        for agent in (self.planner, self.coder, self.tester, self.reviewer):
+            agent.use_cache = use_cache
+        
+        # Latency-critical runs race the planner and coder across several models
+        self.planner.race_models = list(race_models or [])
+        self.coder.race_models = list(race_models or [])
         
         self.max_iterations = 3
+        self.max_parallel_steps = max_parallel_steps
+        self.edit_mode = edit_mode
+        # Plan steps coded by the last DAG-scheduled code phase
+        self.steps_report: Dict[str, int] = None
         self.progress_callback: Callable = None
+        self.token_callback: Callable = None
+        self.file_callback: Callable = None
+        
+        # Phase checkpoints: any object with async save(run_id, phase, state),
+        # load(run_id) and finish(run_id, status, error)
+        self.run_id = run_id
+        self.checkpoint_store = checkpoint_store
+        
+        # Run timelines: any object with async save(trace)
+        self.trace_store = trace_store
+        
+    def model_for(self, role: str) -> str:
+        """Model used by an agent role"""
+        return self.role_models.get(role) or self.model
+    
+    async def checkpoint(self, phase: str, **state):
+        """Persist a completed phase (failures are logged, never fatal)"""
+        if not (self.run_id and self.checkpoint_store):
+            return
+        try:
+            await self.checkpoint_store.save(self.run_id, phase, state)
+        except Exception as e:
+            logger.warning(f"[Orchestrator] Could not save checkpoint '{phase}': {str(e)}")
+    
+    async def finish_run(self, status: str, error: str = None):
+        if not (self.run_id and self.checkpoint_store):
+            return
+        try:
+            await self.checkpoint_store.finish(self.run_id, status, error)
+        except Exception as e:
+            logger.warning(f"[Orchestrator] Could not close run {self.run_id}: {str(e)}")
+    
+    @staticmethod
+    def check_cancelled():
+        """Raise RunCancelled if the run was cancelled
         
+        Agents that swallow errors turn a cancelled LLM call into a failed
+        result, so phases are checked once they return.
+        """
+        token = current_token()
+        if token:
+            token.raise_if_cancelled()
+    
+    async def save_trace(self, trace: RunTrace):
+        """Persist the timeline of the run (failures are logged, never fatal)"""
+        if not self.trace_store:
+            return
+        try:
+            await self.trace_store.save(trace.to_dict())
+        except Exception as e:
+            logger.warning(f"[Orchestrator] Could not save trace of {self.run_id}: {str(e)}")
+    
     def set_progress_callback(self, callback: Callable):
         """Set callback for progress updates"""
         self.progress_callback = callback
         
+    def set_token_callback(self, callback: Callable):
+        """Set callback receiving the coder's token stream (enables streaming)"""
+        self.token_callback = callback
+    
+    def set_file_callback(self, callback: Callable):
+        """Set callback receiving each generated file as its code block closes (enables streaming)"""
+        self.file_callback = callback
+        
     async def emit_progress(self, event: str, data: Dict[str, Any]):
         """Emit progress event"""
         if self.progress_callback:
             await self.progress_callback(event, data)
         logger.info(f"[Orchestrator] {event}: {data.get('message', '')}")
     
-    async def execute(self, user_request: str, current_files: List[Dict] = None) -> Dict[str, Any]:
-        """Execute the agentic workflow"""
+    def _step_token_callback(self, step_number: int = None) -> Callable:
+        """Wrap the token callback so parallel token streams stay attributable"""
+        if not self.token_callback:
+            return None
+        
+        async def on_token(delta: str):
+            await self.token_callback(delta, step=step_number)
+        return on_token
+    
+    @staticmethod
+    def files_to_fix(plan: Dict[str, Any], previous_files: List[Dict]) -> List[str]:
+        """Names of the files flagged by the reviewer
+        
+        Returns an empty list (meaning: regenerate everything) when an issue is
+        not attributed to one of the existing files.
+        """
+        existing = {f["name"] for f in previous_files}
+        targets = []
+        for issue in plan.get("issues_to_fix", []):
+            name = issue.get("file")
+            if name not in existing:
+                return []
+            if name not in targets:
+                targets.append(name)
+        return targets
+    
+    def _file_ready_callback(self, step_number: int = None) -> Callable:
+        """Emit each file as soon as the coder's stream closes its code block
+        
+        None (the coder then makes a plain, retryable call) unless a token or
+        file consumer is attached. Progress events only carry the file's name
+        and size: they are kept in memory and on the job document.
+        """
+        if not (self.token_callback or self.file_callback):
+            return None
+        
+        async def on_file(file: Dict[str, str]):
+            # Static analysis of this file starts while later files are still streaming
+            static_analysis.prefetch([file])
+            if self.file_callback:
+                await self.file_callback(file, step=step_number)
+            await self.emit_progress("file_ready", {
+                "message": f"File ready: {file['name']}",
+                "file": file["name"],
+                "language": file.get("language"),
+                "size": len(file.get("content", "")),
+                "step": step_number
+            })
+        return on_file
+    
+    def _incremental_result(self, base_files: List[Dict], result: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge a partial coder result over `base_files`"""
+        previous = {f["name"]: f["content"] for f in base_files}
+        return {
+            "success": True,
+            "files": self.coder.merge_files(base_files, result["files"]),
+            "changed_files": [
+                f["name"] for f in result["files"]
+                if previous.get(f["name"]) != f["content"]
+            ],
+            "incremental": True,
+            "fallback_files": result.get("fallback_files", [])
+        }
+    
+    async def generate_code(
+        self,
+        plan: Dict[str, Any],
+        current_files: List[Dict],
+        iteration: int,
+        previous_files: List[Dict] = None
+    ) -> Dict[str, Any]:
+        """Generate code for the plan
+        
+        On the first iteration, plans with several steps are scheduled as a DAG
+        (`depends_on`) and independent steps run concurrently; a step that fails
+        (other than by running out of time) is retried once, then fails the
+        phase. `steps_completed`/`steps_total` are reported. Fix iterations
+        only regenerate the files flagged by the reviewer and carry the other
+        files forward; `changed_files` lists what was (re)generated. With
+        `edit_mode`, existing files are patched from SEARCH/REPLACE blocks or
+        diffs instead of being re-emitted in full.
+        """
+        if iteration > 1 and previous_files:
+            targets = self.files_to_fix(plan, previous_files)
+            if targets:
+                result = await self.coder.execute({
+                    "plan": plan,
+                    "current_files": previous_files,
+                    "target_files": targets,
+                    "mode": "edit" if self.edit_mode else "full",
+                    "iteration": iteration,
+                    "on_token": self._step_token_callback()
+                })
+                if result["success"] and result["files"]:
+                    return self._incremental_result(previous_files, result)
+                logger.warning("[Orchestrator] Targeted fix produced no files, regenerating everything")
+        
+        if iteration == 1 and current_files and self.edit_mode:
+            # Iterating on an existing project: edit it instead of re-emitting every file
+            result = await self.coder.execute({
+                "plan": plan,
+                "current_files": current_files,
+                "mode": "edit",
+                "iteration": iteration,
+                "on_token": self._step_token_callback()
+            })
+            if result["success"] and result["files"]:
+                return self._incremental_result(current_files, result)
+            logger.warning("[Orchestrator] Edit mode produced no changes, generating the full project")
+        
+        steps = [s for s in plan.get("steps", []) if isinstance(s, dict)]
+        if iteration > 1 or len(steps) < 2 or not all(s.get("files") for s in steps):
+            result = await self.coder.execute({
+                "plan": plan,
+                "current_files": current_files,
+                "iteration": iteration,
+                "on_token": self._step_token_callback(),
+                "on_file": self._file_ready_callback()
+            })
+            result["changed_files"] = [f["name"] for f in result.get("files", [])]
+            return result
+        
+        async def code_step(step: Dict[str, Any], dependency_results: List[Any]) -> Dict[str, Any]:
+            step_number = step.get("step_number")
+            await self.emit_progress("step_start", {
+                "message": f"Coding step {step_number}: {step.get('title', '')}",
+                "step": step_number
+            })
+            dependency_files = [r["files"] for r in dependency_results if self._step_succeeded(r)]
+            with span(f"step {step_number}", kind="step", step=step_number):
+                result = await self.coder.execute({
+                    "plan": plan,
+                    "step": step,
+                    "current_files": self.coder.merge_files(current_files, *dependency_files),
+                    "iteration": iteration,
+                    "on_token": self._step_token_callback(step_number),
+                    "on_file": self._file_ready_callback(step_number)
+                })
+            await self.emit_progress("step_complete", {
+                "message": f"Step {step_number} generated {len(result.get('files', []))} file(s)",
+                "step": step_number,
+                "files": [f['name'] for f in result.get("files", [])]
+            })
+            return result
+        
+        step_results = await run_step_dag(steps, code_step, self.max_parallel_steps)
+        
+        # Steps that failed for another reason than the deadline get one more try, in
+        # dependency order, so the phase never succeeds with part of the plan missing
+        graph = resolve_dependencies(steps)
+        by_id = dict(zip(step_ids(steps), steps))
+        for sid, result in list(step_results.items()):
+            if self._step_succeeded(result) or isinstance(result, DeadlineExceeded):
+                continue
+            self.check_cancelled()
+            logger.warning(f"[Orchestrator] Step {sid} failed ({self._step_error(result)}), retrying it")
+            try:
+                step_results[sid] = await code_step(by_id[sid], [step_results[dep] for dep in graph[sid]])
+            except RunCancelled:
+                raise
+            except Exception as e:
+                step_results[sid] = e
+        
+        succeeded = [r for r in step_results.values() if self._step_succeeded(r)]
+        failed = {sid: r for sid, r in step_results.items() if not self._step_succeeded(r)}
+        report = {"steps_completed": len(succeeded), "steps_total": len(step_results)}
+        if not succeeded and any(isinstance(r, DeadlineExceeded) for r in failed.values()):
+            raise next(r for r in failed.values() if isinstance(r, DeadlineExceeded))
+        
+        broken = {sid: r for sid, r in failed.items() if not isinstance(r, DeadlineExceeded)}
+        if broken:
+            first = next(iter(broken.values()))
+            return {
+                "success": False,
+                "files": [],
+                "error": f"Step(s) {', '.join(str(sid) for sid in broken)} failed: {self._step_error(first)}",
+                "error_type": type(first).__name__ if isinstance(first, Exception) else None,
+                "failed_steps": list(broken),
+                **report
+            }
+        
+        # step_results is in deterministic topological order; steps cut by the deadline are reported missing
+        files = self.coder.merge_files(*[r["files"] for r in succeeded])
+        return {
+            "success": True,
+            "files": files,
+            "changed_files": [f["name"] for f in files],
+            **report
+        }
+    
+    @staticmethod
+    def _step_succeeded(result: Any) -> bool:
+        # An empty or prose-only completion parses to no files: the step still has to be coded
+        return isinstance(result, dict) and bool(result.get("success")) and bool(result.get("files"))
+    
+    @staticmethod
+    def _step_error(result: Any) -> str:
+        if isinstance(result, Exception):
+            return f"{type(result).__name__}: {result}"
+        return (result or {}).get("error") or "no files generated"
+    
+    async def execute(
+        self,
+        user_request: str,
+        current_files: List[Dict] = None,
+        resume: bool = False,
+        deadline: Deadline = None,
+        cancel_token: CancellationToken = None
+    ) -> Dict[str, Any]:
+        """Execute the agentic workflow
+        
+        Every completed phase (plan, then code/test/review per iteration) is
+        checkpointed under `run_id`. With `resume`, the run continues after the
+        last checkpointed phase instead of starting over.
+        
+        With a `deadline`, each phase gets a share of the remaining budget
+        (bounding every LLM call), fix iterations are skipped when too little
+        time is left, and the best files so far are returned once it expires.
+        
+        Firing `cancel_token` aborts the in-flight LLM calls and stops the run
+        (`cancelled` in the result, checkpoint status "cancelled").
+        
+        The run is traced (phases, plan steps and LLM calls with their tokens
+        and cost); totals are returned under `trace` and the full timeline is
+        saved to `trace_store`.
+        """
         if current_files is None:
             current_files = []
+        deadline = deadline or Deadline()
+        trace = RunTrace(
+            self.run_id,
+            resumed=resume,
+            models={agent.role: agent.model for agent in (self.planner, self.coder, self.tester, self.reviewer)}
+        )
+        
+        try:
+            with deadline_scope(deadline), cancellation_scope(cancel_token), trace_scope(trace):
+                result = await self._execute(user_request, current_files, resume, deadline)
+        except BaseException as e:
+            trace.finish("failed", f"{type(e).__name__}: {e}")
+            await self.save_trace(trace)
+            raise
+        
+        if result.get("success"):
+            trace.finish("completed")
+        else:
+            trace.finish("cancelled" if result.get("cancelled") else "failed", result.get("error"))
+        await self.save_trace(trace)
+        result["trace"] = {"duration_ms": round(trace.root.duration * 1000, 1), **trace.totals()}
+        return result
+    
+    async def _execute(
+        self,
+        user_request: str,
+        current_files: List[Dict],
+        resume: bool,
+        deadline: Deadline
+    ) -> Dict[str, Any]:
         
         logger.info(f"[Orchestrator] Starting agentic workflow for request: {user_request[:100]}...")
         
         iteration = 0
         final_files = []
+        previous_test_result = None
+        
+        checkpoint = None
+        if resume and self.run_id and self.checkpoint_store:
+            checkpoint = await self.checkpoint_store.load(self.run_id)
+            if checkpoint and not checkpoint.get("plan"):
+                checkpoint = None  # Nothing worth resuming
         
         try:
-            # Step 1: Planning
-            await self.emit_progress("planning", {"message": "Analyzing requirements and creating plan..."})
-            
-            plan_result = await self.planner.execute({
-                "request": user_request,
-                "context": {"current_files": [f['name'] for f in current_files]}
-            })
-            
-            if not plan_result["success"]:
-                return {"success": False, "error": "Planning failed"}
-            
-            plan = plan_result["plan"]
-            await self.emit_progress("plan_complete", {
-                "message": f"Plan created with {len(plan.get('steps', []))} steps",
-                "plan": plan
-            })
+            # Phase to pick up within the current iteration ("test" or "review")
+            pending = None
             
-            # Iterative loop: Code → Test → Review → Fix (if needed)
-            while iteration < self.max_iterations:
-                iteration += 1
-                
-                await self.emit_progress("iteration_start", {
-                    "message": f"Starting iteration {iteration}/{self.max_iterations}",
-                    "iteration": iteration
-                })
-                
-                # Step 2: Code Generation
-                await self.emit_progress("coding", {"message": "Generating code..."})
-                
-                code_result = await self.coder.execute({
-                    "plan": plan,
-                    "current_files": current_files,
+            if checkpoint:
+                plan = checkpoint["plan"]
+                iteration = checkpoint.get("iteration", 0)
+                final_files = checkpoint.get("files") or []
+                previous_test_result = checkpoint.get("test_result")
+                phase = checkpoint["phase"]
+                await self.emit_progress("resumed", {
+                    "message": f"Resuming run after phase '{phase}' (iteration {iteration})",
+                    "phase": phase,
                     "iteration": iteration
                 })
+                if phase == "code":
+                    pending = "test"
+                elif phase == "test":
+                    pending = "review"
+                elif phase == "review" and not (checkpoint.get("review") or {}).get("requires_iteration"):
+                    return await self._complete(final_files, plan, iteration)
+            else:
+                # Step 1: Planning
+                await self.emit_progress("planning", {"message": "Analyzing requirements and creating plan..."})
                 
-                if not code_result["success"]:
-                    return {"success": False, "error": "Code generation failed"}
-                
-                final_files = code_result["files"]
-                await self.emit_progress("code_complete", {
-                    "message": f"Generated {len(final_files)} file(s)",
-                    "files": [f['name'] for f in final_files]
-                })
+                with deadline_scope(deadline.child(PHASE_BUDGET["plan"])), span("plan"):
+                    plan_result = await self.planner.execute({
+                        "request": user_request,
+                        "context": {"current_files": [f['name'] for f in current_files]}
+                    })
+                self.check_cancelled()
                 
-                # Step 3: Testing
-                await self.emit_progress("testing", {"message": "Testing generated code..."})
+                if not plan_result["success"]:
+                    await self.finish_run("failed", "Planning failed")
+                    return {"success": False, "error": "Planning failed"}
                 
-                test_result = await self.tester.execute({
-                    "files": final_files,
+                plan = plan_result["plan"]
+                await self.emit_progress("plan_complete", {
+                    "message": f"Plan created with {len(plan.get('steps', []))} steps",
                     "plan": plan
                 })
+                await self.checkpoint("plan", plan=plan, iteration=0)
+            
+            # Iterative loop: Code → Test → Review → Fix (if needed)
+            iteration_seconds = 0.0
+            iteration_started = None
+            while iteration < self.max_iterations or pending:
+                self.check_cancelled()
+                if pending is None:
+                    if iteration and deadline.remaining() < max(MIN_ITERATION_SECONDS, iteration_seconds / 2):
+                        # Not enough budget left for a fix iteration: keep what we have
+                        await self.emit_progress("deadline", {
+                            "message": f"Time budget too low for iteration {iteration + 1}, returning current result",
+                            "remaining_seconds": round(deadline.remaining(), 1)
+                        })
+                        return await self._complete(final_files, plan, iteration, deadline_reached=True)
+                    
+                    iteration += 1
+                    iteration_started = time.monotonic()
+                    
+                    await self.emit_progress("iteration_start", {
+                        "message": f"Starting iteration {iteration}/{self.max_iterations}",
+                        "iteration": iteration
+                    })
+                    
+                    # Step 2: Code Generation
+                    await self.emit_progress("coding", {"message": "Generating code..."})
+                    
+                    with deadline_scope(deadline.child(PHASE_BUDGET["code"])), span("code", iteration=iteration):
+                        code_result = await self.generate_code(plan, current_files, iteration, final_files)
+                    self.check_cancelled()
+                    
+                    if not code_result["success"]:
+                        error = code_result.get("error") or "Code generation failed"
+                        await self.finish_run("failed", error)
+                        return {
+                            "success": False,
+                            "error": error,
+                            "error_type": code_result.get("error_type"),
+                            "files": final_files,
+                            "steps_completed": code_result.get("steps_completed"),
+                            "steps_total": code_result.get("steps_total"),
+                            "run_id": self.run_id
+                        }
+                    
+                    final_files = code_result["files"]
+                    changed_names = set(code_result["changed_files"])
+                    incremental = bool(code_result.get("incremental"))
+                    if incremental:
+                        message = f"Regenerated {len(changed_names)} of {len(final_files)} file(s)"
+                    else:
+                        message = f"Generated {len(final_files)} file(s)"
+                    if "steps_total" in code_result:
+                        self.steps_report = {key: code_result[key] for key in ("steps_completed", "steps_total")}
+                        message += f" ({code_result['steps_completed']}/{code_result['steps_total']} step(s))"
+                    await self.emit_progress("code_complete", {
+                        "message": message,
+                        "files": [f['name'] for f in final_files],
+                        "changed_files": code_result["changed_files"],
+                        **(self.steps_report or {})
+                    })
+                    await self.checkpoint(
+                        "code",
+                        iteration=iteration,
+                        files=final_files,
+                        changed_files=code_result["changed_files"],
+                        incremental=incremental
+                    )
+                    pending = "test"
                 
-                await self.emit_progress("test_complete", {
-                    "message": f"Tests completed - {len(test_result['issues'])} issue(s) found",
-                    "test_passed": test_result["test_passed"],
-                    "issues": test_result["issues"]
-                })
+                if pending == "test":
+                    if checkpoint and checkpoint["phase"] == "code":
+                        changed_names = set(checkpoint.get("changed_files", []))
+                        incremental = bool(checkpoint.get("incremental"))
+                    
+                    # Step 3: Testing (only files that changed since the last iteration)
+                    await self.emit_progress("testing", {"message": "Testing generated code..."})
+                    
+                    files_to_test = [f for f in final_files if f["name"] in changed_names]
+                    if files_to_test:
+                        with deadline_scope(deadline.child(PHASE_BUDGET["test"])), span("test", iteration=iteration):
+                            test_result = await self.tester.execute({
+                                "files": files_to_test,
+                                "plan": plan
+                            })
+                        self.check_cancelled()
+                    else:
+                        test_result = {"success": True, "test_passed": True, "issues": [], "tiers": {}}
+                    
+                    if incremental and previous_test_result:
+                        # Untouched files keep the issues found when they were last tested
+                        untouched = {f["name"] for f in final_files} - changed_names
+                        carried = [i for i in previous_test_result["issues"] if i.get("file") in untouched]
+                        test_result["issues"] = test_result["issues"] + carried
+                        test_result["test_passed"] = not any(i.get("severity") == "critical" for i in test_result["issues"])
+                        test_result["retested_files"] = sorted(changed_names)
+                    previous_test_result = test_result
+                    
+                    await self.emit_progress("test_complete", {
+                        "message": f"Tests completed - {len(test_result['issues'])} issue(s) found",
+                        "test_passed": test_result["test_passed"],
+                        "issues": test_result["issues"],
+                        "tiers": test_result.get("tiers", {})
+                    })
+                    await self.checkpoint("test", iteration=iteration, test_result=test_result)
+                else:
+                    test_result = previous_test_result
+                
+                pending = None
+                checkpoint = None
                 
                 # Step 4: Review
                 await self.emit_progress("reviewing", {"message": "Reviewing results..."})
                 
-                review_result = await self.reviewer.execute({
-                    "test_results": test_result,
-                    "files": final_files,
-                    "plan": plan,
-                    "iteration": iteration,
-                    "max_iterations": self.max_iterations
-                })
+                with deadline_scope(deadline.child(PHASE_BUDGET["review"])), span("review", iteration=iteration):
+                    review_result = await self.reviewer.execute({
+                        "test_results": test_result,
+                        "files": final_files,
+                        "plan": plan,
+                        "iteration": iteration,
+                        "max_iterations": self.max_iterations
+                    })
+                self.check_cancelled()
                 
                 await self.emit_progress("review_complete", {
                     "message": review_result["message"],
@@ -122,6 +575,7 @@ class OrchestratorAgent:
                 
                 # Check if we should iterate
                 if not review_result["requires_iteration"]:
+                    await self.checkpoint("review", iteration=iteration, review=review_result)
                     await self.emit_progress("complete", {
                         "message": "Agentic workflow completed successfully!",
                         "iterations": iteration
@@ -138,22 +592,98 @@ class OrchestratorAgent:
                     # Update plan with fix instructions for next iteration
                     plan["fix_instructions"] = review_result["fix_instructions"]
                     plan["issues_to_fix"] = review_result.get("issues_to_fix", [])
+                await self.checkpoint("review", iteration=iteration, review=review_result, plan=plan)
+                if iteration_started is not None:
+                    iteration_seconds = time.monotonic() - iteration_started
+            
+            return await self._complete(final_files, plan, iteration)
             
-            # Final result
+        except RunCancelled as e:
+            logger.info(f"[Orchestrator] Run {self.run_id} cancelled ({e.reason}) at iteration {iteration}")
+            await self.emit_progress("cancelled", {
+                "message": f"Run cancelled: {e.reason}",
+                "reason": e.reason
+            })
+            await self.finish_run("cancelled", e.reason)
             return {
-                "success": True,
+                "success": False,
+                "cancelled": True,
+                "error": str(e),
+                "error_type": "RunCancelled",
                 "files": final_files,
-                "plan": plan,
                 "iterations": iteration,
-                "message": f"Completed in {iteration} iteration(s)"
+                "run_id": self.run_id
+            }
+        except DeadlineExceeded as e:
+            if final_files:
+                logger.warning(f"[Orchestrator] Deadline reached, returning the files of iteration {iteration}")
+                await self.emit_progress("deadline", {
+                    "message": "Time budget exhausted, returning the best result so far",
+                    "remaining_seconds": 0
+                })
+                return await self._complete(final_files, plan, iteration, deadline_reached=True)
+            logger.error("[Orchestrator] Deadline reached before any code was generated")
+            await self.emit_progress("error", {
+                "message": f"Deadline exceeded: {str(e)}",
+                "error_type": "DeadlineExceeded"
+            })
+            await self.finish_run("failed", str(e))
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": "DeadlineExceeded",
+                "iterations": iteration,
+                "run_id": self.run_id
+            }
+        except LLMError as e:
+            logger.error(f"[Orchestrator] LLM error: {type(e).__name__}: {str(e)}")
+            error = {
+                "error": str(e),
+                "error_type": type(e).__name__,
+                "status_code": getattr(e, "status_code", None),
+                "retry_after": getattr(e, "retry_after", None)
+            }
+            await self.emit_progress("error", {
+                "message": f"LLM error: {str(e)}",
+                **error
+            })
+            await self.finish_run("failed", str(e))
+            return {
+                "success": False,
+                "files": final_files,
+                "iterations": iteration,
+                "run_id": self.run_id,
+                **error
             }
-            
         except Exception as e:
             logger.error(f"[Orchestrator] Error: {str(e)}")
             await self.emit_progress("error", {
                 "message": f"Error: {str(e)}"
             })
+            await self.finish_run("failed", str(e))
             return {
                 "success": False,
-                "error": str(e)
+                "error": str(e),
+                "run_id": self.run_id
             }
+    
+    async def _complete(
+        self,
+        final_files: List[Dict],
+        plan: Dict[str, Any],
+        iteration: int,
+        deadline_reached: bool = False
+    ) -> Dict[str, Any]:
+        """Final result of a successful run"""
+        await self.finish_run("completed")
+        return {
+            "success": True,
+            "files": final_files,
+            "plan": plan,
+            "iterations": iteration,
+            "deadline_reached": deadline_reached,
+            **(self.steps_report or {}),
+            "run_id": self.run_id,
+            "models": {agent.role: agent.model for agent in (self.planner, self.coder, self.tester, self.reviewer)},
+            "message": f"Completed in {iteration} iteration(s)"
+        }
@@ -0,0 +1,301 @@
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass
+import difflib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+FILENAME_REGEX = re.compile(
+    r'^(?://|#|/\*|<!--)?\s*(?:filename|file)\s*:\s*(?P<name>[^\s*>]+?)\s*(?:\*/|-->)?$',
+    re.IGNORECASE
+)
+SEARCH_MARKER = re.compile(r'^\s*<{5,9} ?SEARCH\s*$')
+DIVIDER_MARKER = re.compile(r'^\s*={5,9}\s*$')
+REPLACE_MARKER = re.compile(r'^\s*>{5,9} ?REPLACE\s*$')
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@')
+
+# Minimum similarity for a fuzzy (non-exact) match of a SEARCH block
+FUZZY_THRESHOLD = 0.85
+# Shorter SEARCH blocks must match (modulo whitespace) exactly
+FUZZY_MIN_LINES = 3
+# Longer SEARCH blocks (characters) are never fuzzy matched
+FUZZY_MAX_CHARS = 8000
+# Character pairs compared by full similarity ratios before the fuzzy pass gives up
+# (ratio() is quadratic in the characters compared)
+FUZZY_MAX_WORK = 20_000_000
+# Candidate windows must start or end with a line at least this similar to the block's
+FUZZY_ANCHOR_THRESHOLD = 0.6
+
+
+class PatchError(Exception):
+    """An edit could not be located in the target file"""
+    pass
+
+
+@dataclass
+class Edit:
+    """One replacement: `search` lines become `replace` lines"""
+    search: List[str]
+    replace: List[str]
+    hint: Optional[int] = None  # 0-based line where the search is expected (diff hunks)
+
+
+def is_edit_block(content: str) -> bool:
+    """True if a fenced block holds edits rather than a full file"""
+    return any(SEARCH_MARKER.match(line) for line in content.splitlines()) or (
+        "\n+++ " in f"\n{content}" and "\n@@ " in f"\n{content}"
+    )
+
+
+def _diff_path(line: str) -> str:
+    path = line[4:].strip().split("\t")[0]
+    if path.startswith(("a/", "b/")):
+        path = path[2:]
+    return path
+
+
+def parse_edits(response: str) -> Dict[str, List[Edit]]:
+    """Extract SEARCH/REPLACE blocks and unified diff hunks, grouped by filename"""
+    edits: Dict[str, List[Edit]] = {}
+    lines = response.splitlines()
+    current_file = None
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        match = FILENAME_REGEX.match(stripped)
+        if match:
+            current_file = match.group("name")
+            i += 1
+            continue
+
+        if SEARCH_MARKER.match(line):
+            search, replace = [], []
+            i += 1
+            while i < len(lines) and not DIVIDER_MARKER.match(lines[i]):
+                search.append(lines[i])
+                i += 1
+            i += 1
+            while i < len(lines) and not REPLACE_MARKER.match(lines[i]):
+                replace.append(lines[i])
+                i += 1
+            i += 1
+            if current_file:
+                edits.setdefault(current_file, []).append(Edit(search, replace))
+            else:
+                logger.warning("[Patcher] SEARCH/REPLACE block without filename, ignored")
+            continue
+
+        if line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            target = _diff_path(lines[i + 1])
+            if target == "/dev/null":
+                target = _diff_path(line)
+            current_file = target
+            i += 2
+            while i < len(lines):
+                header = HUNK_HEADER.match(lines[i])
+                if not header:
+                    break
+                hint = max(int(header.group(1)) - 1, 0)
+                search, replace = [], []
+                i += 1
+                while i < len(lines) and not HUNK_HEADER.match(lines[i]) and not lines[i].startswith(("--- ", "```")):
+                    hunk_line = lines[i]
+                    if hunk_line.startswith("-"):
+                        search.append(hunk_line[1:])
+                    elif hunk_line.startswith("+"):
+                        replace.append(hunk_line[1:])
+                    elif hunk_line.startswith("\\"):
+                        pass  # "\ No newline at end of file"
+                    else:
+                        # Context line; models often drop the leading space of blank lines
+                        context = hunk_line[1:] if hunk_line.startswith(" ") else hunk_line
+                        search.append(context)
+                        replace.append(context)
+                    i += 1
+                edits.setdefault(target, []).append(Edit(search, replace, hint))
+            continue
+
+        i += 1
+
+    return edits
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _find_block(lines: List[str], search: List[str], normalize, hint: Optional[int]) -> Optional[int]:
+    """Index of the occurrence of `search` in `lines` (closest to `hint`) under `normalize`"""
+    wanted = [normalize(line) for line in search]
+    size = len(wanted)
+    candidates = [
+        start for start in range(len(lines) - size + 1)
+        if [normalize(line) for line in lines[start:start + size]] == wanted
+    ]
+    if not candidates:
+        return None
+    if hint is None:
+        return candidates[0]
+    return min(candidates, key=lambda start: abs(start - hint))
+
+
+def _similar_lines(lines: List[str], target: str) -> List[bool]:
+    """For each line, whether it resembles `target` enough to anchor a fuzzy window"""
+    matcher = difflib.SequenceMatcher(None, autojunk=False)
+    matcher.set_seq2(target)
+    similar = []
+    for line in lines:
+        matcher.set_seq1(line)
+        similar.append(
+            matcher.real_quick_ratio() >= FUZZY_ANCHOR_THRESHOLD
+            and matcher.quick_ratio() >= FUZZY_ANCHOR_THRESHOLD
+            and matcher.ratio() >= FUZZY_ANCHOR_THRESHOLD
+        )
+    return similar
+
+
+def _fuzzy_find(lines: List[str], search: List[str], hint: Optional[int]) -> Optional[int]:
+    """Best window by similarity ratio, or None below FUZZY_THRESHOLD
+
+    Only windows anchored on a line resembling the block's first or last line
+    are considered. They are scored by the quadratic `ratio` in decreasing
+    order of its cheap upper bound (`quick_ratio`), which stops the scan as
+    soon as no remaining window can beat the best one, and in any case after
+    FUZZY_MAX_WORK character pairs.
+    """
+    size = len(search)
+    if size < FUZZY_MIN_LINES or len(lines) < size:
+        return None
+    wanted_lines = [line.strip() for line in search]
+    wanted = "\n".join(wanted_lines)
+    if len(wanted) > FUZZY_MAX_CHARS:
+        return None
+
+    stripped = [line.strip() for line in lines]
+    starts_like = _similar_lines(stripped, wanted_lines[0])
+    ends_like = _similar_lines(stripped, wanted_lines[-1])
+
+    matcher = difflib.SequenceMatcher(None, autojunk=False)
+    matcher.set_seq2(wanted)  # Analysis of the block is cached across windows
+    candidates = []
+    for start in range(len(lines) - size + 1):
+        if not (starts_like[start] or ends_like[start + size - 1]):
+            continue
+        matcher.set_seq1("\n".join(stripped[start:start + size]))
+        if matcher.real_quick_ratio() >= FUZZY_THRESHOLD:
+            bound = matcher.quick_ratio()
+            if bound >= FUZZY_THRESHOLD:
+                candidates.append((bound, start))
+
+    # Most promising windows first, so the bound prunes the rest early
+    distance = (lambda start: abs(start - hint)) if hint is not None else (lambda start: 0)
+    candidates.sort(key=lambda candidate: (-candidate[0], distance(candidate[1])))
+    best_start, best_ratio = None, FUZZY_THRESHOLD
+    work = 0
+    for bound, start in candidates:
+        if bound < best_ratio:
+            break
+        window = "\n".join(stripped[start:start + size])
+        work += len(window) * len(wanted)
+        if work > FUZZY_MAX_WORK:
+            logger.warning("[Patcher] Fuzzy search budget exhausted, keeping the best match so far")
+            break
+        matcher.set_seq1(window)
+        ratio = matcher.ratio()
+        closer = best_start is not None and distance(start) < distance(best_start)
+        if ratio > best_ratio or (ratio == best_ratio and closer):
+            best_start, best_ratio = start, ratio
+    return best_start
+
+
+def apply_edit(content: str, edit: Edit) -> str:
+    """Apply one edit, tolerating offset, trailing whitespace, indentation and small drifts"""
+    search = list(edit.search)
+    # Blank lines around the block carry no information and often drift
+    while search and not search[0].strip():
+        search.pop(0)
+    while search and not search[-1].strip():
+        search.pop()
+
+    if not search:
+        if not content.strip():
+            return "\n".join(edit.replace)
+        if edit.hint is None:
+            return content.rstrip("\n") + "\n" + "\n".join(edit.replace)
+        lines = content.splitlines()
+        position = min(edit.hint, len(lines))
+        return "\n".join(lines[:position] + edit.replace + lines[position:])
+
+    had_trailing_newline = content.endswith("\n")
+    lines = content.splitlines()
+    replace = list(edit.replace)
+
+    start = _find_block(lines, search, lambda line: line, edit.hint)
+    if start is None:
+        start = _find_block(lines, search, lambda line: line.rstrip(), edit.hint)
+    if start is None:
+        start = _find_block(lines, search, lambda line: line.strip(), edit.hint)
+        if start is not None:
+            # Re-indent the replacement by the indentation difference
+            actual, expected = _indent(lines[start]), _indent(search[0])
+            if actual.startswith(expected):
+                extra = actual[len(expected):]
+                replace = [extra + line if line.strip() else line for line in replace]
+    if start is None:
+        start = _fuzzy_find(lines, search, edit.hint)
+    if start is None:
+        raise PatchError(f"Could not locate block starting with: {search[0].strip()[:80]!r}")
+
+    # Keep leading/trailing blank lines of the SEARCH out of the match
+    updated = lines[:start] + _trim_blank(edit.search, replace) + lines[start + len(search):]
+    result = "\n".join(updated)
+    return result + "\n" if had_trailing_newline else result
+
+
+def _trim_blank(search: List[str], replace: List[str]) -> List[str]:
+    """Drop the blank lines that were trimmed from the SEARCH side from the REPLACE side too"""
+    leading = 0
+    while leading < len(search) and not search[leading].strip():
+        leading += 1
+    trailing = 0
+    while trailing < len(search) - leading and not search[len(search) - 1 - trailing].strip():
+        trailing += 1
+
+    replace = list(replace)
+    for _ in range(leading):
+        if replace and not replace[0].strip():
+            replace.pop(0)
+    for _ in range(trailing):
+        if replace and not replace[-1].strip():
+            replace.pop()
+    return replace
+
+
+def apply_edits(
+    files: List[Dict[str, str]],
+    edits: Dict[str, List[Edit]]
+) -> Tuple[Dict[str, str], List[str]]:
+    """Apply edits to files
+
+    Returns (new content by filename, filenames whose edits failed). A file is
+    all-or-nothing: if one of its edits fails none are applied.
+    """
+    contents = {f["name"]: f.get("content", "") for f in files}
+    updated: Dict[str, str] = {}
+    failed: List[str] = []
+
+    for name, file_edits in edits.items():
+        content = contents.get(name, "")
+        try:
+            for edit in file_edits:
+                content = apply_edit(content, edit)
+            updated[name] = content
+        except PatchError as e:
+            logger.warning(f"[Patcher] {name}: {str(e)}")
+            failed.append(name)
+
+    return updated, failed
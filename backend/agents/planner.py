@@ -1,5 +1,5 @@
 from .base_agent import BaseAgent
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 import logging
 
@@ -35,6 +35,7 @@ Return your plan in the following JSON format:
       "title": "Step title",
       "description": "What needs to be done",
       "files": ["file1.html", "file2.css"],
+      "depends_on": [],
       "approach": "Technical approach to use"
     }
   ],
@@ -48,6 +49,10 @@ Return your plan in the following JSON format:
   "considerations": ["Edge case 1", "Edge case 2"]
 }
 
+"depends_on" lists the step_number of every earlier step that must be finished first.
+Leave it empty when a step is independent: independent steps are implemented in parallel.
+Give each file to exactly one step.
+
 Be thorough and specific."""
         
         messages = [
@@ -56,27 +61,45 @@ Be thorough and specific."""
         
         logger.info(f"[Planner] Creating execution plan for: {user_request[:100]}...")
         
-        response = await self.call_llm(messages, system_prompt)
+        # With race models, the first response holding a valid plan wins
+        response = await self.race_llm(
+            messages,
+            system_prompt,
+            validate=lambda r: self.parse_plan(r) is not None
+        )
         
-        try:
-            # Try to parse JSON response
-            plan = json.loads(response)
+        plan = self.parse_plan(response)
+        if plan is not None:
             logger.info(f"[Planner] Plan created with {len(plan.get('steps', []))} steps")
             return {
                 "success": True,
                 "plan": plan,
                 "raw_response": response
             }
+        
+        # If not valid JSON, return as text plan
+        logger.warning("[Planner] Response not in JSON format, returning as text")
+        return {
+            "success": True,
+            "plan": {
+                "analysis": response,
+                "steps": [],
+                "files_to_create": [],
+                "considerations": []
+            },
+            "raw_response": response
+        }
+    
+    @staticmethod
+    def parse_plan(response: str) -> Optional[Dict[str, Any]]:
+        """Decode a plan (optionally wrapped in a ```json fence), None if invalid"""
+        text = response.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            plan = json.loads(text)
         except json.JSONDecodeError:
-            # If not valid JSON, return as text plan
-            logger.warning("[Planner] Response not in JSON format, returning as text")
-            return {
-                "success": True,
-                "plan": {
-                    "analysis": response,
-                    "steps": [],
-                    "files_to_create": [],
-                    "considerations": []
-                },
-                "raw_response": response
-            }
+            return None
+        if not isinstance(plan, dict) or not isinstance(plan.get("steps", []), list):
+            return None
+        return plan
@@ -0,0 +1,287 @@
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+import logging
+import math
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Context windows (tokens) by model id prefix, the longest matching prefix wins
+CONTEXT_WINDOWS: Dict[str, int] = {
+    "openai/gpt-4o": 128000,
+    "openai/gpt-4-turbo": 128000,
+    "openai/gpt-4": 8192,
+    "openai/gpt-3.5-turbo": 16385,
+    "openai/o1": 128000,
+    "anthropic/claude": 200000,
+    "google/gemini-flash-1.5": 1000000,
+    "google/gemini-pro-1.5": 2000000,
+    "google/gemini": 1000000,
+    "meta-llama/llama-3.1": 131072,
+    "meta-llama/llama-3": 8192,
+    "mistralai/mistral-large": 128000,
+    "mistralai": 32768,
+    "deepseek": 64000,
+    "qwen": 32768
+}
+DEFAULT_CONTEXT_WINDOW = 32768
+
+# Tokenizer used for every model: exact for OpenAI models, an approximation elsewhere
+ENCODING = "o200k_base"
+# Share of the window kept free to absorb tokenizer differences between providers
+SAFETY_MARGIN = 0.1
+# Characters per token without tiktoken (conservative for code)
+FALLBACK_CHARS_PER_TOKEN = 3
+# Chat format overhead per message
+MESSAGE_OVERHEAD = 4
+# Below this many tokens a file is listed without content
+MIN_FILE_TOKENS = 64
+
+# Declarations kept from an elided region so the model still sees the file's outline
+OUTLINE_LINE = re.compile(
+    r"^\s*(export\s+)?(default\s+)?(async\s+)?(function\b|class\b|def\b|interface\b|"
+    r"(const|let|var)\s+\w+\s*=\s*(async\s*)?(\(|function\b))"
+    r"|^\s*<(section|header|footer|main|nav|form|aside|article)\b"
+    r"|^[^\s].*\{\s*$"
+)
+
+
+class PromptBudget:
+    """Token counting and fitting of prompts to the model's context window
+
+    Prompts that would overflow the window are compacted instead of sent:
+    older conversation turns are replaced by a short digest and the middle of
+    low-priority files is elided (keeping their head, tail and declarations).
+    Nothing is counted when the prompt is obviously small, since a token never
+    spans less than one character.
+    """
+
+    def __init__(self, output_reserve: int = 4096, max_prompt_tokens: int = 0):
+        self.output_reserve = output_reserve
+        self.max_prompt_tokens = max_prompt_tokens  # Cap below the window to save cost (0 = window)
+        self.context_windows: Dict[str, int] = dict(CONTEXT_WINDOWS)
+        self._encoding = None
+        self.compactions = 0
+        self.tokens_removed = 0
+
+    def configure(self, context_windows: Optional[Dict[str, int]] = None, **options):
+        """Update limits; `context_windows` adds to or overrides the built-in table"""
+        for key, value in options.items():
+            if value is not None and hasattr(self, key):
+                setattr(self, key, value)
+        if context_windows:
+            self.context_windows.update({prefix: int(size) for prefix, size in context_windows.items()})
+
+    def warm_up(self) -> bool:
+        """Load the tokenizer (blocking, may download it once): call from a thread at startup
+
+        Until it is loaded, or if it cannot be, token counts are estimated.
+        """
+        if tiktoken is None:
+            logger.info("[PromptBudget] tiktoken not installed, estimating token counts")
+            return False
+        try:
+            self._encoding = tiktoken.get_encoding(ENCODING)
+            return True
+        except Exception as e:
+            logger.warning(f"[PromptBudget] Could not load the {ENCODING} tokenizer, estimating: {str(e)}")
+            return False
+
+    def count_tokens(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN)
+
+    def message_tokens(self, messages: Iterable[Dict[str, Any]]) -> int:
+        return sum(self.count_tokens(m.get("content") or "") + MESSAGE_OVERHEAD for m in messages)
+
+    def context_window(self, model: str) -> int:
+        model = (model or "").split(":")[0]  # "model:free", "model:nitro" share the window
+        matches = [prefix for prefix in self.context_windows if model.startswith(prefix)]
+        return self.context_windows[max(matches, key=len)] if matches else DEFAULT_CONTEXT_WINDOW
+
+    def budget_for(self, model: str) -> int:
+        """Tokens a prompt to `model` may use, leaving room for the answer"""
+        window = self.context_window(model)
+        budget = int(window * (1 - SAFETY_MARGIN)) - min(self.output_reserve, window // 4)
+        if self.max_prompt_tokens > 0:
+            budget = min(budget, self.max_prompt_tokens)
+        return max(budget, 256)
+
+    def elide(self, text: str, max_tokens: int, outline: bool = False) -> str:
+        """Keep the head and tail of `text` within `max_tokens`, eliding the middle
+
+        With `outline`, declaration lines of the elided region are kept too.
+        """
+        tokens = self.count_tokens(text)
+        if tokens <= max_tokens:
+            return text
+        lines = text.splitlines()
+        chars_per_token = len(text) / max(tokens, 1)
+        # Room for the elision marker and the outline
+        keep_chars = int(max(max_tokens - 16, 0) * chars_per_token)
+        outline_chars = keep_chars // 5 if outline else 0
+        head_chars = (keep_chars - outline_chars) * 3 // 5
+        tail_chars = keep_chars - outline_chars - head_chars
+
+        head, size = 0, 0
+        while head < len(lines) and size + len(lines[head]) + 1 <= head_chars:
+            size += len(lines[head]) + 1
+            head += 1
+        tail, size = len(lines), 0
+        while tail > head and size + len(lines[tail - 1]) + 1 <= tail_chars:
+            size += len(lines[tail - 1]) + 1
+            tail -= 1
+
+        kept_outline, size = [], 0
+        for line in lines[head:tail] if outline else []:
+            if OUTLINE_LINE.match(line) and size + len(line) + 1 <= outline_chars:
+                kept_outline.append(line)
+                size += len(line) + 1
+
+        elided = tail - head - len(kept_outline)
+        if not lines[:head] and not lines[tail:] and not kept_outline:
+            # One huge line (minified code): cut by characters
+            cut = max(keep_chars, 0)
+            return f"{text[:cut * 3 // 5]}\n... [{len(text) - cut} characters elided to fit the context window] ...\n{text[len(text) - cut * 2 // 5:]}"
+        marker = f"... [{elided} lines elided to fit the context window] ..."
+        middle = [*kept_outline, marker] if kept_outline else [marker]
+        return "\n".join(lines[:head] + middle + lines[tail:])
+
+    def render_files(
+        self,
+        files: List[Dict[str, Any]],
+        max_tokens: int,
+        priority: Iterable[str] = ()
+    ) -> Tuple[str, List[str]]:
+        """Render files as fenced blocks within `max_tokens`, returning the text and the elided file names
+
+        Files named in `priority` keep their full content first; the others
+        share what is left, the largest ones being elided first.
+        """
+        blocks = {f["name"]: f"File: {f['name']}\n```{f.get('language', '')}\n{f.get('content', '')}\n```" for f in files}
+        joined = "\n\n".join(blocks.values())
+        if len(joined) <= max_tokens:
+            return joined, []
+        sizes = {name: self.count_tokens(block) for name, block in blocks.items()}
+        if sum(sizes.values()) + 2 * len(sizes) <= max_tokens:
+            return joined, []
+
+        priority = set(priority)
+        first = [f for f in files if f["name"] in priority]
+        rest = [f for f in files if f["name"] not in priority]
+        caps: Dict[str, int] = {}
+        remaining = self._water_fill(first, sizes, max_tokens - MIN_FILE_TOKENS * len(rest), caps)
+        self._water_fill(rest, sizes, remaining + MIN_FILE_TOKENS * len(rest), caps)
+
+        rendered, elided = [], []
+        for f in files:
+            name, cap = f["name"], caps[f["name"]]
+            if sizes[name] <= cap:
+                rendered.append(blocks[name])
+                continue
+            elided.append(name)
+            content = f.get("content", "")
+            if cap < MIN_FILE_TOKENS:
+                body = f"... [{len(content.splitlines())} lines omitted to fit the context window] ..."
+            else:
+                body = self.elide(content, cap - 16, outline=True)
+            rendered.append(f"File: {name}\n```{f.get('language', '')}\n{body}\n```")
+
+        text = "\n\n".join(rendered)
+        self._record(sum(sizes.values()), self.count_tokens(text))
+        return text, elided
+
+    @staticmethod
+    def _water_fill(files: List[Dict[str, Any]], sizes: Dict[str, int], budget: int, caps: Dict[str, int]) -> int:
+        """Give small files their full size and split the rest evenly, returning the unused budget"""
+        budget = max(budget, 0)
+        ordered = sorted(files, key=lambda f: sizes[f["name"]])
+        for index, f in enumerate(ordered):
+            share = budget // (len(ordered) - index)
+            caps[f["name"]] = min(sizes[f["name"]], share)
+            budget -= caps[f["name"]]
+        return budget
+
+    def fit_messages(self, messages: List[Dict[str, Any]], model: str, budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Messages fitting the budget of `model` (returned unchanged when they already fit)
+
+        Leading system messages and the last message are kept; the oldest
+        turns in between are dropped first and replaced by a one-line-per-turn
+        digest. If the kept messages alone are still too large, the largest
+        ones are elided in the middle.
+        """
+        budget = budget or self.budget_for(model)
+        if sum(len(m.get("content") or "") for m in messages) <= budget:
+            return messages
+        total = self.message_tokens(messages)
+        if total <= budget or not messages:
+            return messages
+
+        pinned_head = 0
+        while pinned_head < len(messages) - 1 and messages[pinned_head].get("role") == "system":
+            pinned_head += 1
+        head, history, last = messages[:pinned_head], messages[pinned_head:-1], messages[-1:]
+
+        dropped: List[Dict[str, Any]] = []
+        size = total
+        while history and size > budget:
+            turn = history.pop(0)
+            dropped.append(turn)
+            size -= self.count_tokens(turn.get("content") or "") + MESSAGE_OVERHEAD
+        if dropped:
+            digest = self._digest(dropped)
+            size += self.count_tokens(digest) + MESSAGE_OVERHEAD
+            head = [*head, {"role": "system", "content": digest}]
+
+        fitted = [*head, *history, *last]
+        for _ in range(len(fitted)):
+            if size <= budget:
+                break
+            index = max(range(len(fitted)), key=lambda i: len(fitted[i].get("content") or ""))
+            content = fitted[index].get("content") or ""
+            current = self.count_tokens(content)
+            # Leave room for the elision marker so one pass is enough
+            shorter = self.elide(content, max(current - (size - budget) - 32, 64))
+            fitted[index] = {**fitted[index], "content": shorter}
+            size += self.count_tokens(shorter) - current
+
+        self._record(total, size)
+        logger.info(f"[PromptBudget] {model}: prompt compacted from {total} to ~{size} tokens ({len(dropped)} turn(s) digested)")
+        return fitted
+
+    def _digest(self, turns: List[Dict[str, Any]], max_turns: int = 20) -> str:
+        """Short extractive summary of dropped turns (no LLM call, so no added latency)"""
+        lines = [f"Earlier conversation ({len(turns)} message(s) omitted to fit the context window):"]
+        if len(turns) > max_turns:
+            lines.append(f"- ... {len(turns) - max_turns} older message(s)")
+        for turn in turns[-max_turns:]:
+            first_line = next((line.strip() for line in (turn.get("content") or "").splitlines() if line.strip()), "")
+            if len(first_line) > 160:
+                first_line = first_line[:157] + "..."
+            lines.append(f"- {turn.get('role', 'user')}: {first_line}")
+        return "\n".join(lines)
+
+    def _record(self, before: int, after: int):
+        if after < before:
+            self.compactions += 1
+            self.tokens_removed += before - after
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tokenizer": ENCODING if self._encoding is not None else f"estimate ({FALLBACK_CHARS_PER_TOKEN} chars/token)",
+            "output_reserve": self.output_reserve,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "compactions": self.compactions,
+            "tokens_removed": self.tokens_removed
+        }
+
+
+# Instance globale partagée par tous les agents
+prompt_budget = PromptBudget()
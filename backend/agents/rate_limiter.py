@@ -0,0 +1,214 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar, Tuple
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import logging
+import random
+import time
+
+from .llm_client import LLMError, LLMRateLimitError
+from .deadline import current_deadline, MIN_CALL_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Idle lanes are dropped once there are more than this many
+MAX_LANES = 1024
+
+
+class TokenBucket:
+    """Request rate limiter: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        # Waiters are served in arrival order
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Take one token, returning how long the caller waited"""
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                if self.rate <= 0:
+                    break  # Unlimited rate
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        return time.monotonic() - started
+
+    def block(self, seconds: float):
+        """Hold every request back for `seconds` (server asked us to slow down)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+
+class _Lane:
+    """Concurrency slot + token bucket of one (API key, model) pair"""
+
+    def __init__(self, max_concurrency: int, rate: float, burst: float):
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.bucket = TokenBucket(rate, burst)
+        self.waiting = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.wait_total = 0.0
+
+
+class RateLimiter:
+    """Per-API-key and per-model concurrency limit, request rate and retries
+
+    Every LLM call goes through `run()`: it waits for a free slot and a rate
+    token, then retries retryable failures (429, 5xx, timeouts) with jittered
+    exponential backoff. A 429's Retry-After pauses the whole lane so bursts
+    queue up instead of failing.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        rate_per_second: float = 2.0,
+        burst: float = 5.0,
+        max_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lanes: Dict[Tuple[str, str], _Lane] = {}
+
+    def configure(self, **options):
+        """Update limits (lanes are recreated with the new settings)"""
+        for key, value in options.items():
+            if value is not None and hasattr(self, key):
+                setattr(self, key, value)
+        self._lanes.clear()
+
+    @staticmethod
+    def lane_key(api_key: str, model: str) -> Tuple[str, str]:
+        """Lanes are keyed by a digest so raw API keys are never kept or exposed"""
+        return hashlib.sha256((api_key or "").encode()).hexdigest()[:12], model or ""
+
+    def _lane(self, api_key: str, model: str) -> _Lane:
+        key = self.lane_key(api_key, model)
+        lane = self._lanes.get(key)
+        if lane is None:
+            if len(self._lanes) >= MAX_LANES:
+                for idle in [k for k, other in self._lanes.items() if not other.in_flight and not other.waiting]:
+                    del self._lanes[idle]
+            lane = _Lane(self.max_concurrency, self.rate_per_second, self.burst)
+            self._lanes[key] = lane
+        return lane
+
+    @asynccontextmanager
+    async def slot(self, api_key: str, model: str):
+        """Hold one concurrency slot of the lane for the duration of a call"""
+        lane = self._lane(api_key, model)
+        lane.waiting += 1
+        started = time.monotonic()
+        try:
+            await lane.semaphore.acquire()
+        finally:
+            lane.waiting -= 1
+        try:
+            await lane.bucket.acquire()
+            lane.wait_total += time.monotonic() - started
+            lane.in_flight += 1
+            try:
+                yield lane
+            finally:
+                lane.in_flight -= 1
+        finally:
+            lane.semaphore.release()
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def run(
+        self,
+        api_key: str,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        retry_if: Optional[Callable[[LLMError], bool]] = None
+    ) -> T:
+        """Run `call` within the lane's limits, retrying retryable LLM errors
+
+        `retry_if` can veto a retry (e.g. once a stream has emitted tokens).
+        The last error is raised once retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            async with self.slot(api_key, model) as lane:
+                try:
+                    return await call()
+                except LLMError as e:
+                    error = e
+                    if isinstance(e, LLMRateLimitError):
+                        lane.throttled += 1
+                        if e.retry_after:
+                            lane.bucket.block(e.retry_after)
+
+            if not error.retryable or attempt >= self.max_retries or (retry_if and not retry_if(error)):
+                lane.failures += 1
+                raise error
+
+            delay = self.backoff_delay(attempt, getattr(error, "retry_after", None))
+            if delay + MIN_CALL_TIMEOUT >= current_deadline().remaining():
+                # No time left for another attempt within the caller's deadline
+                lane.failures += 1
+                raise error
+            attempt += 1
+            lane.retries += 1
+            logger.warning(
+                f"[RateLimiter] {model}: {type(error).__name__} ({error}), "
+                f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits and per-lane counters"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rate_per_second": self.rate_per_second,
+            "burst": self.burst,
+            "max_retries": self.max_retries,
+            "lanes": [
+                {
+                    "key": key,
+                    "model": model,
+                    "in_flight": lane.in_flight,
+                    "waiting": lane.waiting,
+                    "throttled": lane.throttled,
+                    "retries": lane.retries,
+                    "failures": lane.failures,
+                    "wait_total_s": round(lane.wait_total, 3)
+                }
+                for (key, model), lane in self._lanes.items()
+            ]
+        }
+
+
+# Instance globale partagée par tous les agents
+rate_limiter = RateLimiter()
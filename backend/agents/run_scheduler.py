@@ -0,0 +1,236 @@
+from typing import Dict, Any, Optional, List
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+
+from .metrics import percentile
+from .cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+# Recent queue waits kept per lane for the percentiles
+WAIT_SAMPLES = 500
+
+
+class SchedulerFull(Exception):
+    """The lane's queue is full, the run is refused instead of queued"""
+
+    def __init__(self, lane: str, depth: int):
+        self.lane = lane
+        self.depth = depth
+        super().__init__(f"Too many agentic runs queued in lane '{lane}' ({depth})")
+
+
+class _Waiter:
+    def __init__(self, user_id: str, lane: str):
+        self.user_id = user_id
+        self.lane = lane
+        self.enqueued = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _SchedulerLane:
+    """Queues of one priority lane, one FIFO per user served round-robin"""
+
+    def __init__(self, name: str, weight: float, limit: int = 0):
+        self.name = name
+        self.weight = max(weight, 0.01)
+        self.limit = limit  # Max runs of the lane at once (0 = only the global limit)
+        self.queues: Dict[str, deque] = {}
+        self.users: deque = deque()  # Users with queued runs, in round-robin order
+        self.pass_value = 0.0  # Stride scheduling: lanes with the lowest pass are served first
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.waits: deque = deque(maxlen=WAIT_SAMPLES)
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+
+class RunScheduler:
+    """Admission of agentic runs: global and per-user caps, weighted fair share between lanes
+
+    Each run waits in the lane of its user's tier (admin, active subscriber,
+    trial...). When a slot frees up, lanes are served in proportion to their
+    weight (stride scheduling) and, within a lane, users take turns, so one
+    user with many runs only delays their own.
+    """
+
+    def __init__(
+        self,
+        max_running: int = 16,
+        user_concurrency: int = 2,
+        max_queue: int = 0,
+        lane_weights: Optional[Dict[str, float]] = None,
+        lane_limits: Optional[Dict[str, int]] = None,
+        default_lane: str = "trialing"
+    ):
+        self.max_running = max_running
+        self.user_concurrency = user_concurrency
+        self.max_queue = max_queue
+        self.lane_weights = lane_weights or {"admin": 8.0, "active": 4.0, "trialing": 1.0}
+        self.lane_limits = lane_limits or {}
+        self.default_lane = default_lane
+        self.running = 0
+        self._user_running: Dict[str, int] = {}
+        self._lanes: Dict[str, _SchedulerLane] = {}
+        self._build_lanes()
+
+    def configure(self, **options):
+        """Update limits and lanes (runs already queued or running are kept)"""
+        for key, value in options.items():
+            if value is not None and hasattr(self, key):
+                setattr(self, key, value)
+        self._build_lanes()
+        self._dispatch()
+
+    def _build_lanes(self):
+        for name, weight in self.lane_weights.items():
+            lane = self._lanes.get(name)
+            if lane is None:
+                self._lanes[name] = _SchedulerLane(name, weight, self.lane_limits.get(name, 0))
+            else:
+                lane.weight = max(weight, 0.01)
+                lane.limit = self.lane_limits.get(name, 0)
+
+    def _lane(self, name: Optional[str]) -> _SchedulerLane:
+        return self._lanes.get(name or "") or self._lanes.get(self.default_lane) or next(iter(self._lanes.values()))
+
+    def _user_has_room(self, user_id: str) -> bool:
+        return self.user_concurrency <= 0 or self._user_running.get(user_id, 0) < self.user_concurrency
+
+    def _next_user(self, lane: _SchedulerLane) -> Optional[str]:
+        """First user of the lane, in round-robin order, allowed to start another run"""
+        for user_id in lane.users:
+            if self._user_has_room(user_id):
+                return user_id
+        return None
+
+    def _dispatch(self):
+        """Start queued runs while there are free slots"""
+        while self.max_running <= 0 or self.running < self.max_running:
+            candidates = [
+                (lane, user_id) for lane in self._lanes.values()
+                if lane.users and (lane.limit <= 0 or lane.running < lane.limit)
+                for user_id in [self._next_user(lane)] if user_id is not None
+            ]
+            if not candidates:
+                return
+            lane, user_id = min(candidates, key=lambda candidate: candidate[0].pass_value)
+            lane.pass_value += 1.0 / lane.weight
+
+            queue = lane.queues[user_id]
+            waiter = queue.popleft()
+            lane.users.remove(user_id)
+            if queue:
+                lane.users.append(user_id)  # Back of the line for this user's next run
+            else:
+                del lane.queues[user_id]
+            self._start(waiter)
+            waiter.future.set_result(None)
+
+    def _start(self, waiter: _Waiter):
+        lane = self._lanes[waiter.lane]
+        self.running += 1
+        lane.running += 1
+        lane.admitted += 1
+        lane.waits.append(time.monotonic() - waiter.enqueued)
+        self._user_running[waiter.user_id] = self._user_running.get(waiter.user_id, 0) + 1
+
+    def _release(self, user_id: str, lane_name: str):
+        self.running -= 1
+        self._lanes[lane_name].running -= 1
+        remaining = self._user_running.get(user_id, 1) - 1
+        if remaining > 0:
+            self._user_running[user_id] = remaining
+        else:
+            self._user_running.pop(user_id, None)
+        self._dispatch()
+
+    def _withdraw(self, waiter: _Waiter):
+        """Remove a waiter whose caller gave up before being admitted"""
+        lane = self._lanes[waiter.lane]
+        queue = lane.queues.get(waiter.user_id)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del lane.queues[waiter.user_id]
+                lane.users.remove(waiter.user_id)
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, lane: Optional[str] = None, cancel_token: Optional[CancellationToken] = None):
+        """Wait for the run's turn, then hold its slot until the block exits
+
+        Raises `SchedulerFull` when the lane already has `max_queue` runs
+        waiting, and `RunCancelled` if `cancel_token` fires while queued.
+        """
+        target = self._lane(lane)
+        if self.max_queue > 0 and target.depth >= self.max_queue:
+            target.rejected += 1
+            raise SchedulerFull(target.name, target.depth)
+
+        waiter = _Waiter(user_id, target.name)
+        if not target.users:
+            # An idle lane does not bank credit: it resumes at the pace of the busiest lane
+            busy = [other.pass_value for other in self._lanes.values() if other.users or other.running]
+            target.pass_value = max(target.pass_value, min(busy, default=0.0))
+        target.queues.setdefault(user_id, deque()).append(waiter)
+        if user_id not in target.users:
+            target.users.append(user_id)
+        self._dispatch()
+
+        try:
+            await (cancel_token.run(waiter.future) if cancel_token else waiter.future)
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(user_id, target.name)  # Admitted just as the caller gave up
+            else:
+                self._withdraw(waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release(user_id, target.name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits, queue depth and wait-time percentiles (ms) per lane"""
+        return {
+            "max_running": self.max_running,
+            "user_concurrency": self.user_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": sum(lane.depth for lane in self._lanes.values()),
+            "users_running": len(self._user_running),
+            "lanes": {
+                name: {
+                    "weight": lane.weight,
+                    "limit": lane.limit,
+                    "running": lane.running,
+                    "queued": lane.depth,
+                    "users_queued": len(lane.users),
+                    "admitted": lane.admitted,
+                    "rejected": lane.rejected,
+                    "wait_ms": self._wait_summary(list(lane.waits))
+                }
+                for name, lane in self._lanes.items()
+            }
+        }
+
+    @staticmethod
+    def _wait_summary(waits: List[float]) -> Dict[str, Optional[float]]:
+        if not waits:
+            return {"p50": None, "p95": None, "p99": None, "max": None}
+        return {
+            "p50": round(percentile(waits, 0.5) * 1000, 1),
+            "p95": round(percentile(waits, 0.95) * 1000, 1),
+            "p99": round(percentile(waits, 0.99) * 1000, 1),
+            "max": round(max(waits) * 1000, 1)
+        }
+
+
+# Instance globale partagée par tous les runs
+run_scheduler = RunScheduler()
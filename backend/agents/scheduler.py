@@ -0,0 +1,108 @@
+from typing import Dict, Any, List, Callable, Awaitable
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def step_ids(steps: List[Dict[str, Any]]) -> List[int]:
+    """Return the step numbers, falling back to 1-based positions if missing or duplicated"""
+    ids = []
+    for index, step in enumerate(steps):
+        try:
+            ids.append(int(step.get("step_number", index + 1)))
+        except (TypeError, ValueError):
+            ids.append(index + 1)
+    if len(set(ids)) != len(ids):
+        return list(range(1, len(steps) + 1))
+    return ids
+
+
+def resolve_dependencies(steps: List[Dict[str, Any]]) -> Dict[int, List[int]]:
+    """Map each step number to the step numbers it depends on
+
+    Unknown and self references are dropped. If the graph has a cycle the plan
+    is treated as strictly sequential (each step depends on the previous one).
+    """
+    ids = step_ids(steps)
+    known = set(ids)
+
+    graph: Dict[int, List[int]] = {}
+    for sid, step in zip(ids, steps):
+        deps = step.get("depends_on") or []
+        if not isinstance(deps, list):
+            deps = [deps]
+        cleaned = []
+        for dep in deps:
+            try:
+                dep = int(dep)
+            except (TypeError, ValueError):
+                continue
+            if dep in known and dep != sid and dep not in cleaned:
+                cleaned.append(dep)
+        graph[sid] = cleaned
+
+    if topological_order(graph) is None:
+        logger.warning("[Scheduler] Dependency cycle in plan, falling back to sequential steps")
+        graph = {sid: ([ids[i - 1]] if i > 0 else []) for i, sid in enumerate(ids)}
+
+    return graph
+
+
+def topological_order(graph: Dict[int, List[int]]) -> List[int]:
+    """Deterministic topological order (lowest step number first), None on cycle"""
+    remaining = {sid: set(deps) for sid, deps in graph.items()}
+    order = []
+    while remaining:
+        ready = sorted(sid for sid, deps in remaining.items() if not deps)
+        if not ready:
+            return None
+        current = ready[0]
+        order.append(current)
+        del remaining[current]
+        for deps in remaining.values():
+            deps.discard(current)
+    return order
+
+
+async def run_step_dag(
+    steps: List[Dict[str, Any]],
+    worker: Callable[[Dict[str, Any], List[Any]], Awaitable[Any]],
+    max_concurrency: int = 3
+) -> Dict[int, Any]:
+    """Run plan steps as a DAG
+
+    Each step starts as soon as all of its dependencies have finished, with at
+    most `max_concurrency` steps in flight. `worker(step, dependency_results)`
+    is awaited for every step; the returned dict maps step number to result
+    (or to the exception raised by the worker).
+    """
+    graph = resolve_dependencies(steps)
+    by_id = dict(zip(step_ids(steps), steps))
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    results: Dict[int, Any] = {}
+    done: Dict[int, asyncio.Event] = {sid: asyncio.Event() for sid in graph}
+
+    async def run(sid: int):
+        try:
+            for dep in graph[sid]:
+                await done[dep].wait()
+            async with semaphore:
+                results[sid] = await worker(by_id[sid], [results[dep] for dep in graph[sid]])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Scheduler] Step {sid} failed: {str(e)}")
+            results[sid] = e
+        finally:
+            done[sid].set()
+
+    tasks = [asyncio.create_task(run(sid)) for sid in graph]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    return {sid: results[sid] for sid in topological_order(graph)}
@@ -0,0 +1,560 @@
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import os
+import re
+
+logger = logging.getLogger(__name__)
+
+# Projects whose not-yet-cached sources exceed this size are analysed in a process pool
+PROCESS_POOL_THRESHOLD = 256 * 1024
+PROCESS_POOL_WORKERS = min(4, os.cpu_count() or 1)
+CACHE_MAX_ENTRIES = 2048
+# Stop reporting after this many issues per file (one syntax error tends to cascade)
+MAX_ISSUES_PER_FILE = 5
+
+BRACKETS = {")": "(", "]": "[", "}": "{"}
+# After these tokens a "/" starts a regex literal rather than a division
+REGEX_PRECEDING_KEYWORDS = {
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+    "throw", "case", "do", "else", "yield", "await"
+}
+IDENTIFIER = re.compile(r'[\w$]+')
+
+
+def _issue(severity: str, message: str, line: int = None) -> Dict[str, Any]:
+    issue = {"severity": severity, "message": message}
+    if line is not None:
+        issue["line"] = line
+    return issue
+
+
+# ---------------------------------------------------------------------------
+# JavaScript
+# ---------------------------------------------------------------------------
+
+def check_javascript(source: str) -> List[Dict[str, Any]]:
+    """Tokenizer-aware bracket and literal check
+
+    Strings, template literals (with nested ${...}), comments and regex
+    literals are skipped, so braces inside them are not counted.
+    """
+    issues: List[Dict[str, Any]] = []
+    stack: List[Tuple[str, int]] = []
+    n = len(source)
+    i = 0
+    line = 1
+    last = ""  # last significant token
+
+    def scan_template(i: int, line: int) -> Tuple[int, int, str]:
+        """Scan template text from i; returns (index, line, "end" | "expression" | "eof")"""
+        while i < n:
+            c = source[i]
+            if c == "\\":
+                if i + 1 < n and source[i + 1] == "\n":
+                    line += 1
+                i += 2
+                continue
+            if c == "\n":
+                line += 1
+            elif c == "`":
+                return i + 1, line, "end"
+            elif c == "$" and i + 1 < n and source[i + 1] == "{":
+                return i + 2, line, "expression"
+            i += 1
+        return n, line, "eof"
+
+    while i < n and len(issues) < MAX_ISSUES_PER_FILE:
+        c = source[i]
+
+        if c == "\n":
+            line += 1
+            i += 1
+            continue
+        if c in " \t\r\f\v\ufeff\u00a0":
+            i += 1
+            continue
+
+        nxt = source[i + 1] if i + 1 < n else ""
+
+        # Comments
+        if c == "/" and nxt == "/":
+            end = source.find("\n", i)
+            i = n if end == -1 else end
+            continue
+        if c == "/" and nxt == "*":
+            end = source.find("*/", i + 2)
+            if end == -1:
+                issues.append(_issue("critical", "Unterminated block comment", line))
+                break
+            line += source.count("\n", i, end)
+            i = end + 2
+            continue
+
+        # String literals
+        if c in "'\"":
+            start_line = line
+            i += 1
+            while i < n and source[i] != c:
+                if source[i] == "\\":
+                    if i + 1 < n and source[i + 1] == "\n":
+                        line += 1
+                    i += 2
+                    continue
+                if source[i] == "\n":
+                    break
+                i += 1
+            if i >= n or source[i] != c:
+                issues.append(_issue("critical", "Unterminated string literal", start_line))
+                continue
+            i += 1
+            last = "literal"
+            continue
+
+        # Template literals
+        if c == "`":
+            start_line = line
+            i, line, state = scan_template(i + 1, line)
+            if state == "eof":
+                issues.append(_issue("critical", "Unterminated template literal", start_line))
+                break
+            if state == "expression":
+                stack.append(("${", start_line))
+                last = "{"
+            else:
+                last = "literal"
+            continue
+
+        # Regex literals
+        if c == "/" and (last == "" or last in REGEX_PRECEDING_KEYWORDS or (len(last) == 1 and last in "(,=:[!&|?{};+-*%<>~^")):
+            j = i + 1
+            in_class = False
+            while j < n and source[j] != "\n":
+                ch = source[j]
+                if ch == "\\":
+                    j += 2
+                    continue
+                if ch == "[":
+                    in_class = True
+                elif ch == "]":
+                    in_class = False
+                elif ch == "/" and not in_class:
+                    break
+                j += 1
+            if j < n and source[j] == "/":
+                j += 1
+                while j < n and (source[j].isalpha()):
+                    j += 1
+                i = j
+                last = "literal"
+                continue
+            # Not a regex after all: treat as an operator
+
+        # Brackets
+        if c in "([{":
+            stack.append((c, line))
+            last = c
+            i += 1
+            continue
+        if c in ")]}":
+            if c == "}" and stack and stack[-1][0] == "${":
+                _, start_line = stack.pop()
+                i, line, state = scan_template(i + 1, line)
+                if state == "eof":
+                    issues.append(_issue("critical", "Unterminated template literal", start_line))
+                    break
+                if state == "expression":
+                    stack.append(("${", start_line))
+                    last = "{"
+                else:
+                    last = "literal"
+                continue
+            if not stack:
+                issues.append(_issue("critical", f"Unexpected closing '{c}'", line))
+            elif stack[-1][0] != BRACKETS[c]:
+                opener, opened_at = stack.pop()
+                issues.append(_issue(
+                    "critical",
+                    f"Mismatched '{c}': '{opener}' opened at line {opened_at} is not closed",
+                    line
+                ))
+            else:
+                stack.pop()
+            last = c
+            i += 1
+            continue
+
+        # Identifiers, keywords and numbers
+        match = IDENTIFIER.match(source, i)
+        if match:
+            last = match.group(0)
+            i = match.end()
+            continue
+
+        last = c
+        i += 1
+
+    for opener, opened_at in stack[:MAX_ISSUES_PER_FILE - len(issues)]:
+        if opener == "${":
+            issues.append(_issue("critical", "Unterminated template literal expression", opened_at))
+        else:
+            issues.append(_issue("critical", f"Unclosed '{opener}'", opened_at))
+
+    return issues
+
+
+# ---------------------------------------------------------------------------
+# HTML
+# ---------------------------------------------------------------------------
+
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr"
+}
+# Elements whose end tag may be omitted (HTML5 implied end tags)
+OPTIONAL_END_ELEMENTS = {
+    "html", "head", "body", "p", "li", "dt", "dd", "tr", "td", "th", "thead",
+    "tbody", "tfoot", "colgroup", "option", "optgroup", "rt", "rp", "caption"
+}
+SCRIPT_JS_TYPES = {"", "text/javascript", "application/javascript", "module"}
+
+
+class _StructureParser(HTMLParser):
+    """HTML5 tokenizer-based structure check"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[Tuple[str, int]] = []
+        self.issues: List[Dict[str, Any]] = []
+        self.ids: Dict[str, int] = {}
+        self.tags = set()
+        self.doctype = False
+        self._script: Optional[Tuple[int, List[str]]] = None
+
+    def handle_decl(self, decl):
+        if decl.lower().startswith("doctype html"):
+            self.doctype = True
+
+    def handle_starttag(self, tag, attrs):
+        line = self.getpos()[0]
+        self.tags.add(tag)
+        attributes = dict(attrs)
+
+        element_id = attributes.get("id")
+        if element_id:
+            if element_id in self.ids:
+                self.issues.append(_issue(
+                    "warning",
+                    f"Duplicate id '{element_id}' (first used at line {self.ids[element_id]})",
+                    line
+                ))
+            else:
+                self.ids[element_id] = line
+
+        if tag == "script" and not attributes.get("src") and (attributes.get("type") or "").lower() in SCRIPT_JS_TYPES:
+            self._script = (line, [])
+
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, line))
+
+    def handle_startendtag(self, tag, attrs):
+        self.tags.add(tag)
+
+    def handle_data(self, data):
+        if self._script is not None and self.stack and self.stack[-1][0] == "script":
+            self._script[1].append(data)
+
+    def handle_endtag(self, tag):
+        line = self.getpos()[0]
+        if tag in VOID_ELEMENTS:
+            return
+
+        if tag == "script" and self._script is not None:
+            start_line, parts = self._script
+            self._script = None
+            for issue in check_javascript("".join(parts)):
+                issue = dict(issue)
+                issue["message"] = f"Inline script: {issue['message']}"
+                if "line" in issue:
+                    issue["line"] += start_line - 1
+                self.issues.append(issue)
+
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            self.issues.append(_issue("warning", f"Stray closing tag </{tag}>", line))
+            return
+
+        while self.stack:
+            open_tag, opened_at = self.stack.pop()
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_END_ELEMENTS:
+                self.issues.append(_issue("warning", f"Unclosed <{open_tag}> (opened at line {opened_at})", line))
+
+
+def check_html(source: str) -> List[Dict[str, Any]]:
+    """Document structure checks on top of the HTML tokenizer"""
+    parser = _StructureParser()
+    try:
+        parser.feed(source)
+        parser.close()
+    except Exception as e:
+        return [_issue("critical", f"HTML could not be parsed: {str(e)}")]
+
+    issues = []
+    if not parser.doctype:
+        issues.append(_issue("warning", "Missing DOCTYPE declaration"))
+    if "html" not in parser.tags:
+        issues.append(_issue("critical", "Missing <html> tag"))
+    if "body" not in parser.tags and "head" not in parser.tags:
+        issues.append(_issue("warning", "Missing <head> or <body> tags"))
+
+    for open_tag, opened_at in parser.stack:
+        if open_tag not in OPTIONAL_END_ELEMENTS:
+            parser.issues.append(_issue("warning", f"Unclosed <{open_tag}>", opened_at))
+
+    return issues + parser.issues[:MAX_ISSUES_PER_FILE]
+
+
+# ---------------------------------------------------------------------------
+# CSS
+# ---------------------------------------------------------------------------
+
+# At-rules whose block holds rules rather than declarations
+NESTING_AT_RULES = ("@media", "@supports", "@document", "@layer", "@container", "@scope", "@starting-style")
+
+
+def check_css(source: str) -> List[Dict[str, Any]]:
+    """Tokenizing CSS checker: blocks, strings, comments and declarations"""
+    issues: List[Dict[str, Any]] = []
+    stack: List[Tuple[str, int]] = []  # ("rules" | "declarations", line)
+    segment: List[str] = []
+    segment_line = None  # line of the segment's first non-blank character
+    n = len(source)
+    i = 0
+    line = 1
+
+    def check_declaration(text: str, at_line: int):
+        text = text.strip()
+        if text and stack and stack[-1][0] == "declarations" and ":" not in text and not text.startswith("@"):
+            issues.append(_issue("warning", f"Invalid declaration '{text[:40]}'", at_line))
+
+    while i < n and len(issues) < MAX_ISSUES_PER_FILE:
+        c = source[i]
+
+        if c == "/" and i + 1 < n and source[i + 1] == "*":
+            end = source.find("*/", i + 2)
+            if end == -1:
+                issues.append(_issue("critical", "Unterminated comment", line))
+                break
+            line += source.count("\n", i, end)
+            i = end + 2
+            continue
+
+        if c in "'\"":
+            start_line = line
+            j = i + 1
+            while j < n and source[j] != c and source[j] != "\n":
+                j += 2 if source[j] == "\\" else 1
+            if j >= n or source[j] != c:
+                issues.append(_issue("critical", "Unterminated string", start_line))
+                i = j
+                continue
+            if segment_line is None:
+                segment_line = line
+            segment.append(source[i:j + 1])
+            i = j + 1
+            continue
+
+        if c == "(" and "".join(segment[-3:]).lower() == "url" and source[i + 1:].lstrip()[:1] not in ("'", '"'):
+            # An unquoted url() is one token: ';' and '{' in data URIs are not syntax
+            end = source.find(")", i)
+            end = n - 1 if end == -1 else end
+            line += source.count("\n", i, end)
+            segment.append(source[i:end + 1])
+            i = end + 1
+            continue
+
+        if c == "{":
+            prelude = "".join(segment).strip().lower()
+            kind = "rules" if prelude.startswith(NESTING_AT_RULES) else "declarations"
+            stack.append((kind, line))
+            segment, segment_line = [], None
+        elif c == "}":
+            if not stack:
+                issues.append(_issue("critical", "Unexpected closing '}'", line))
+            else:
+                check_declaration("".join(segment), segment_line or line)
+                stack.pop()
+            segment, segment_line = [], None
+        elif c == ";":
+            check_declaration("".join(segment), segment_line or line)
+            segment, segment_line = [], None
+        else:
+            if segment_line is None and not c.isspace():
+                segment_line = line
+            segment.append(c)
+
+        if c == "\n":
+            line += 1
+        i += 1
+
+    for _, opened_at in stack[:MAX_ISSUES_PER_FILE - len(issues)]:
+        issues.append(_issue("critical", "Unclosed '{'", opened_at))
+
+    return issues
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+LANGUAGE_BY_EXTENSION = {"html": "html", "htm": "html", "js": "javascript", "mjs": "javascript", "css": "css"}
+CHECKERS = {"html": check_html, "javascript": check_javascript, "css": check_css}
+
+_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = set()
+cache_stats = {"hits": 0, "misses": 0}
+
+
+def normalize_language(file: Dict[str, str]) -> str:
+    language = (file.get("language") or "").lower()
+    if language == "js":
+        return "javascript"
+    if language in CHECKERS:
+        return language
+    name = file.get("name", "")
+    return LANGUAGE_BY_EXTENSION.get(name.rsplit(".", 1)[-1].lower() if "." in name else "", language)
+
+
+def content_key(language: str, content: str) -> str:
+    return hashlib.sha256(f"{language}\0{content}".encode("utf-8")).hexdigest()
+
+
+def analyze_source(language: str, content: str) -> List[Dict[str, Any]]:
+    """Analyse one file's content (picklable entry point for the process pool)"""
+    issues = []
+    if not content.strip():
+        return [_issue("warning", "File is empty")]
+    checker = CHECKERS.get(language)
+    if checker:
+        issues.extend(checker(content))
+    return issues
+
+
+def _analyze_batch(items: List[Tuple[str, str]]) -> List[List[Dict[str, Any]]]:
+    return [analyze_source(language, content) for language, content in items]
+
+
+def _remember(results: Dict[str, List[Dict[str, Any]]]):
+    """Store fresh results in the LRU (only from the thread owning the cache, never a worker)"""
+    for key, issues in results.items():
+        _cache[key] = issues
+        _cache.move_to_end(key)
+    while len(_cache) > CACHE_MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def _split_cached(files: List[Dict[str, str]]):
+    """Return (content key per file, cached {key: issues}, uncached {key: (language, content)})
+
+    Cached results are copied out so a later eviction can't drop them from the report.
+    """
+    keys, cached, uncached = [], {}, {}
+    for file in files:
+        language = normalize_language(file)
+        content = file.get("content", "")
+        key = content_key(language, content)
+        keys.append(key)
+        if key in cached or key in uncached:
+            continue
+        if key in _cache:
+            _cache.move_to_end(key)
+            cached[key] = _cache[key]
+            cache_stats["hits"] += 1
+        else:
+            uncached[key] = (language, content)
+            cache_stats["misses"] += 1
+    return keys, cached, uncached
+
+
+def _analyze_uncached(uncached: Dict[str, Tuple[str, str]]) -> Dict[str, List[Dict[str, Any]]]:
+    return {key: analyze_source(language, content) for key, (language, content) in uncached.items()}
+
+
+def _report(files: List[Dict[str, str]], keys: List[str], results: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    issues = []
+    for file, key in zip(files, keys):
+        for issue in results[key]:
+            issues.append({"file": file.get("name", ""), **issue})
+    return {"files_analyzed": len(files), "issues": issues}
+
+
+def analyze_files(files: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Analyse files synchronously, reusing results for unchanged content"""
+    keys, results, uncached = _split_cached(files)
+    fresh = _analyze_uncached(uncached)
+    _remember(fresh)
+    return _report(files, keys, {**results, **fresh})
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS)
+    return _pool
+
+
+async def analyze_files_async(files: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Analyse files off the event loop
+
+    Only content not seen before is analysed; large batches go to a process
+    pool, small ones to a thread. Workers only compute: the cache is read and
+    updated on the event loop.
+    """
+    keys, results, uncached = _split_cached(files)
+    fresh: Dict[str, List[Dict[str, Any]]] = {}
+    if uncached:
+        items = list(uncached.items())
+        size = sum(len(content) for _, (_, content) in items)
+        loop = asyncio.get_running_loop()
+        if size > PROCESS_POOL_THRESHOLD and len(items) > 1:
+            chunks = [items[i::PROCESS_POOL_WORKERS] for i in range(PROCESS_POOL_WORKERS)]
+            chunks = [chunk for chunk in chunks if chunk]
+            try:
+                batches = await asyncio.gather(*[
+                    loop.run_in_executor(_get_pool(), _analyze_batch, [value for _, value in chunk])
+                    for chunk in chunks
+                ])
+                for chunk, chunk_results in zip(chunks, batches):
+                    for (key, _), issues in zip(chunk, chunk_results):
+                        fresh[key] = issues
+            except Exception as e:
+                logger.warning(f"[StaticAnalysis] Process pool failed, analysing in thread: {str(e)}")
+                fresh = await asyncio.to_thread(_analyze_uncached, uncached)
+        else:
+            fresh = await asyncio.to_thread(_analyze_uncached, uncached)
+        _remember(fresh)
+    return _report(files, keys, {**results, **fresh})
+
+
+def prefetch(files: List[Dict[str, str]]):
+    """Warm the cache in the background (e.g. while later files are still streaming)"""
+    try:
+        task = asyncio.get_running_loop().create_task(analyze_files_async(files))
+    except RuntimeError:
+        return
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+def shutdown():
+    """Stop the process pool"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
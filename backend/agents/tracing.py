@@ -0,0 +1,190 @@
+from typing import Dict, Any, Optional, List, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import asyncio
+import time
+
+from .cancellation import RunCancelled
+
+# USD per million (prompt, completion) tokens, used when OpenRouter reports no cost
+model_prices: Dict[str, Tuple[float, float]] = {}
+
+
+def configure_prices(prices: Dict[str, Any]):
+    model_prices.clear()
+    for model, (prompt, completion) in (prices or {}).items():
+        model_prices[model] = (float(prompt), float(completion))
+
+
+def cost_of(model: str, usage: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Cost of a call in USD: reported by OpenRouter, else estimated from `model_prices`"""
+    usage = usage or {}
+    if usage.get("cost") is not None:
+        return float(usage["cost"])
+    prices = model_prices.get(model)
+    if prices is None:
+        return None
+    prompt_tokens = int(usage.get("prompt_tokens") or 0)
+    completion_tokens = int(usage.get("completion_tokens") or 0)
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class Span:
+    """One timed unit of a run: the run itself, a phase, a plan step or an LLM call"""
+
+    def __init__(self, span_id: int, name: str, kind: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.span_id = span_id
+        self.name = name
+        self.kind = kind
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, status: Optional[str] = None, error: Optional[str] = None):
+        if self.end is None:
+            self.end = time.perf_counter()
+        if status:
+            self.status = status
+        if error:
+            self.error = error[:300]
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration * 1000, 1),
+            "status": self.status,
+            "error": self.error,
+            **self.attributes
+        }
+
+
+class RunTrace:
+    """Timeline of one orchestrator execution
+
+    Spans nest through a contextvar (tasks inherit the span they were created
+    in), so parallel plan steps and raced LLM calls land under the right
+    phase.
+    """
+
+    def __init__(self, run_id: Optional[str], **attributes):
+        self.run_id = run_id
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.spans: List[Span] = []
+        self.root = self._new_span("run", "run", None, attributes)
+
+    def _new_span(self, name: str, kind: str, parent: Optional[Span], attributes: Dict[str, Any]) -> Span:
+        span = Span(len(self.spans), name, kind, parent, attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, kind: str = "phase", **attributes):
+        """Time the enclosed block as a child of the current span"""
+        span = self._new_span(name, kind, _current_span.get() or self.root, attributes)
+        reset = _current_span.set(span)
+        try:
+            yield span
+        except (asyncio.CancelledError, RunCancelled) as e:
+            span.finish("cancelled", str(e) or None)
+            raise
+        except BaseException as e:
+            span.finish("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(reset)
+            span.finish()
+
+    def finish(self, status: str, error: Optional[str] = None):
+        self.finished_at = datetime.now(timezone.utc)
+        self.root.finish(status, error)
+
+    def totals(self) -> Dict[str, Any]:
+        """Aggregates over the LLM calls and phases of the run"""
+        calls = [s for s in self.spans if s.kind == "llm"]
+        costs = [s.attributes["cost"] for s in calls if s.attributes.get("cost") is not None]
+        phases: Dict[str, float] = {}
+        for span in self.spans:
+            if span.kind == "phase":
+                phases[span.name] = phases.get(span.name, 0.0) + span.duration * 1000
+        return {
+            "llm_calls": len(calls),
+            "llm_errors": sum(1 for s in calls if s.status == "error"),
+            "cache_hits": sum(1 for s in calls if s.attributes.get("cache_hit")),
+            "prompt_tokens": sum(int(s.attributes.get("prompt_tokens") or 0) for s in calls),
+            "completion_tokens": sum(int(s.attributes.get("completion_tokens") or 0) for s in calls),
+            "cost": round(sum(costs), 6) if costs else None,
+            "queue_ms": round(sum(float(s.attributes.get("queue_ms") or 0) for s in calls), 1),
+            "llm_ms": round(sum(s.duration for s in calls) * 1000, 1),
+            "phases_ms": {name: round(ms, 1) for name, ms in phases.items()}
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "status": self.root.status,
+            "error": self.root.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_ms": round(self.root.duration * 1000, 1),
+            **{key: value for key, value in self.root.attributes.items()},
+            "totals": self.totals(),
+            "spans": [span.to_dict(self.root.start) for span in self.spans[1:]]
+        }
+
+
+_current_trace: ContextVar[Optional[RunTrace]] = ContextVar("agent_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("agent_span", default=None)
+
+
+def current_trace() -> Optional[RunTrace]:
+    return _current_trace.get()
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def trace_scope(trace: RunTrace):
+    """Make `trace` the trace of the enclosed run"""
+    trace_reset = _current_trace.set(trace)
+    span_reset = _current_span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_reset)
+        _current_trace.reset(trace_reset)
+
+
+@contextmanager
+def span(name: str, kind: str = "phase", **attributes):
+    """Span of the current trace (no-op outside of a traced run)"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, kind, **attributes) as current:
+        yield current
+
+
+def annotate(**attributes):
+    """Add attributes to the current span, if any"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
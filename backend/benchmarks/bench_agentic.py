@@ -0,0 +1,485 @@
+"""
+Benchmark du pipeline agentique : runs/s et latences par phase sous concurrence.
+
+Tout tourne dans le processus : l'OrchestratorAgent (cible "orchestrator") ou
+l'endpoint /api/generate/agentic via ASGI (cible "endpoint") appellent le faux
+serveur OpenRouter (fake_openrouter.py) ou rejouent une cassette, sans réseau.
+
+Exemples (depuis backend/) :
+    python -m benchmarks.bench_agentic --concurrency 1,4,16 --runs 32 --output bench.json
+    python -m benchmarks.bench_agentic --profile realistic --target both
+    python -m benchmarks.bench_agentic --cassette cassettes/agentic.jsonl --realtime
+    python -m benchmarks.bench_agentic --output new.json --compare bench.json
+"""
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import httpx  # noqa: E402
+
+import fake_openrouter  # noqa: E402
+from agents.cassette import cassette  # noqa: E402
+from agents.circuit_breaker import circuit_breakers  # noqa: E402
+from agents.llm_cache import llm_cache  # noqa: E402
+from agents.llm_client import llm_client  # noqa: E402
+from agents.metrics import agent_metrics, percentile  # noqa: E402
+from agents.orchestrator import OrchestratorAgent  # noqa: E402
+from agents.rate_limiter import rate_limiter  # noqa: E402
+from agents.run_scheduler import run_scheduler  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("bench_agentic")
+
+FAKE_BASE_URL = "http://fake-openrouter/api/v1"
+
+REQUEST = "Build a landing page for a coffee shop with a menu section and a contact form"
+
+# Progress events opening and closing each phase of a run
+PHASES = {
+    "plan": ("planning", "plan_complete"),
+    "code": ("coding", "code_complete"),
+    "test": ("testing", "test_complete"),
+    "review": ("reviewing", "review_complete")
+}
+
+
+def summarize(samples: List[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    """Percentiles of a list of durations in seconds, in milliseconds"""
+    if not samples:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples) * scale, 2),
+        "p50": round(percentile(samples, 0.5) * scale, 2),
+        "p95": round(percentile(samples, 0.95) * scale, 2),
+        "p99": round(percentile(samples, 0.99) * scale, 2),
+        "max": round(max(samples) * scale, 2)
+    }
+
+
+def phase_durations(events: List[tuple]) -> Dict[str, List[float]]:
+    """Duration of every phase occurrence from (event, timestamp) pairs"""
+    durations: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    opened: Dict[str, float] = {}
+    for event, at in events:
+        for phase, (start, end) in PHASES.items():
+            if event == start:
+                opened[phase] = at
+            elif event == end and phase in opened:
+                durations[phase].append(at - opened.pop(phase))
+    return durations
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of the process"""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        # ru_maxrss is the peak, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+class LoopMonitor:
+    """Samples event-loop lag (oversleep of a short timer) and RSS while a level runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.peak_rss: int = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        ticks = 0
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - started - self.interval))
+            ticks += 1
+            if ticks % 10 == 0:
+                self.peak_rss = max(self.peak_rss, current_rss_bytes() or 0)
+
+    def start(self):
+        self.peak_rss = current_rss_bytes() or 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self.peak_rss = max(self.peak_rss, current_rss_bytes() or 0)
+
+
+class MemoryCheckpointStore:
+    """In-process stand-in for CheckpointService (no Mongo needed for the endpoint target)"""
+
+    def __init__(self):
+        self.runs: Dict[str, Dict[str, Any]] = {}
+
+    async def start(self, run_id: str, request: Dict[str, Any], user_id: Optional[str] = None):
+        self.runs[run_id] = {"run_id": run_id, "status": "running", "phase": None}
+
+    async def save(self, run_id: str, phase: str, state: Dict[str, Any]):
+        self.runs.setdefault(run_id, {"run_id": run_id}).update({**state, "phase": phase})
+
+    async def finish(self, run_id: str, status: str, error: Optional[str] = None):
+        self.runs.setdefault(run_id, {"run_id": run_id}).update({"status": status, "error": error})
+
+    async def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return self.runs.get(run_id)
+
+    async def summary(self, run_id: str) -> Optional[Dict[str, Any]]:
+        return self.runs.get(run_id)
+
+
+class DefaultConfigService:
+    """Stand-in for ConfigService returning the default system config"""
+
+    async def get_agent_role_models(self) -> Dict[str, str]:
+        return {}
+
+    async def get_usage_quotas(self) -> Dict[str, Any]:
+        return {"soft_tokens": 0, "hard_tokens": 0, "soft_run_seconds": 0, "hard_run_seconds": 0}
+
+
+class MemoryUsageStore:
+    """In-process stand-in for UsageService (no quota, usage summed per user)"""
+
+    def __init__(self):
+        self.usage: Dict[str, Dict[str, float]] = {}
+
+    async def check(self, user_id: str, quotas: Dict[str, Any]) -> Dict[str, Any]:
+        return {"state": "ok", "usage": self.usage.get(user_id, {}), "quotas": quotas}
+
+    def record_later(self, user_id: Optional[str], totals: Optional[Dict[str, Any]], run_seconds: float):
+        usage = self.usage.setdefault(user_id or "", {"requests": 0, "tokens": 0, "run_seconds": 0.0})
+        usage["requests"] += 1
+        usage["tokens"] += int((totals or {}).get("prompt_tokens") or 0) + int((totals or {}).get("completion_tokens") or 0)
+        usage["run_seconds"] += run_seconds
+
+
+class OrchestratorTarget:
+    """Runs OrchestratorAgent directly"""
+
+    name = "orchestrator"
+
+    def __init__(self, args):
+        self.args = args
+
+    async def setup(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def run_once(self, index: int) -> Dict[str, Any]:
+        orchestrator = OrchestratorAgent(
+            api_key="bench-key",
+            model=self.args.model,
+            use_cache=False,
+            max_parallel_steps=self.args.parallel_steps,
+            edit_mode=False
+        )
+        events = []
+
+        async def on_progress(event: str, data: dict):
+            events.append((event, time.perf_counter()))
+
+        orchestrator.set_progress_callback(on_progress)
+        if self.args.stream:
+            async def on_token(delta: str, step: int = None):
+                pass
+            orchestrator.set_token_callback(on_token)
+
+        result = await orchestrator.execute(user_request=f"{REQUEST} (run {index})")
+        return {"success": bool(result.get("success")), "error": result.get("error"), "events": events}
+
+
+class EndpointTarget:
+    """POSTs to /api/generate/agentic on the FastAPI app through ASGI"""
+
+    name = "endpoint"
+
+    def __init__(self, args):
+        self.args = args
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def setup(self):
+        # Settings required to import the app; nothing connects to them
+        os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+        os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-used-for-anything")
+        os.environ.setdefault("FRONTEND_URL", "http://localhost:3000")
+        import server
+        from auth import get_current_user
+
+        # Every benchmark run is charged to one synthetic user
+        server.app.dependency_overrides[get_current_user] = lambda: {"user_id": "bench", "email": "bench@devora.local"}
+        if not self.args.mongo:
+            server.checkpoint_service = MemoryCheckpointStore()
+            server.config_service = DefaultConfigService()
+            server.usage_service = MemoryUsageStore()
+            server.trace_service = None
+
+            async def scheduling_lane(user_id, throttled=False):
+                return "active"
+
+            server.scheduling_lane = scheduling_lane
+        # Measure the pipeline, not the admission limits
+        run_scheduler.configure(max_running=0, user_concurrency=0, max_queue=0)
+        self.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=server.app),
+            base_url="http://devora",
+            timeout=None
+        )
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+
+    async def run_once(self, index: int) -> Dict[str, Any]:
+        response = await self.client.post("/api/generate/agentic", json={
+            "message": f"{REQUEST} (run {index})",
+            "model": self.args.model,
+            "api_key": "bench-key",
+            "use_cache": False,
+            "edit_mode": False,
+            "max_parallel_steps": self.args.parallel_steps
+        })
+        if response.status_code != 200:
+            return {"success": False, "error": f"HTTP {response.status_code}: {response.text[:200]}", "events": []}
+        body = response.json()
+        events = [
+            (event["event"], datetime.fromisoformat(event["timestamp"]).timestamp())
+            for event in body.get("progress_events", [])
+        ]
+        return {"success": bool(body.get("success")), "error": body.get("error"), "events": events}
+
+
+async def run_level(target, concurrency: int, runs: int) -> Dict[str, Any]:
+    """Run `runs` workflows with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    durations: List[float] = []
+    phases: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    errors: Dict[str, int] = {}
+    succeeded = 0
+
+    async def one(index: int):
+        nonlocal succeeded
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                outcome = await target.run_once(index)
+            except Exception as e:
+                outcome = {"success": False, "error": f"{type(e).__name__}: {e}", "events": []}
+            durations.append(time.perf_counter() - started)
+        if outcome["success"]:
+            succeeded += 1
+        else:
+            error = str(outcome.get("error"))[:120]
+            errors[error] = errors.get(error, 0) + 1
+        for phase, values in phase_durations(outcome["events"]).items():
+            phases[phase].extend(values)
+
+    calls_before = llm_client.stats()["requests_total"]
+    monitor = LoopMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(runs)))
+    wall = time.perf_counter() - started
+    await monitor.stop()
+
+    return {
+        "target": target.name,
+        "concurrency": concurrency,
+        "runs": runs,
+        "succeeded": succeeded,
+        "failed": runs - succeeded,
+        "errors": errors,
+        "wall_s": round(wall, 3),
+        "runs_per_sec": round(succeeded / wall, 3) if wall else None,
+        "latency_ms": {
+            "run": summarize(durations),
+            **{phase: summarize(values) for phase, values in phases.items()}
+        },
+        "loop_lag_ms": summarize(monitor.lags),
+        "peak_rss_mb": round(monitor.peak_rss / 1024 / 1024, 1) if monitor.peak_rss else None,
+        "llm_requests": llm_client.stats()["requests_total"] - calls_before
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=Path(__file__).parent
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def print_level(level: Dict[str, Any]):
+    latency = level["latency_ms"]
+    print(
+        f"{level['target']:>12} c={level['concurrency']:<4} "
+        f"{level['runs_per_sec']:>8} runs/s  ok={level['succeeded']}/{level['runs']}  "
+        f"run p50/p95/p99={latency['run']['p50']}/{latency['run']['p95']}/{latency['run']['p99']}ms  "
+        f"loop lag p99={level['loop_lag_ms']['p99']}ms  rss={level['peak_rss_mb']}MB"
+    )
+    phases = "  ".join(
+        f"{phase} p50/p95={latency[phase]['p50']}/{latency[phase]['p95']}"
+        for phase in PHASES if latency[phase]["count"]
+    )
+    print(f"{'':>12} {phases}")
+    if level["errors"]:
+        print(f"{'':>12} errors: {level['errors']}")
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> bool:
+    """Print throughput and p95 deltas against a baseline; True if nothing regressed"""
+    previous = {(l["target"], l["concurrency"]): l for l in baseline.get("levels", [])}
+    print(f"\nCompared with {baseline.get('meta', {}).get('commit') or 'baseline'} (threshold {threshold:.0%}):")
+    if baseline.get("meta", {}).get("source") != results["meta"]["source"]:
+        print(f"  warning: baseline ran against {baseline.get('meta', {}).get('source')}, not {results['meta']['source']}")
+    ok = True
+    for level in results["levels"]:
+        base = previous.get((level["target"], level["concurrency"]))
+        if not base:
+            continue
+        checks = [
+            ("runs/s", base["runs_per_sec"], level["runs_per_sec"], False),
+            ("run p95", base["latency_ms"]["run"]["p95"], level["latency_ms"]["run"]["p95"], True),
+            ("loop lag p99", base["loop_lag_ms"]["p99"], level["loop_lag_ms"]["p99"], True)
+        ]
+        for label, old, new, lower_is_better in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change > threshold if lower_is_better else change < -threshold
+            # Sub-millisecond loop lag is noise
+            if label == "loop lag p99" and new < 1.0:
+                regressed = False
+            ok = ok and not regressed
+            print(
+                f"  {level['target']:>12} c={level['concurrency']:<4} {label:<13} "
+                f"{old} -> {new} ({change:+.1%}){'  REGRESSION' if regressed else ''}"
+            )
+    return ok
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the agentic pipeline in-process")
+    parser.add_argument("--target", choices=["orchestrator", "endpoint", "both"], default="orchestrator")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--runs", type=int, default=None, help="Runs per level (default: 4 x concurrency, at least 8)")
+    parser.add_argument("--warmup", type=int, default=2, help="Unmeasured runs before the first level")
+    parser.add_argument("--profile", default="fast", help="fake_openrouter latency profile")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the fake server (reproducible failures)")
+    parser.add_argument("--cassette", help="Replay this cassette instead of using the fake server")
+    parser.add_argument("--realtime", action="store_true", help="Replay the cassette at recorded speed")
+    parser.add_argument("--model", default=None, help="Model name (default: fake/<profile>)")
+    parser.add_argument("--stream", action="store_true", help="Stream coder tokens (orchestrator target)")
+    parser.add_argument("--parallel-steps", type=int, default=3)
+    parser.add_argument("--llm-concurrency", type=int, default=1024, help="Rate limiter slots per (key, model)")
+    parser.add_argument("--llm-rate", type=float, default=0.0, help="Rate limiter requests/s (0 = unlimited)")
+    parser.add_argument("--mongo", action="store_true", help="Endpoint target: use the real Mongo services")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="Allowed relative regression")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    args.model = args.model or f"fake/{args.profile}"
+    levels = [int(value) for value in args.concurrency.split(",") if value.strip()]
+
+    # Measure the pipeline, not the per-key throttling or the response cache
+    llm_cache.configure(enabled=False)
+    rate_limiter.configure(max_concurrency=args.llm_concurrency, rate_per_second=args.llm_rate)
+    circuit_breakers.reset()
+    agent_metrics.reset()
+
+    if args.cassette:
+        cassette.configure(mode="replay", path=args.cassette, realtime=args.realtime)
+    else:
+        fake_openrouter.fake.default_profile = args.profile
+        fake_openrouter.fake.rng.seed(args.seed)
+        llm_client._client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake_openrouter.app),
+            base_url=FAKE_BASE_URL,
+            timeout=httpx.Timeout(120.0)
+        )
+
+    names = ["orchestrator", "endpoint"] if args.target == "both" else [args.target]
+    targets = [OrchestratorTarget(args) if name == "orchestrator" else EndpointTarget(args) for name in names]
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "source": f"cassette:{args.cassette}" if args.cassette else f"fake:{args.profile}",
+            "model": args.model,
+            "stream": args.stream,
+            "llm_concurrency": args.llm_concurrency,
+            "llm_rate": args.llm_rate
+        },
+        "levels": []
+    }
+
+    try:
+        for target in targets:
+            await target.setup()
+            for index in range(args.warmup):
+                await target.run_once(-1 - index)
+            for concurrency in levels:
+                runs = args.runs or max(8, concurrency * 4)
+                level = await run_level(target, concurrency, runs)
+                results["levels"].append(level)
+                print_level(level)
+    finally:
+        for target in targets:
+            await target.close()
+        await llm_client.close()
+
+    results["agent_metrics"] = agent_metrics.stats()
+    if not args.cassette:
+        results["fake_server"] = fake_openrouter.fake.stats()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,115 @@
+"""
+Service de checkpoints des runs agentiques.
+Chaque phase terminée (plan, code, test, review) est persistée dans `agent_checkpoints`
+pour pouvoir reprendre un run depuis la dernière phase réussie.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+from typing import Dict, Any, Optional
+from datetime import datetime, timezone, timedelta
+
+# Per-phase state written by save(), cleared when a run id is reused
+PHASE_STATE = ("plan", "iteration", "files", "changed_files", "incremental", "test_result", "review", "history")
+
+
+class RunIdConflict(Exception):
+    """The run id belongs to another user's run, or to a run still executing"""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        super().__init__(f"Run id {run_id} is already in use")
+
+
+class CheckpointService:
+    """Store of orchestrator checkpoints, one document per run"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, ttl_seconds: int = 7 * 86400):
+        self.db = db
+        self.collection = db.agent_checkpoints
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self):
+        """Unique run id + TTL on the last update"""
+        await self.collection.create_index("run_id", unique=True)
+        await self.collection.create_index("updated_at", expireAfterSeconds=self.ttl_seconds)
+
+    async def start(self, run_id: str, request: Dict[str, Any], user_id: Optional[str] = None):
+        """Register a new run with the options needed to resume it (never the API key)
+
+        Raises `RunIdConflict` when the id is taken by another user's run or by
+        a run still executing: the upsert then collides with the unique index
+        instead of taking the existing checkpoint over. Reusing the id of a
+        finished run starts over: the previous run's phases are dropped.
+        """
+        now = datetime.now(timezone.utc)
+        try:
+            await self.collection.update_one(
+                {"run_id": run_id, "user_id": user_id, "status": {"$ne": "running"}},
+                {
+                    "$set": {
+                        "request": {k: v for k, v in request.items() if k != "api_key"},
+                        "user_id": user_id,
+                        "status": "running",
+                        "phase": None,
+                        "error": None,
+                        "updated_at": now
+                    },
+                    "$unset": {field: "" for field in PHASE_STATE},
+                    "$setOnInsert": {"run_id": run_id, "created_at": now}
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            raise RunIdConflict(run_id)
+
+    async def claim_resume(self, run_id: str, user_id: Optional[str], stale_seconds: float) -> bool:
+        """Mark a run of `user_id` running again, unless it is already executing
+
+        A run still "running" without a checkpoint for `stale_seconds` is
+        taken to be interrupted (its process died) and may be resumed.
+        """
+        now = datetime.now(timezone.utc)
+        result = await self.collection.update_one(
+            {
+                "run_id": run_id,
+                "user_id": user_id,
+                "$or": [
+                    {"status": {"$ne": "running"}},
+                    {"updated_at": {"$lt": now - timedelta(seconds=stale_seconds)}}
+                ]
+            },
+            {"$set": {"status": "running", "error": None, "updated_at": now}}
+        )
+        return result.matched_count > 0
+
+    async def save(self, run_id: str, phase: str, state: Dict[str, Any]):
+        """Record a completed phase; `state` fields overwrite the previous ones"""
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"run_id": run_id},
+            {
+                "$set": {**state, "phase": phase, "status": "running", "updated_at": now},
+                "$push": {"history": {"phase": phase, "iteration": state.get("iteration"), "at": now}},
+                "$setOnInsert": {"run_id": run_id, "created_at": now}
+            },
+            upsert=True
+        )
+
+    async def finish(self, run_id: str, status: str, error: Optional[str] = None):
+        """Mark a run completed or failed (failed runs can be resumed)"""
+        await self.collection.update_one(
+            {"run_id": run_id},
+            {"$set": {"status": status, "error": error, "updated_at": datetime.now(timezone.utc)}}
+        )
+
+    async def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Latest checkpoint of a run"""
+        return await self.collection.find_one({"run_id": run_id}, {"_id": 0, "history": 0})
+
+    async def summary(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Run status and phase history, without the heavy state"""
+        return await self.collection.find_one(
+            {"run_id": run_id},
+            {"_id": 0, "run_id": 1, "status": 1, "phase": 1, "iteration": 1, "error": 1,
+             "history": 1, "created_at": 1, "updated_at": 1, "user_id": 1}
+        )
@@ -3,7 +3,7 @@ Configuration centralisée pour l'application Devora.
 Charge les variables d'environnement et fournit une interface unique pour accéder aux configs.
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Optional, Dict, List
 from pathlib import Path
 
 
@@ -37,6 +37,70 @@ class Settings(BaseSettings):
     APP_NAME: str = "Devora"
     FRONTEND_URL: str  # Must be set in environment variables
     
+    # OpenRouter HTTP pool (client partagé par tous les agents)
+    OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"  # http://localhost:4600/api/v1 pour fake_openrouter.py
+    OPENROUTER_MAX_CONNECTIONS: int = 100
+    OPENROUTER_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    OPENROUTER_KEEPALIVE_EXPIRY: float = 30.0
+    OPENROUTER_HTTP2: bool = True
+    
+    # Cache des réponses LLM (LRU mémoire + collection Mongo avec TTL)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_MAX_ENTRIES: int = 512
+    LLM_CACHE_TTL_SECONDS: int = 86400
+    
+    # Enregistrement / rejeu des appels LLM (benchmarks hors ligne) : off, record ou replay
+    LLM_CASSETTE_MODE: str = "off"
+    LLM_CASSETTE_PATH: str = "cassettes/agentic.jsonl"
+    LLM_CASSETTE_REALTIME: bool = False  # Rejoue avec les latences enregistrées
+    
+    # Limites d'appels LLM par clé API et par modèle (file d'attente + retries)
+    LLM_MAX_CONCURRENCY: int = 4
+    LLM_RATE_PER_SECOND: float = 2.0  # 0 = pas de limite de débit
+    LLM_RATE_BURST: float = 5.0
+    LLM_MAX_RETRIES: int = 4
+    LLM_BACKOFF_BASE: float = 1.0
+    LLM_BACKOFF_MAX: float = 30.0
+    
+    # Circuit breaker par modèle + modèles de repli (LLM_FALLBACK_MODELS au format JSON)
+    LLM_BREAKER_WINDOW_SECONDS: float = 60.0
+    LLM_BREAKER_MIN_CALLS: int = 5
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_SLOW_CALL_SECONDS: float = 60.0  # Temps jusqu'au premier token pour les streams
+    LLM_BREAKER_SLOW_RATE: float = 0.8
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0
+    LLM_FALLBACK_MODEL: Optional[str] = None
+    LLM_FALLBACK_MODELS: Dict[str, str] = {}
+    
+    # Orchestrateur agentique
+    AGENT_MAX_PARALLEL_STEPS: int = 3
+    AGENT_JOB_WORKERS: int = 4  # Runs agentiques exécutés en parallèle par instance (0 = API sans workers, voir worker.py)
+    AGENT_JOB_LEASE_SECONDS: float = 60.0  # Bail d'un run en cours, renouvelé par heartbeat ; remis en file à expiration
+    AGENT_JOB_POLL_SECONDS: float = 1.0  # Intervalle de scrutation de la file par les workers inactifs
+    AGENT_JOB_MAX_ATTEMPTS: int = 3  # Tentatives avant d'abandonner un run dont le bail expire à chaque fois
+    AGENT_JOB_TTL_SECONDS: int = 7 * 86400  # Durée de conservation des runs terminés (et de leurs résultats)
+    AGENT_RACE_MODELS: List[str] = ["anthropic/claude-3.5-sonnet", "google/gemini-flash-1.5"]  # Mode "race" (JSON)
+    AGENT_RACE_MAX_MODELS: int = 3  # Modèles mis en course en plus du modèle principal
+    AGENT_CHECKPOINT_TTL_SECONDS: int = 7 * 86400  # Durée de conservation des checkpoints de runs
+    AGENT_RESUME_STALE_SECONDS: int = 3600  # Un run "running" sans checkpoint depuis ce délai est repris comme interrompu
+    AGENT_DEFAULT_DEADLINE_SECONDS: Optional[float] = None  # Budget temps par défaut d'un run (None = illimité)
+    AGENT_TRACE_TTL_SECONDS: int = 30 * 86400  # Durée de conservation des traces de runs (agent_runs)
+    AGENT_THROTTLED_CONCURRENCY: int = 2  # Runs simultanés des utilisateurs au-delà de leur quota "soft" (par instance)
+    
+    # Ordonnanceur des runs agentiques (par instance)
+    AGENT_SCHEDULER_MAX_RUNS: int = 16  # Runs exécutés simultanément, les suivants attendent leur tour (0 = illimité)
+    AGENT_SCHEDULER_USER_CONCURRENCY: int = 2  # Runs simultanés par utilisateur (0 = illimité)
+    AGENT_SCHEDULER_MAX_QUEUE: int = 200  # Runs en attente par file avant refus en 503 (0 = illimité)
+    AGENT_SCHEDULER_LANE_WEIGHTS: Dict[str, float] = {"admin": 8, "active": 4, "trialing": 1, "throttled": 1}  # Part de chaque file (JSON)
+    
+    # Prix en USD par million de tokens [prompt, completion] par modèle (JSON), quand OpenRouter ne renvoie pas le coût
+    LLM_MODEL_PRICES: Dict[str, List[float]] = {}
+    
+    # Budget de tokens des prompts : les prompts trop longs sont compactés au lieu d'être rejetés
+    LLM_CONTEXT_WINDOWS: Dict[str, int] = {}  # Fenêtre de contexte par préfixe de modèle (JSON), complète la table intégrée
+    LLM_OUTPUT_RESERVE_TOKENS: int = 4096  # Tokens laissés libres pour la réponse
+    LLM_MAX_PROMPT_TOKENS: int = 0  # Plafond de tokens par prompt, pour limiter le coût (0 = fenêtre du modèle)
+    
     # Emergent LLM
     EMERGENT_LLM_KEY: Optional[str] = None
 
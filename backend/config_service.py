@@ -4,7 +4,7 @@ Les configurations Stripe/Resend peuvent être modifiées via l'admin panel.
 """
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models import SystemConfig, SystemConfigUpdate
-from typing import Optional
+from typing import Optional, Dict
 from datetime import datetime, timezone
 
 
@@ -73,3 +73,18 @@ class ConfigService:
             "free_trial_days": config.free_trial_days,
             "max_failed_payments": config.max_failed_payments
         }
+    
+    async def get_agent_role_models(self) -> Dict[str, str]:
+        """Retourne le modèle configuré pour chaque rôle d'agent"""
+        config = await self.get_config()
+        return config.agent_role_models
+    
+    async def get_usage_quotas(self) -> dict:
+        """Retourne les quotas journaliers d'usage agentique (0 = illimité)"""
+        config = await self.get_config()
+        return {
+            "soft_tokens": config.usage_soft_daily_tokens,
+            "hard_tokens": config.usage_hard_daily_tokens,
+            "soft_run_seconds": config.usage_soft_daily_run_seconds,
+            "hard_run_seconds": config.usage_hard_daily_run_seconds
+        }
@@ -0,0 +1,441 @@
+"""
+Faux serveur OpenRouter pour les benchmarks et tests de charge, sans consommer de tokens.
+Implémente /api/v1/chat/completions (streaming SSE ou non) et /api/v1/models avec des
+profils de latence et d'erreurs configurables.
+
+Lancement :
+    uvicorn fake_openrouter:app --port 4600
+puis démarrer le backend avec OPENROUTER_BASE_URL=http://localhost:4600/api/v1
+
+Variables d'environnement :
+    FAKE_OPENROUTER_PROFILE  profil par défaut (instant, fast, realistic, slow, flaky, throttled)
+    FAKE_OPENROUTER_SCRIPT   fichier JSON de réponses scriptées (voir `ScriptRule`)
+    FAKE_OPENROUTER_SEED     graine du générateur aléatoire (runs reproductibles)
+
+Un modèle nommé `fake/<profil>` utilise ce profil quel que soit le profil par défaut.
+"""
+from fastapi import FastAPI, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Dict, Any, List, Optional
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Latencies are {"dist": "fixed|uniform|normal|lognormal", ...} (seconds)
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "instant": {
+        "first_token": {"dist": "fixed", "value": 0.0},
+        "tokens_per_second": 0
+    },
+    "fast": {
+        "first_token": {"dist": "uniform", "low": 0.02, "high": 0.08},
+        "tokens_per_second": 2000
+    },
+    "realistic": {
+        "first_token": {"dist": "lognormal", "median": 0.8, "sigma": 0.5},
+        "tokens_per_second": 80
+    },
+    "slow": {
+        "first_token": {"dist": "uniform", "low": 4.0, "high": 12.0},
+        "tokens_per_second": 20
+    },
+    "flaky": {
+        "first_token": {"dist": "lognormal", "median": 0.8, "sigma": 0.5},
+        "tokens_per_second": 80,
+        "error_rate": 0.1,
+        "timeout_rate": 0.03,
+        "stream_abort_rate": 0.03
+    },
+    "throttled": {
+        "first_token": {"dist": "uniform", "low": 0.02, "high": 0.08},
+        "tokens_per_second": 2000,
+        "rate_limit_rate": 0.3,
+        "retry_after": 1
+    }
+}
+
+PROFILE_DEFAULTS = {
+    "first_token": {"dist": "fixed", "value": 0.0},
+    "tokens_per_second": 0,      # 0 = whole completion at once
+    "chunk_tokens": 4,           # Tokens per SSE chunk
+    "error_rate": 0.0,           # 500/502/503 before any output
+    "rate_limit_rate": 0.0,      # 429 with Retry-After
+    "retry_after": 1,
+    "timeout_rate": 0.0,         # Hang for `hang_seconds` (the client times out first)
+    "hang_seconds": 300.0,
+    "stream_abort_rate": 0.0     # Error chunk halfway through a stream
+}
+
+DEFAULT_FILES = ["index.html", "styles.css", "script.js"]
+
+FILE_TEMPLATES = {
+    "html": (
+        "html",
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n  <meta charset=\"UTF-8\">\n"
+        "  <title>Fake page</title>\n  <link rel=\"stylesheet\" href=\"styles.css\">\n</head>\n"
+        "<body>\n  <main id=\"app\">\n    <h1>Hello from the fake LLM</h1>\n  </main>\n"
+        "  <script src=\"script.js\"></script>\n</body>\n</html>"
+    ),
+    "css": (
+        "css",
+        "body {\n  margin: 0;\n  font-family: sans-serif;\n}\n\n#app {\n  padding: 2rem;\n}"
+    ),
+    "js": (
+        "javascript",
+        "document.addEventListener('DOMContentLoaded', () => {\n"
+        "  const app = document.getElementById('app');\n"
+        "  app.dataset.ready = 'true';\n});"
+    )
+}
+
+
+def sample_latency(spec: Dict[str, Any], rng: random.Random) -> float:
+    """Draw one latency (seconds, never negative) from a distribution spec"""
+    dist = spec.get("dist", "fixed")
+    if dist == "uniform":
+        value = rng.uniform(spec.get("low", 0.0), spec.get("high", 0.0))
+    elif dist == "normal":
+        value = rng.gauss(spec.get("mean", 0.0), spec.get("stddev", 0.0))
+    elif dist == "lognormal":
+        value = rng.lognormvariate(math.log(max(spec.get("median", 1.0), 1e-6)), spec.get("sigma", 0.0))
+    else:
+        value = spec.get("value", 0.0)
+    return max(0.0, min(value, spec.get("max", math.inf)))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def split_tokens(text: str) -> List[str]:
+    """Pseudo-tokens of ~4 characters"""
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def detect_role(messages: List[Dict[str, Any]]) -> str:
+    """Agent role of a request, from its system prompt"""
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    if "software architect and planner" in system:
+        return "planner"
+    if "editing an existing project" in system:
+        return "editor"
+    if "full-stack developer" in system:
+        return "coder"
+    if "providing fix instructions" in system:
+        return "reviewer"
+    if "expert code reviewer" in system:
+        return "tester"
+    return "chat"
+
+
+def requested_files(prompt: str) -> List[str]:
+    """Files the coder is asked to output, most specific instruction first"""
+    match = re.search(r"Only output these files: ([^\n]+?)\.\s*$", prompt, re.MULTILINE)
+    if match:
+        return [name.strip() for name in match.group(1).split(",") if name.strip()]
+    names = re.findall(r"^File: (\S+)$", prompt, re.MULTILINE)
+    if names:
+        return list(dict.fromkeys(names))
+    names = re.findall(r"\"([\w./-]+\.(?:html|css|js))\"", prompt)
+    return list(dict.fromkeys(names)) or list(DEFAULT_FILES)
+
+
+def code_blocks(files: List[str]) -> str:
+    blocks = []
+    for name in files:
+        extension = name.rsplit(".", 1)[-1]
+        language, body = FILE_TEMPLATES.get(extension, FILE_TEMPLATES["js"])
+        blocks.append(f"```{language}\n// filename: {name}\n{body}\n```")
+    return "\n\n".join(blocks)
+
+
+def templated_response(messages: List[Dict[str, Any]]) -> str:
+    """Plausible answer for each agent role of the orchestrator"""
+    role = detect_role(messages)
+    prompt = (messages[-1].get("content") or "") if messages else ""
+    if role == "planner":
+        return json.dumps({
+            "analysis": "Static page with styles and a script (fake response)",
+            "steps": [
+                {"step_number": 1, "title": "Markup and styles", "description": "Page structure",
+                 "files": ["index.html", "styles.css"], "depends_on": [], "approach": "HTML5 + CSS"},
+                {"step_number": 2, "title": "Behaviour", "description": "Client-side script",
+                 "files": ["script.js"], "depends_on": [], "approach": "ES6"}
+            ],
+            "files_to_create": [
+                {"name": name, "purpose": "Fake file", "language": FILE_TEMPLATES[name.rsplit(".", 1)[-1]][0]}
+                for name in DEFAULT_FILES
+            ],
+            "considerations": []
+        }, indent=2)
+    if role in ("coder", "editor"):
+        return "Here is the code.\n\n" + code_blocks(requested_files(prompt))
+    if role == "tester":
+        return json.dumps({"overall_quality": "good", "issues": [], "suggestions": []})
+    if role == "reviewer":
+        return "No changes needed: the reported issues are false positives of the fake server."
+    return "Here is the code.\n\n" + code_blocks(["index.html"])
+
+
+class ScriptRule:
+    """One scripted answer: the first rule matching a request wins
+
+    JSON fields: `role` (planner, coder, editor, tester, reviewer, chat),
+    `model`, `contains` (substring of any message) and `regex` select the
+    requests; `content` is the completion, or `status` (+ `body`,
+    `retry_after`) returns an error. `profile` overrides the latency profile.
+    """
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.role = rule.get("role")
+        self.model = rule.get("model")
+        self.contains = rule.get("contains")
+        self.regex = re.compile(rule["regex"], re.DOTALL) if rule.get("regex") else None
+        self.content = rule.get("content")
+        self.status = rule.get("status")
+        self.body = rule.get("body", "")
+        self.retry_after = rule.get("retry_after")
+        self.profile = rule.get("profile")
+        self.hits = 0
+
+    def matches(self, model: str, messages: List[Dict[str, Any]]) -> bool:
+        if self.model and self.model != model:
+            return False
+        if self.role and self.role != detect_role(messages):
+            return False
+        text = "\n".join(m.get("content") or "" for m in messages)
+        if self.contains and self.contains not in text:
+            return False
+        return not (self.regex and not self.regex.search(text))
+
+
+class FakeOpenRouter:
+    """State of the fake server: profiles, scripted rules and counters"""
+
+    def __init__(self, profile: str = "fast", script_path: Optional[str] = None, seed: Optional[int] = None):
+        self.default_profile = profile
+        self.custom_profiles: Dict[str, Dict[str, Any]] = {}
+        self.rules: List[ScriptRule] = []
+        self.rng = random.Random(seed)
+        self.counters: Dict[str, int] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        if script_path:
+            self.load_script(script_path)
+
+    def load_script(self, path: str):
+        with open(path, encoding="utf-8") as handle:
+            self.rules = [ScriptRule(rule) for rule in json.load(handle)]
+        logger.info(f"[FakeOpenRouter] Loaded {len(self.rules)} scripted rule(s) from {path}")
+
+    def profile(self, name: Optional[str]) -> Dict[str, Any]:
+        name = name or self.default_profile
+        profile = self.custom_profiles.get(name) or PROFILES.get(name)
+        if profile is None:
+            logger.warning(f"[FakeOpenRouter] Unknown profile '{name}', using 'fast'")
+            profile = PROFILES["fast"]
+        return {**PROFILE_DEFAULTS, **profile}
+
+    def count(self, key: str):
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_profile": self.default_profile,
+            "profiles": sorted({*PROFILES, *self.custom_profiles}),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "counters": dict(sorted(self.counters.items())),
+            "rules": [{"role": r.role, "model": r.model, "contains": r.contains, "hits": r.hits} for r in self.rules]
+        }
+
+
+fake = FakeOpenRouter(
+    profile=os.environ.get("FAKE_OPENROUTER_PROFILE", "fast"),
+    script_path=os.environ.get("FAKE_OPENROUTER_SCRIPT") or None,
+    seed=int(os.environ["FAKE_OPENROUTER_SEED"]) if os.environ.get("FAKE_OPENROUTER_SEED") else None
+)
+
+app = FastAPI(title="Fake OpenRouter")
+
+
+def error_response(status_code: int, message: str, retry_after: Optional[float] = None) -> JSONResponse:
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"code": status_code, "message": message}},
+        headers=headers
+    )
+
+
+def sse(data: Any) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+@app.get("/api/v1/models")
+async def list_models():
+    names = ["fake/" + name for name in sorted({*PROFILES, *fake.custom_profiles})]
+    return {"data": [{"id": name, "name": name, "context_length": 128000} for name in names]}
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request, payload: Dict[str, Any] = Body(...)):
+    model = payload.get("model") or "fake/default"
+    messages = payload.get("messages") or []
+    role = detect_role(messages)
+    fake.count(f"requests.{role}")
+
+    rule = next((r for r in fake.rules if r.matches(model, messages)), None)
+    profile_name = request.headers.get("x-fake-profile")
+    if rule and rule.profile:
+        profile_name = rule.profile
+    elif not profile_name and model.startswith("fake/"):
+        profile_name = model.split("/", 1)[1]
+    profile = fake.profile(profile_name)
+    rng = fake.rng
+
+    if rule:
+        rule.hits += 1
+        if rule.status:
+            fake.count(f"errors.{rule.status}")
+            return error_response(rule.status, rule.body or "Scripted error", rule.retry_after)
+
+    # Injected failures are decided up front so a run with a seed is reproducible
+    roll = rng.random()
+    if roll < profile["rate_limit_rate"]:
+        fake.count("errors.429")
+        return error_response(429, "Rate limit exceeded (fake)", profile["retry_after"])
+    roll -= profile["rate_limit_rate"]
+    if roll < profile["error_rate"]:
+        status_code = rng.choice([500, 502, 503])
+        fake.count(f"errors.{status_code}")
+        return error_response(status_code, "Upstream provider error (fake)")
+    roll -= profile["error_rate"]
+    hang = roll < profile["timeout_rate"]
+    abort = not hang and rng.random() < profile["stream_abort_rate"]
+
+    content = rule.content if rule and rule.content is not None else templated_response(messages)
+    first_token = sample_latency(profile["first_token"], rng)
+    tokens_per_second = profile["tokens_per_second"]
+    usage = {
+        "prompt_tokens": sum(estimate_tokens(m.get("content") or "") for m in messages),
+        "completion_tokens": estimate_tokens(content)
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    completion_id = f"gen-fake-{uuid.uuid4().hex[:16]}"
+    created = int(time.time())
+
+    fake.in_flight += 1
+    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+
+    if not payload.get("stream"):
+        try:
+            if hang:
+                fake.count("timeouts")
+                await asyncio.sleep(profile["hang_seconds"])
+            duration = len(split_tokens(content)) / tokens_per_second if tokens_per_second else 0.0
+            await asyncio.sleep(first_token + duration)
+        finally:
+            fake.in_flight -= 1
+        fake.count("completions")
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+
+    include_usage = bool((payload.get("usage") or {}).get("include")
+                         or (payload.get("stream_options") or {}).get("include_usage"))
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+
+    async def stream():
+        try:
+            # OpenRouter keeps the connection alive with comments until the first token
+            yield ": OPENROUTER PROCESSING\n\n"
+            if hang:
+                fake.count("timeouts")
+                await asyncio.sleep(profile["hang_seconds"])
+            await asyncio.sleep(first_token)
+            tokens = split_tokens(content)
+            size = max(1, int(profile["chunk_tokens"]))
+            delay = size / tokens_per_second if tokens_per_second else 0.0
+            cut = len(tokens) // 2 if abort else None
+            yield sse(chunk({"role": "assistant", "content": ""}))
+            for index in range(0, len(tokens), size):
+                if cut is not None and index >= cut:
+                    fake.count("stream_aborts")
+                    yield sse({"error": {"code": 502, "message": "Provider stream interrupted (fake)"}})
+                    return
+                if delay:
+                    await asyncio.sleep(delay)
+                yield sse(chunk({"content": "".join(tokens[index:index + size])}))
+            final = chunk({}, "stop")
+            if include_usage:
+                final["usage"] = usage
+            yield sse(final)
+            yield "data: [DONE]\n\n"
+            fake.count("completions")
+        finally:
+            fake.in_flight -= 1
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/_fake/stats")
+async def get_stats():
+    return fake.stats()
+
+
+@app.put("/_fake/config")
+async def update_config(config: Dict[str, Any] = Body(...)):
+    """Change the fake's behaviour at runtime
+
+    Accepts `profile` (default profile name), `profiles` (custom profiles by
+    name, merged over the defaults), `rules` (scripted rules) and `seed`.
+    """
+    if "profiles" in config:
+        fake.custom_profiles.update(config["profiles"])
+    if "profile" in config:
+        fake.default_profile = config["profile"]
+    if "rules" in config:
+        fake.rules = [ScriptRule(rule) for rule in config["rules"]]
+    if "seed" in config:
+        fake.rng.seed(config["seed"])
+    return fake.stats()
+
+
+@app.post("/_fake/reset")
+async def reset_stats():
+    fake.counters.clear()
+    fake.peak_in_flight = fake.in_flight
+    for rule in fake.rules:
+        rule.hits = 0
+    return fake.stats()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("FAKE_OPENROUTER_PORT", "4600")))
@@ -0,0 +1,366 @@
+"""
+Service d'exécution en arrière-plan des runs agentiques.
+Les runs sont persistés dans la collection `agent_jobs` et exécutés par des workers async.
+Chaque run est réclamé avec un bail (lease) renouvelé par heartbeat : n'importe quel nombre
+de processus, sur n'importe quels noeuds, peut vider la même file, et un run dont le worker
+est mort est remis en file à l'expiration de son bail.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from typing import Dict, Any, Optional, Callable, Awaitable, List
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+import os
+import socket
+import uuid
+
+from agents.cancellation import run_registry
+
+logger = logging.getLogger(__name__)
+
+# Progress events kept on the job document
+MAX_PROGRESS_EVENTS = 200
+
+JobRunner = Callable[[Dict[str, Any], Callable[[str, dict], Awaitable[None]]], Awaitable[Dict[str, Any]]]
+
+
+class JobService:
+    """Queue of agentic runs drained by leasing workers, in this process or any other
+
+    A worker claims the oldest queued run (or one whose lease expired) with an
+    atomic `find_one_and_update`, then renews the lease every
+    `lease_seconds / 3` while the run executes. Results are written only by
+    the holder of the current lease, so a run re-claimed after a stall is
+    completed exactly once.
+    """
+
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        runner: JobRunner,
+        workers: int = 4,
+        lease_seconds: float = 60.0,
+        poll_seconds: float = 1.0,
+        max_attempts: int = 3,
+        ttl_seconds: int = 7 * 86400
+    ):
+        self.db = db
+        self.collection = db.agent_jobs
+        self.runner = runner
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.ttl_seconds = ttl_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._leases: Dict[str, str] = {}  # job id -> lease id of the runs held by this process
+        self._running = 0
+        self._completed = 0
+        self._lost = 0
+
+    async def start(self):
+        """Start the workers and the reaper of expired leases"""
+        if self._tasks or self.workers <= 0:
+            return
+
+        try:
+            await self.collection.create_index("id", unique=True)
+            await self.collection.create_index([("status", 1), ("created_at", 1)])
+            await self.collection.create_index([("status", 1), ("lease_expires_at", 1)])
+            # Finished runs (and their results) are purged after ttl_seconds
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        except Exception as e:
+            logger.error(f"[Jobs] Could not create indexes: {str(e)}")
+
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        logger.info(f"[Jobs] Started {self.workers} worker(s) as {self.worker_id}")
+
+    async def stop(self):
+        """Stop the workers and hand the runs they held back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        for job_id, lease_id in list(self._leases.items()):
+            try:
+                # A voluntary hand-back (deploy, scale-down) does not use up one of the run's attempts
+                await self.collection.update_one(
+                    {"id": job_id, "lease_id": lease_id, "status": "running"},
+                    {"$set": self._requeue_fields("worker stopped"), "$inc": {"attempts": -1}}
+                )
+            except Exception as e:
+                logger.warning(f"[Jobs] Could not release {job_id}: {str(e)}")
+        self._leases.clear()
+
+    async def submit(self, request: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+        """Persist a new run and queue it"""
+        now = datetime.now(timezone.utc).isoformat()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "user_id": user_id,
+            "request": request,
+            "progress": [],
+            "last_event": None,
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "lease_id": None,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "cancel_requested": False,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None
+        }
+        await self.collection.insert_one(job)
+        self._wakeup.set()
+        queue_depth = await self.collection.count_documents({"status": "queued"})
+        return {"job_id": job["id"], "status": "queued", "queue_depth": queue_depth}
+
+    async def get(self, job_id: str, include_result: bool = False) -> Optional[Dict[str, Any]]:
+        """Fetch a run (never exposes the API key, which is only kept until the run finishes)"""
+        projection = {"_id": 0, "request.api_key": 0, "expires_at": 0}
+        if not include_result:
+            projection["result"] = 0
+        return await self.collection.find_one({"id": job_id}, projection)
+
+    async def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a run: "cancelled" if it was still queued, "cancelling" if a worker holds it
+
+        A running run is stopped by the heartbeat of whichever worker holds
+        its lease, on this node or another.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        result = await self.collection.update_one(
+            {"id": job_id, "status": "queued"},
+            self._finish_update({"status": "cancelled", "error": "Cancelled before start", "finished_at": now, "updated_at": now})
+        )
+        if result.modified_count > 0:
+            return "cancelled"
+        result = await self.collection.update_one(
+            {"id": job_id, "status": "running"},
+            {"$set": {"cancel_requested": True, "updated_at": now}}
+        )
+        return "cancelling" if result.matched_count > 0 else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Worker pool metrics of this process"""
+        return {
+            "worker_id": self.worker_id,
+            "workers": len([task for task in self._tasks if not task.done()]),
+            "running": self._running,
+            "completed": self._completed,
+            "leases_lost": self._lost,
+            "lease_seconds": self.lease_seconds
+        }
+
+    def _finish_update(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Update closing a run: drops the API key it ran with and schedules its purge"""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        return {
+            "$set": {**fields, "expires_at": expires_at},
+            "$unset": {"request.api_key": ""}
+        }
+
+    def _requeue_fields(self, reason: str) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc).isoformat()
+        return {
+            "status": "queued",
+            "lease_id": None,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "requeued_at": now,
+            "requeue_reason": reason,
+            "updated_at": now
+        }
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically take the oldest queued run, or a running one whose lease expired"""
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": "queued"},
+                    # Runs left without a lease by older versions count as expired
+                    {"status": "running", "lease_expires_at": {"$lt": now}},
+                    {"status": "running", "lease_expires_at": None}
+                ],
+                "attempts": {"$lt": self.max_attempts}
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "lease_id": uuid.uuid4().hex,
+                    "lease_owner": self.worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now.isoformat(),
+                    "updated_at": now.isoformat()
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("created_at", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _reaper(self):
+        """Fail runs out of attempts whose last lease expired (they crash or stall their worker)"""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            now = datetime.now(timezone.utc)
+            try:
+                result = await self.collection.update_many(
+                    {
+                        "$or": [
+                            {"status": "queued"},
+                            {"status": "running", "lease_expires_at": {"$lt": now}},
+                            {"status": "running", "lease_expires_at": None}
+                        ],
+                        "attempts": {"$gte": self.max_attempts}
+                    },
+                    self._finish_update({
+                        "status": "failed",
+                        "error": f"Lease expired after {self.max_attempts} attempt(s)",
+                        "lease_id": None,
+                        "finished_at": now.isoformat(),
+                        "updated_at": now.isoformat()
+                    })
+                )
+                if result.modified_count:
+                    logger.warning(f"[Jobs] Failed {result.modified_count} run(s) out of attempts")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Jobs] Lease reaper failed: {str(e)}")
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Jobs] Worker {index} could not claim a run: {str(e)}")
+                job = None
+
+            if not job:
+                # Woken early by a submit on this node, otherwise poll for other nodes' submits
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Jobs] Worker {index} failed on {job['id']}: {str(e)}")
+
+    async def _heartbeat(self, job_id: str, lease_id: str, run: asyncio.Task):
+        """Renew the lease while the run executes; stop the run if the lease is lost or cancelled"""
+        while not run.done():
+            await asyncio.sleep(self.lease_seconds / 3)
+            now = datetime.now(timezone.utc)
+            try:
+                job = await self.collection.find_one_and_update(
+                    {"id": job_id, "lease_id": lease_id, "status": "running"},
+                    {"$set": {"lease_expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                    projection={"_id": 0, "cancel_requested": 1},
+                    return_document=ReturnDocument.AFTER
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep running: the lease is only lost once it actually expires
+                logger.warning(f"[Jobs] Could not renew the lease of {job_id}: {str(e)}")
+                continue
+            if not job:
+                # Counted by _run once the local run has stopped
+                logger.warning(f"[Jobs] Lost the lease of {job_id}, stopping the local run")
+                if not run_registry.cancel(job_id, "lease lost"):
+                    run.cancel()
+                return
+            if job.get("cancel_requested"):
+                run_registry.cancel(job_id, "cancelled by client")
+
+    async def _run(self, job: Dict[str, Any]):
+        job_id, lease_id = job["id"], job["lease_id"]
+
+        async def progress_callback(event: str, data: dict):
+            entry = {
+                "event": event,
+                "data": data,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+            try:
+                await self.collection.update_one(
+                    {"id": job_id, "lease_id": lease_id},
+                    {
+                        "$push": {"progress": {"$each": [entry], "$slice": -MAX_PROGRESS_EVENTS}},
+                        "$set": {"last_event": entry, "updated_at": entry["timestamp"]}
+                    }
+                )
+            except Exception as e:
+                logger.warning(f"[Jobs] Could not record progress of {job_id}: {str(e)}")
+
+        self._leases[job_id] = lease_id
+        self._running += 1
+        run = asyncio.create_task(self.runner(job, progress_callback))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, lease_id, run))
+        try:
+            result = await asyncio.shield(run)
+            if result.get("success"):
+                status = "completed"
+            else:
+                status = "cancelled" if result.get("cancelled") else "failed"
+            error = None if result.get("success") else result.get("error")
+        except asyncio.CancelledError:
+            if not run.done():
+                # Worker stopping: stop() hands the run back to the queue
+                run.cancel()
+                await asyncio.gather(run, return_exceptions=True)
+                raise
+            self._leases.pop(job_id, None)
+            self._lost += 1
+            logger.warning(f"[Jobs] Run {job_id} stopped after losing its lease")
+            return
+        except Exception as e:
+            logger.error(f"[Jobs] Run {job_id} crashed: {str(e)}")
+            result, status, error = None, "failed", str(e)
+        finally:
+            self._running -= 1
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+        # Only the current lease holder completes the run, so a result is written once
+        now = datetime.now(timezone.utc).isoformat()
+        done = await self.collection.update_one(
+            {"id": job_id, "lease_id": lease_id, "status": "running"},
+            self._finish_update({
+                "status": status,
+                "result": result,
+                "error": error,
+                "lease_id": None,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "finished_at": now,
+                "updated_at": now
+            })
+        )
+        self._leases.pop(job_id, None)
+        if done.matched_count:
+            self._completed += 1
+            logger.info(f"[Jobs] Run {job_id} {status}")
+        else:
+            self._lost += 1
+            logger.warning(f"[Jobs] Run {job_id} finished after losing its lease, result discarded")
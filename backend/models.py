@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime, timezone
 import uuid
 
@@ -97,6 +97,19 @@ class SystemConfig(BaseModel):
     free_trial_days: int = 7
     max_failed_payments: int = 3  # Nombre d'échecs avant blocage
     
+    # Agentic system: modèle par rôle (planner/coder/tester/reviewer), sinon modèle de la requête
+    agent_role_models: Dict[str, str] = Field(default_factory=lambda: {
+        'tester': 'openai/gpt-4o-mini',
+        'reviewer': 'openai/gpt-4o-mini'
+    })
+    
+    # Quotas journaliers d'usage agentique par utilisateur (0 = illimité)
+    # Au-delà du quota "soft" les runs sont bridés et mis en file, au-delà du "hard" ils sont refusés
+    usage_soft_daily_tokens: int = 0
+    usage_hard_daily_tokens: int = 0
+    usage_soft_daily_run_seconds: float = 0
+    usage_hard_daily_run_seconds: float = 0
+    
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_by: Optional[str] = None  # User ID de l'admin qui a modifié
 
@@ -110,3 +123,8 @@ class SystemConfigUpdate(BaseModel):
     subscription_price: Optional[float] = None
     free_trial_days: Optional[int] = None
     max_failed_payments: Optional[int] = None
+    agent_role_models: Optional[Dict[str, str]] = None
+    usage_soft_daily_tokens: Optional[int] = None
+    usage_hard_daily_tokens: Optional[int] = None
+    usage_soft_daily_run_seconds: Optional[float] = None
+    usage_hard_daily_run_seconds: Optional[float] = None
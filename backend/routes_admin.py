@@ -8,7 +8,19 @@ from datetime import datetime, timezone, timedelta
 import logging
 from uuid import uuid4
 from pydantic import BaseModel, EmailStr
+from typing import Optional
 from auth import get_password_hash
+from agents.llm_client import llm_client
+from agents.llm_cache import llm_cache
+from agents.cassette import cassette
+from agents.prompt_budget import prompt_budget
+from agents.rate_limiter import rate_limiter
+from agents.circuit_breaker import circuit_breakers
+from agents.metrics import agent_metrics
+from agents.cancellation import run_registry
+from agents.run_scheduler import run_scheduler
+from trace_service import TraceService
+from usage_service import UsageService
 
 from config import settings
 
@@ -23,6 +35,8 @@ db = client[settings.DB_NAME]
 # Initialize services
 config_service = ConfigService(db)
 stripe_service = StripeService(db)
+trace_service = TraceService(db, ttl_seconds=settings.AGENT_TRACE_TTL_SECONDS)
+usage_service = UsageService(db)
 
 
 # Special endpoint to initialize first admin (only works if no admins exist)
@@ -242,6 +256,120 @@ async def update_system_config(
     logger.info(f'System config updated by admin {current_admin["email"]}')
     return updated_config
 
+@router.get('/llm/pool')
+async def get_llm_pool_stats(current_admin: dict = Depends(get_current_admin_user)):
+    """Get usage metrics of the shared OpenRouter connection pool"""
+    return llm_client.stats()
+
+@router.get('/llm/limits')
+async def get_llm_rate_limits(current_admin: dict = Depends(get_current_admin_user)):
+    """Get queueing, throttling and retry counters of the LLM rate limiter"""
+    return rate_limiter.stats()
+
+@router.get('/llm/breakers')
+async def get_llm_circuit_breakers(current_admin: dict = Depends(get_current_admin_user)):
+    """Get the circuit breaker state of every model"""
+    return circuit_breakers.stats()
+
+@router.delete('/llm/breakers')
+async def reset_llm_circuit_breakers(
+    model: str = None,
+    current_admin: dict = Depends(get_current_admin_user)
+):
+    """Close the breaker of one model (or of all models)"""
+    circuit_breakers.reset(model)
+    logger.info(f'LLM circuit breakers reset ({model or "all"}) by admin {current_admin["email"]}')
+    return {'message': 'Circuit breakers reset'}
+
+@router.get('/agents/metrics')
+async def get_agent_metrics(current_admin: dict = Depends(get_current_admin_user)):
+    """Get latency and token usage per agent role and model"""
+    return agent_metrics.stats()
+
+@router.delete('/agents/metrics')
+async def reset_agent_metrics(current_admin: dict = Depends(get_current_admin_user)):
+    """Reset the per-role agent metrics"""
+    agent_metrics.reset()
+    return {'message': 'Agent metrics reset'}
+
+@router.get('/agents/runs')
+async def get_active_agent_runs(current_admin: dict = Depends(get_current_admin_user)):
+    """List the agentic runs executing in this process"""
+    return run_registry.stats()
+
+@router.delete('/agents/runs/{run_id}')
+async def cancel_agent_run(run_id: str, current_admin: dict = Depends(get_current_admin_user)):
+    """Cancel a running agentic run"""
+    if not run_registry.cancel(run_id, f'cancelled by admin {current_admin["email"]}'):
+        raise HTTPException(status_code=404, detail='Run not running in this process')
+    return {'message': 'Run cancelling'}
+
+@router.get('/agents/scheduler')
+async def get_agent_scheduler_stats(current_admin: dict = Depends(get_current_admin_user)):
+    """Get running runs, queue depth and wait-time percentiles per scheduler lane"""
+    return run_scheduler.stats()
+
+@router.get('/agents/traces')
+async def list_agent_traces(
+    limit: int = 50,
+    status: Optional[str] = None,
+    current_admin: dict = Depends(get_current_admin_user)
+):
+    """List the latest agentic runs with their totals (tokens, cost, time per phase)"""
+    return await trace_service.recent(limit=min(limit, 500), status=status)
+
+@router.get('/agents/traces/stats')
+async def get_agent_trace_stats(hours: float = 24.0, current_admin: dict = Depends(get_current_admin_user)):
+    """Get run, phase and LLM call percentiles over the last `hours`"""
+    return await trace_service.stats(hours=hours)
+
+@router.get('/agents/runs/{run_id}/timeline')
+async def get_agent_run_timeline(run_id: str, current_admin: dict = Depends(get_current_admin_user)):
+    """Get the span timeline of every execution of a run"""
+    executions = await trace_service.timeline(run_id)
+    if not executions:
+        raise HTTPException(status_code=404, detail='No trace for this run')
+    return {'run_id': run_id, 'executions': executions}
+
+@router.get('/usage')
+async def list_usage(
+    day: Optional[str] = None,
+    limit: int = 20,
+    current_admin: dict = Depends(get_current_admin_user)
+):
+    """List the heaviest agentic users of a day (YYYY-MM-DD, today by default)"""
+    return await usage_service.top_users(day=day, limit=min(limit, 200))
+
+@router.get('/usage/{user_id}')
+async def get_user_usage(user_id: str, days: int = 30, current_admin: dict = Depends(get_current_admin_user)):
+    """Get the daily usage of a user and their current quota state"""
+    return {
+        'quota': await usage_service.check(user_id, await config_service.get_usage_quotas()),
+        'history': await usage_service.history(user_id, days=min(max(days, 1), 366))
+    }
+
+@router.get('/llm/cache')
+async def get_llm_cache_stats(current_admin: dict = Depends(get_current_admin_user)):
+    """Get hit/miss counters of the LLM response cache"""
+    return llm_cache.stats()
+
+@router.delete('/llm/cache')
+async def clear_llm_cache(current_admin: dict = Depends(get_current_admin_user)):
+    """Drop every cached LLM response"""
+    await llm_cache.clear()
+    logger.info(f'LLM cache cleared by admin {current_admin["email"]}')
+    return {'message': 'LLM cache cleared'}
+
+@router.get('/llm/prompts')
+async def get_llm_prompt_budget_stats(current_admin: dict = Depends(get_current_admin_user)):
+    """Get the tokenizer in use and how many prompts were compacted to fit their context window"""
+    return prompt_budget.stats()
+
+@router.get('/llm/cassette')
+async def get_llm_cassette_stats(current_admin: dict = Depends(get_current_admin_user)):
+    """Get the record/replay mode and counters of the LLM cassette"""
+    return cassette.stats()
+
 @router.post('/users/{user_id}/promote-admin')
 async def promote_to_admin(
     user_id: str,
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Body, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Depends, Request
+from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import logging
-import os
+import time
 from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
@@ -12,7 +14,26 @@ import json
 import base64
 from github import Github
 from agents.orchestrator import OrchestratorAgent
+from agents.llm_client import (
+    llm_client, LLMError, LLMHTTPError, LLMRateLimitError, LLMTimeoutError
+)
+from agents.rate_limiter import rate_limiter
+from agents.circuit_breaker import circuit_breakers
+from agents.deadline import Deadline
+from agents.cancellation import CancellationToken, RunCancelled, run_registry
+from agents.run_scheduler import run_scheduler, SchedulerFull
+from agents.llm_cache import llm_cache
+from agents.cassette import cassette
+from agents.tracing import configure_prices
+from agents.prompt_budget import prompt_budget
+from agents import static_analysis
 from config import settings
+from config_service import ConfigService
+from models import SystemConfig
+from job_service import JobService
+from checkpoint_service import CheckpointService, RunIdConflict
+from trace_service import TraceService
+from usage_service import UsageService
 from routes_auth import router as auth_router
 from routes_billing import router as billing_router
 from routes_admin import router as admin_router
@@ -22,6 +43,10 @@ from auth import get_current_user
 # MongoDB connection with centralized config
 client = AsyncIOMotorClient(settings.MONGO_URL)
 db = client[settings.DB_NAME]
+config_service = ConfigService(db)
+checkpoint_service = CheckpointService(db, ttl_seconds=settings.AGENT_CHECKPOINT_TTL_SECONDS)
+trace_service = TraceService(db, ttl_seconds=settings.AGENT_TRACE_TTL_SECONDS)
+usage_service = UsageService(db)
 
 # Create the main app
 app = FastAPI()
@@ -99,6 +124,17 @@ class AgenticRequest(BaseModel):
     api_key: str
     current_files: List[ProjectFile] = []
     project_id: Optional[str] = None
+    use_cache: bool = True  # False to bypass the LLM response cache
+    max_parallel_steps: Optional[int] = None  # Plan steps coded concurrently
+    edit_mode: bool = False  # Opt-in: patch existing files with diffs instead of full rewrites
+    race: bool = False  # Race planner/coder calls across several models, first valid answer wins
+    race_models: Optional[List[str]] = None  # Defaults to AGENT_RACE_MODELS
+    role_models: Optional[Dict[str, str]] = None  # Per-role models, override SystemConfig.agent_role_models
+    run_id: Optional[str] = None  # Checkpoint key, generated when missing
+    deadline_seconds: Optional[float] = None  # Overall time budget, defaults to AGENT_DEFAULT_DEADLINE_SECONDS
+
+class AgenticResumeRequest(BaseModel):
+    api_key: str  # Never stored with the checkpoints
 
 class ExportGithubRequest(BaseModel):
     project_id: str
@@ -254,6 +290,17 @@ async def delete_project(project_id: str):
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted successfully"}
 
+def llm_error_to_http(error: LLMError) -> HTTPException:
+    """Map a typed LLM error to the HTTP error returned to the client"""
+    if isinstance(error, LLMRateLimitError):
+        headers = {"Retry-After": str(int(error.retry_after + 0.999))} if error.retry_after else None
+        return HTTPException(status_code=429, detail="OpenRouter rate limit reached, retry later", headers=headers)
+    if isinstance(error, LLMTimeoutError):
+        return HTTPException(status_code=504, detail=str(error))
+    if isinstance(error, LLMHTTPError) and error.status_code < 500:
+        return HTTPException(status_code=error.status_code, detail=error.body or str(error))
+    return HTTPException(status_code=502, detail=str(error))
+
 # OpenRouter Models List
 @api_router.get("/openrouter/models")
 async def get_openrouter_models(api_key: str):
@@ -262,23 +309,16 @@ async def get_openrouter_models(api_key: str):
         raise HTTPException(status_code=422, detail="API key is required")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://openrouter.ai/api/v1/models",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "HTTP-Referer": os.environ.get('FRONTEND_URL', 'http://localhost:3000'),
-                    "X-Title": "Devora"
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch models")
+        response = await llm_client.list_models(api_key, timeout=30.0)
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise HTTPException(status_code=response.status_code, detail="Failed to fetch models")
     except HTTPException:
         raise
+    except LLMError as e:
+        raise llm_error_to_http(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -323,31 +363,29 @@ When generating code:
         
         # Add current message
         messages.append({"role": "user", "content": request.message})
+        # Long conversations: older turns are digested to fit the model's context window
+        messages = prompt_budget.fit_messages(messages, request.model)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {request.api_key}",
-                    "HTTP-Referer": os.environ.get('FRONTEND_URL', 'http://localhost:3000'),
-                    "X-Title": "Devora",
-                    "Content-Type": "application/json"
-                },
-                json={
+        result = await rate_limiter.run(
+            request.api_key,
+            request.model,
+            lambda: llm_client.chat_completion(
+                request.api_key,
+                {
                     "model": request.model,
                     "messages": messages
                 },
                 timeout=120.0
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "response": result["choices"][0]["message"]["content"],
-                    "model": request.model
-                }
-            else:
-                raise HTTPException(status_code=response.status_code, detail=response.text)
+        )
+        
+        return {
+            "response": result["choices"][0]["message"]["content"],
+            "model": request.model
+        }
+    except LLMError as e:
+        logging.error(f"OpenRouter generation error: {type(e).__name__}: {str(e)}")
+        raise llm_error_to_http(e)
     except Exception as e:
         logging.error(f"OpenRouter generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -467,44 +505,436 @@ async def deploy_to_vercel(request: DeployVercelRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Agentic Code Generation
-@api_router.post("/generate/agentic")
-async def generate_with_agentic_system(request: AgenticRequest):
-    """Generate code using the agentic system"""
+async def create_orchestrator(
+    request: AgenticRequest,
+    resume: bool = False,
+    user_id: Optional[str] = None,
+    throttled: bool = False
+) -> OrchestratorAgent:
+    """Build an orchestrator configured from an agentic request
+    
+    New runs are registered with the checkpoint store so they can be resumed;
+    a run id already used by another user's run, or by a run still executing,
+    is refused (409).
+    Throttled runs (user over the soft quota) code one step at a time and never race.
+    """
+    run_id = request.run_id or str(uuid.uuid4())
+    if not resume:
+        try:
+            await checkpoint_service.start(run_id, request.model_dump(), user_id=user_id)
+        except RunIdConflict as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except Exception as e:
+            logging.warning(f"Could not register run {run_id} for checkpoints: {str(e)}")
+    
     try:
-        # Create orchestrator
-        orchestrator = OrchestratorAgent(
-            api_key=request.api_key,
-            model=request.model
+        role_models = await config_service.get_agent_role_models()
+    except Exception as e:
+        logging.warning(f"Could not load agent role models, using defaults: {str(e)}")
+        role_models = SystemConfig().agent_role_models
+    role_models = {**role_models, **(request.role_models or {})}
+    
+    race_models = []
+    if request.race and not throttled:
+        race_models = (request.race_models or settings.AGENT_RACE_MODELS)[:settings.AGENT_RACE_MAX_MODELS]
+    return OrchestratorAgent(
+        api_key=request.api_key,
+        model=request.model,
+        use_cache=request.use_cache,
+        max_parallel_steps=1 if throttled else request.max_parallel_steps or settings.AGENT_MAX_PARALLEL_STEPS,
+        edit_mode=request.edit_mode,
+        race_models=race_models,
+        role_models=role_models,
+        run_id=run_id,
+        checkpoint_store=checkpoint_service,
+        trace_store=trace_service
+    )
+
+def request_deadline(request: AgenticRequest) -> Deadline:
+    """Time budget of an agentic run, starting now (unbounded if none is configured)"""
+    seconds = request.deadline_seconds or settings.AGENT_DEFAULT_DEADLINE_SECONDS
+    return Deadline(seconds)
+
+async def check_usage_quota(user_id: str) -> Dict[str, Any]:
+    """Daily quota state of a user, refusing the run (429) past the hard quota
+    
+    Fails open: a ledger outage never blocks generation.
+    """
+    try:
+        quota = await usage_service.check(user_id, await config_service.get_usage_quotas())
+    except Exception as e:
+        logging.warning(f"Could not check usage quota of {user_id}: {str(e)}")
+        return {"state": "ok"}
+    if quota["state"] == "hard":
+        raise HTTPException(
+            status_code=429,
+            detail="Daily usage quota reached",
+            headers={"Retry-After": str(quota["retry_after"])}
         )
-        
-        # Store progress events
-        progress_events = []
-        
-        async def progress_callback(event: str, data: dict):
-            progress_events.append({
-                "event": event,
-                "data": data,
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            })
-        
-        orchestrator.set_progress_callback(progress_callback)
-        
+    return quota
+
+async def scheduling_lane(user_id: Optional[str], throttled: bool = False) -> str:
+    """Scheduler lane of a run: "throttled" past the soft quota, else the user's tier"""
+    if throttled:
+        return "throttled"
+    if not user_id:
+        return run_scheduler.default_lane
+    try:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "is_admin": 1, "subscription_status": 1})
+    except Exception as e:
+        logging.warning(f"Could not load the tier of {user_id}: {str(e)}")
+        return run_scheduler.default_lane
+    if user and user.get("is_admin"):
+        return "admin"
+    if user and user.get("subscription_status") == "active":
+        return "active"
+    # Trials and lapsed subscriptions share the lowest lane
+    return "trialing"
+
+async def execute_metered(
+    orchestrator: OrchestratorAgent,
+    user_id: Optional[str],
+    throttled: bool = False,
+    **kwargs
+) -> Dict[str, Any]:
+    """Execute a run once the scheduler admits it and charge it to the user's usage ledger
+    
+    The ledger write happens in the background, after the result is returned.
+    A run cancelled while queued goes straight to the orchestrator, which
+    reports it cancelled before its first LLM call.
+    """
+    if throttled:
+        await orchestrator.emit_progress("throttled", {
+            "message": "Daily usage above the soft quota, run queued and throttled"
+        })
+    
+    async def metered() -> Dict[str, Any]:
+        started = time.monotonic()
+        result = None
+        try:
+            result = await orchestrator.execute(**kwargs)
+            return result
+        finally:
+            usage_service.record_later(user_id, (result or {}).get("trace"), time.monotonic() - started)
+    
+    lane = await scheduling_lane(user_id, throttled)
+    try:
+        async with run_scheduler.slot(user_id or "anonymous", lane, cancel_token=kwargs.get("cancel_token")):
+            return await metered()
+    except SchedulerFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    except RunCancelled:
+        # Only admission raises it: execute() turns cancellation into a result
+        return await metered()
+
+# How often a non-streaming run checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+
+async def watch_disconnect(http_request: Request, token: CancellationToken):
+    """Cancel a run once its HTTP client has gone away"""
+    while not token.cancelled:
+        if await http_request.is_disconnected():
+            token.cancel("client disconnected")
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+async def run_agentic_request(
+    request: AgenticRequest,
+    user_id: str,
+    resume: bool = False,
+    http_request: Optional[Request] = None
+) -> Dict[str, Any]:
+    """Run the agentic workflow and return its result with the progress events
+    
+    The run can be cancelled through `/agentic/runs/{run_id}/cancel`, and is
+    cancelled when `http_request`'s client disconnects.
+    """
+    quota = await check_usage_quota(user_id)
+    throttled = quota["state"] == "soft"
+    deadline = request_deadline(request)
+    orchestrator = await create_orchestrator(request, resume=resume, user_id=user_id, throttled=throttled)
+    token = run_registry.register(orchestrator.run_id)
+    
+    # Store progress events
+    progress_events = []
+    
+    async def progress_callback(event: str, data: dict):
+        progress_events.append({
+            "event": event,
+            "data": data,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        })
+    
+    orchestrator.set_progress_callback(progress_callback)
+    
+    watcher = asyncio.create_task(watch_disconnect(http_request, token)) if http_request else None
+    try:
         # Execute agentic workflow
-        result = await orchestrator.execute(
+        result = await execute_metered(
+            orchestrator,
+            user_id,
+            throttled,
             user_request=request.message,
-            current_files=[f.model_dump() for f in request.current_files]
+            current_files=[f.model_dump() for f in request.current_files],
+            resume=resume,
+            deadline=deadline,
+            cancel_token=token
         )
-        
-        # Return result with progress events
-        return {
-            **result,
-            "progress_events": progress_events
-        }
-        
+    finally:
+        if watcher:
+            watcher.cancel()
+        run_registry.unregister(orchestrator.run_id, token)
+    
+    # Return result with progress events
+    return {
+        **result,
+        "progress_events": progress_events
+    }
+
+@api_router.post("/generate/agentic")
+async def generate_with_agentic_system(
+    request: AgenticRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate code using the agentic system"""
+    try:
+        return await run_agentic_request(request, current_user["user_id"], http_request=http_request)
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Agentic generation error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/generate/agentic/{run_id}/resume")
+async def resume_agentic_generation(
+    run_id: str,
+    body: AgenticResumeRequest,
+    http_request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Continue a failed agentic run from its last checkpointed phase"""
+    checkpoint = await checkpoint_service.load(run_id)
+    if not checkpoint or checkpoint.get("user_id") != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    
+    try:
+        request = AgenticRequest(**{**checkpoint.get("request", {}), "api_key": body.api_key, "run_id": run_id})
+    except Exception:
+        raise HTTPException(status_code=409, detail="Run cannot be resumed (request options missing)")
+    
+    # Atomic, so two resumes of the same run never write its checkpoint concurrently
+    if not await checkpoint_service.claim_resume(run_id, current_user["user_id"], settings.AGENT_RESUME_STALE_SECONDS):
+        raise HTTPException(status_code=409, detail="Run is still running")
+    
+    try:
+        return await run_agentic_request(request, current_user["user_id"], resume=True, http_request=http_request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Agentic resume error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/agentic/runs/{run_id}")
+async def get_agentic_run(run_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the status and checkpointed phases of an agentic run"""
+    run = await checkpoint_service.summary(run_id)
+    if not run or run.get("user_id") != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Run not found or expired")
+    return run
+
+async def run_owner(run_id: str) -> Optional[str]:
+    """User who started a run, from its checkpoint or its background job"""
+    checkpoint = await checkpoint_service.summary(run_id)
+    if checkpoint and checkpoint.get("user_id"):
+        return checkpoint["user_id"]
+    job = await job_service.get(run_id)
+    return job.get("user_id") if job else None
+
+@api_router.post("/agentic/runs/{run_id}/cancel")
+async def cancel_agentic_run(run_id: str, current_user: dict = Depends(get_current_user)):
+    """Cancel a running agentic run (or a background job, queued or running on any node)
+    
+    In-flight LLM requests are aborted; the run stops with status "cancelled"
+    and can still be resumed from its last checkpoint.
+    """
+    if await run_owner(run_id) != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="No running or queued run with this id")
+    if run_registry.cancel(run_id, "cancelled by client"):
+        return {"run_id": run_id, "status": "cancelling"}
+    status = await job_service.cancel(run_id)
+    if status:
+        return {"run_id": run_id, "status": status}
+    raise HTTPException(status_code=404, detail="No running or queued run with this id")
+
+# Streaming Agentic Code Generation (Server-Sent Events)
+SSE_KEEPALIVE_SECONDS = 15.0
+# Runs whose SSE client left, kept referenced until they have wound down
+_detached_runs: set = set()
+
+def format_sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@api_router.post("/generate/agentic/stream")
+async def stream_agentic_generation(request: AgenticRequest, current_user: dict = Depends(get_current_user)):
+    """Generate code using the agentic system, streaming progress and tokens as SSE"""
+    user_id = current_user["user_id"]
+    quota = await check_usage_quota(user_id)
+    throttled = quota["state"] == "soft"
+    deadline = request_deadline(request)
+    orchestrator = await create_orchestrator(request, user_id=user_id, throttled=throttled)
+    # Registered once the body starts: a client gone before that never leaves the run id active
+    token = CancellationToken()
+    
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def progress_callback(event: str, data: dict):
+        await queue.put(("progress", {
+            "event": event,
+            "data": data,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }))
+    
+    async def token_callback(delta: str, step: int = None):
+        await queue.put(("token", {"agent": "coder", "step": step, "delta": delta}))
+    
+    async def file_callback(file: dict, step: int = None):
+        await queue.put(("file", {**file, "step": step}))
+    
+    orchestrator.set_progress_callback(progress_callback)
+    orchestrator.set_token_callback(token_callback)
+    orchestrator.set_file_callback(file_callback)
+    
+    async def run_orchestrator():
+        try:
+            result = await execute_metered(
+                orchestrator,
+                user_id,
+                throttled,
+                user_request=request.message,
+                current_files=[f.model_dump() for f in request.current_files],
+                deadline=deadline,
+                cancel_token=token
+            )
+        except Exception as e:
+            logging.error(f"Agentic streaming error: {str(e)}")
+            result = {"success": False, "error": str(e)}
+        finally:
+            run_registry.unregister(orchestrator.run_id, token)
+        await queue.put(("result", result))
+        await queue.put(None)
+    
+    async def event_stream():
+        run_registry.register(orchestrator.run_id, token)
+        task = asyncio.create_task(run_orchestrator())
+        try:
+            # Flush headers and first bytes immediately
+            yield ": stream opened\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                event, data = item
+                yield format_sse(event, data)
+        finally:
+            if not task.done():
+                # Client gone: stop the run cooperatively so it is recorded as cancelled
+                token.cancel("client disconnected")
+                _detached_runs.add(task)
+                task.add_done_callback(_detached_runs.discard)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+# Background Agentic Runs
+async def run_agentic_job(job: dict, progress_callback) -> dict:
+    """Execute a persisted agentic run (called by the job workers)"""
+    request = AgenticRequest(**{**job["request"], "run_id": job["id"]})
+    # A job re-queued after a crash or a worker shutdown picks up from its last checkpoint
+    resume = job.get("attempts", 1) > 1 or bool(job.get("requeued_at"))
+    user_id = job.get("user_id")
+    # Admitted at submission: past either quota by now, the run is only throttled
+    throttled = False
+    if user_id:
+        try:
+            quota = await check_usage_quota(user_id)
+            throttled = quota["state"] != "ok"
+        except HTTPException:
+            throttled = True
+    orchestrator = await create_orchestrator(request, resume=resume, user_id=user_id, throttled=throttled)
+    orchestrator.set_progress_callback(progress_callback)
+    token = run_registry.register(orchestrator.run_id)
+    try:
+        return await execute_metered(
+            orchestrator,
+            user_id,
+            throttled,
+            user_request=request.message,
+            current_files=[f.model_dump() for f in request.current_files],
+            resume=resume,
+            deadline=request_deadline(request),
+            cancel_token=token
+        )
+    finally:
+        run_registry.unregister(orchestrator.run_id, token)
+
+job_service = JobService(
+    db,
+    run_agentic_job,
+    workers=settings.AGENT_JOB_WORKERS,
+    lease_seconds=settings.AGENT_JOB_LEASE_SECONDS,
+    poll_seconds=settings.AGENT_JOB_POLL_SECONDS,
+    max_attempts=settings.AGENT_JOB_MAX_ATTEMPTS,
+    ttl_seconds=settings.AGENT_JOB_TTL_SECONDS
+)
+
+@api_router.post("/agentic/jobs", status_code=202)
+async def submit_agentic_job(request: AgenticRequest, current_user: dict = Depends(get_current_user)):
+    """Queue an agentic run and return its id immediately"""
+    await check_usage_quota(current_user["user_id"])
+    return await job_service.submit(request.model_dump(), user_id=current_user["user_id"])
+
+@api_router.get("/agentic/jobs/{job_id}")
+async def get_agentic_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the status and progress of an agentic run"""
+    job = await job_service.get(job_id)
+    # Other users' runs are reported missing rather than forbidden
+    if not job or job.get("user_id") != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@api_router.get("/agentic/jobs/{job_id}/result")
+async def get_agentic_job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the result of a finished agentic run"""
+    job = await job_service.get(job_id, include_result=True)
+    if not job or job.get("user_id") != current_user["user_id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in ("completed", "failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "error": job.get("error"),
+        **(job.get("result") or {})
+    }
+
+@api_router.get("/usage")
+async def get_usage(current_user: dict = Depends(get_current_user)):
+    """Today's agentic usage of the current user and their quota state"""
+    return await usage_service.check(current_user["user_id"], await config_service.get_usage_quotas())
+
 # Health check
 @api_router.get("/")
 async def root():
@@ -531,6 +961,97 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_llm_client():
+    llm_client.configure(
+        base_url=settings.OPENROUTER_BASE_URL.rstrip("/"),
+        max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.OPENROUTER_KEEPALIVE_EXPIRY,
+        http2=settings.OPENROUTER_HTTP2
+    )
+    await llm_client.start()
+    rate_limiter.configure(
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        rate_per_second=settings.LLM_RATE_PER_SECOND,
+        burst=settings.LLM_RATE_BURST,
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_base=settings.LLM_BACKOFF_BASE,
+        backoff_max=settings.LLM_BACKOFF_MAX
+    )
+    circuit_breakers.configure(
+        window_seconds=settings.LLM_BREAKER_WINDOW_SECONDS,
+        min_calls=settings.LLM_BREAKER_MIN_CALLS,
+        error_rate_threshold=settings.LLM_BREAKER_ERROR_RATE,
+        slow_call_seconds=settings.LLM_BREAKER_SLOW_CALL_SECONDS,
+        slow_rate_threshold=settings.LLM_BREAKER_SLOW_RATE,
+        open_seconds=settings.LLM_BREAKER_OPEN_SECONDS,
+        fallback_model=settings.LLM_FALLBACK_MODEL or "",
+        fallback_models=settings.LLM_FALLBACK_MODELS
+    )
+    configure_prices(settings.LLM_MODEL_PRICES)
+    prompt_budget.configure(
+        context_windows=settings.LLM_CONTEXT_WINDOWS,
+        output_reserve=settings.LLM_OUTPUT_RESERVE_TOKENS,
+        max_prompt_tokens=settings.LLM_MAX_PROMPT_TOKENS
+    )
+    # Token counts are estimated until the tokenizer is loaded, off the event loop
+    asyncio.get_running_loop().run_in_executor(None, prompt_budget.warm_up)
+    cassette.configure(
+        mode=settings.LLM_CASSETTE_MODE,
+        path=settings.LLM_CASSETTE_PATH,
+        realtime=settings.LLM_CASSETTE_REALTIME
+    )
+
+@app.on_event("startup")
+async def startup_run_scheduler():
+    run_scheduler.configure(
+        max_running=settings.AGENT_SCHEDULER_MAX_RUNS,
+        user_concurrency=settings.AGENT_SCHEDULER_USER_CONCURRENCY,
+        max_queue=settings.AGENT_SCHEDULER_MAX_QUEUE,
+        lane_weights=settings.AGENT_SCHEDULER_LANE_WEIGHTS,
+        lane_limits={"throttled": settings.AGENT_THROTTLED_CONCURRENCY}
+    )
+
+@app.on_event("startup")
+async def startup_llm_cache():
+    llm_cache.configure(
+        enabled=settings.LLM_CACHE_ENABLED,
+        max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+    )
+    llm_cache.attach(db.llm_cache)
+    await llm_cache.ensure_indexes()
+
+@app.on_event("shutdown")
+async def shutdown_llm_client():
+    await llm_client.close()
+    static_analysis.shutdown()
+
+@app.on_event("startup")
+async def startup_checkpoints():
+    try:
+        await checkpoint_service.ensure_indexes()
+    except Exception as e:
+        logging.warning(f"Could not create checkpoint indexes: {str(e)}")
+    try:
+        await trace_service.ensure_indexes()
+    except Exception as e:
+        logging.warning(f"Could not create trace indexes: {str(e)}")
+    try:
+        await usage_service.ensure_indexes()
+    except Exception as e:
+        logging.warning(f"Could not create usage ledger indexes: {str(e)}")
+
+@app.on_event("startup")
+async def startup_job_workers():
+    await job_service.start()
+
+@app.on_event("shutdown")
+async def shutdown_job_workers():
+    await job_service.stop()
+    await usage_service.flush()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Service de traces des runs agentiques.
+Chaque exécution de l'orchestrateur est enregistrée dans `agent_runs` avec sa timeline
+(phases, étapes du plan, appels LLM avec attente, premier token, tokens et coût).
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, Optional, List
+from datetime import datetime, timezone, timedelta
+import uuid
+
+from agents.metrics import percentile
+
+# Traces loaded to compute aggregate percentiles
+MAX_STATS_TRACES = 2000
+
+
+def _summary(samples: List[float]) -> Dict[str, Any]:
+    if not samples:
+        return {"count": 0, "p50": None, "p95": None, "p99": None}
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 0.5),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99)
+    }
+
+
+class TraceService:
+    """Store of run timelines, one document per orchestrator execution"""
+
+    def __init__(self, db: AsyncIOMotorDatabase, ttl_seconds: int = 30 * 86400):
+        self.db = db
+        self.collection = db.agent_runs
+        self.ttl_seconds = ttl_seconds
+
+    async def ensure_indexes(self):
+        """Lookup by run + TTL on the start time"""
+        await self.collection.create_index([("run_id", 1), ("started_at", 1)])
+        await self.collection.create_index("started_at", expireAfterSeconds=self.ttl_seconds)
+
+    async def save(self, trace: Dict[str, Any]):
+        """Record one execution (a resumed run gets a second document)"""
+        await self.collection.insert_one({"id": str(uuid.uuid4()), **trace})
+
+    async def timeline(self, run_id: str) -> List[Dict[str, Any]]:
+        """Every execution of a run, oldest first, with its spans"""
+        return await self.collection.find(
+            {"run_id": run_id},
+            {"_id": 0}
+        ).sort("started_at", 1).to_list(None)
+
+    async def recent(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Latest executions without their spans"""
+        query = {"status": status} if status else {}
+        return await self.collection.find(
+            query,
+            {"_id": 0, "spans": 0}
+        ).sort("started_at", -1).limit(limit).to_list(limit)
+
+    async def stats(self, hours: float = 24.0) -> Dict[str, Any]:
+        """Percentiles (ms) of runs, phases and LLM calls per role/model over a time window"""
+        since = datetime.now(timezone.utc) - timedelta(hours=hours)
+        traces = await self.collection.find(
+            {"started_at": {"$gte": since}},
+            {"_id": 0, "status": 1, "duration_ms": 1, "totals": 1, "spans": 1}
+        ).sort("started_at", -1).limit(MAX_STATS_TRACES).to_list(MAX_STATS_TRACES)
+
+        statuses: Dict[str, int] = {}
+        runs: List[float] = []
+        phases: Dict[str, List[float]] = {}
+        calls: Dict[str, Dict[str, List[float]]] = {}
+        totals = {"prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0, "llm_calls": 0}
+
+        for trace in traces:
+            statuses[trace.get("status")] = statuses.get(trace.get("status"), 0) + 1
+            if trace.get("status") == "completed":
+                runs.append(trace.get("duration_ms") or 0.0)
+            for key in totals:
+                totals[key] += (trace.get("totals") or {}).get(key) or 0
+            for phase, ms in ((trace.get("totals") or {}).get("phases_ms") or {}).items():
+                phases.setdefault(phase, []).append(ms)
+            for span in trace.get("spans") or []:
+                if span.get("kind") != "llm" or span.get("cache_hit"):
+                    continue
+                samples = calls.setdefault(f"{span.get('name')}:{span.get('model')}", {
+                    "latency_ms": [], "ttft_ms": [], "queue_ms": [], "completion_tokens": []
+                })
+                samples["latency_ms"].append(span.get("duration_ms") or 0.0)
+                for field in ("ttft_ms", "queue_ms", "completion_tokens"):
+                    if span.get(field) is not None:
+                        samples[field].append(span[field])
+
+        return {
+            "window_hours": hours,
+            "runs": len(traces),
+            "statuses": statuses,
+            "totals": {**totals, "cost": round(totals["cost"], 6)},
+            "run_ms": _summary(runs),
+            "phases_ms": {phase: _summary(samples) for phase, samples in sorted(phases.items())},
+            "llm_calls": {
+                key: {field: _summary(values) for field, values in samples.items()}
+                for key, samples in sorted(calls.items())
+            }
+        }
@@ -0,0 +1,130 @@
+"""
+Service de comptabilisation de l'usage agentique par utilisateur.
+Chaque run est imputé dans `usage_ledger` (un document par utilisateur et par jour UTC)
+par des upserts `$inc` atomiques, et les quotas journaliers sont vérifiés avant chaque run.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, Optional, List
+from datetime import datetime, timezone, timedelta
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Counters incremented on each ledger document
+COUNTERS = ("requests", "llm_calls", "prompt_tokens", "completion_tokens", "tokens", "cost", "run_seconds")
+
+
+def usage_day(moment: Optional[datetime] = None) -> str:
+    """Ledger bucket (UTC day) of a moment"""
+    return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+def seconds_until_reset(moment: Optional[datetime] = None) -> int:
+    """Seconds until the next UTC midnight, when daily quotas reset"""
+    moment = moment or datetime.now(timezone.utc)
+    midnight = (moment + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((midnight - moment).total_seconds()))
+
+
+class UsageService:
+    """Daily per-user usage ledger and quota checks"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = db.usage_ledger
+        # Ledger writes in flight, kept referenced until done
+        self._pending: set = set()
+
+    async def ensure_indexes(self):
+        """One document per user and day + lookup of the heaviest users of a day"""
+        await self.collection.create_index([("user_id", 1), ("day", 1)], unique=True)
+        await self.collection.create_index([("day", 1), ("tokens", -1)])
+
+    async def record(self, user_id: str, totals: Optional[Dict[str, Any]], run_seconds: float):
+        """Charge one run to the user's ledger of the day"""
+        totals = totals or {}
+        prompt_tokens = int(totals.get("prompt_tokens") or 0)
+        completion_tokens = int(totals.get("completion_tokens") or 0)
+        now = datetime.now(timezone.utc)
+        await self.collection.update_one(
+            {"user_id": user_id, "day": usage_day(now)},
+            {
+                "$inc": {
+                    "requests": 1,
+                    "llm_calls": int(totals.get("llm_calls") or 0),
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "tokens": prompt_tokens + completion_tokens,
+                    "cost": float(totals.get("cost") or 0.0),
+                    "run_seconds": round(run_seconds, 3)
+                },
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+
+    def record_later(self, user_id: Optional[str], totals: Optional[Dict[str, Any]], run_seconds: float):
+        """Charge a run without waiting for the write (failures are logged)"""
+        if not user_id:
+            return
+
+        async def write():
+            try:
+                await self.record(user_id, totals, run_seconds)
+            except Exception as e:
+                logger.warning(f"[Usage] Could not record usage of {user_id}: {str(e)}")
+
+        task = asyncio.create_task(write())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self):
+        """Wait for the ledger writes in flight (on shutdown)"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def today(self, user_id: str) -> Dict[str, Any]:
+        """Usage of a user for the current UTC day (zeros when nothing was recorded)"""
+        entry = await self.collection.find_one(
+            {"user_id": user_id, "day": usage_day()},
+            {"_id": 0}
+        )
+        return {counter: (entry or {}).get(counter, 0) for counter in COUNTERS}
+
+    async def check(self, user_id: str, quotas: Dict[str, Any]) -> Dict[str, Any]:
+        """Quota state of a user: "ok", "soft" (throttled) or "hard" (refused until reset)
+
+        `quotas` holds daily limits (0 = unlimited): soft_tokens, hard_tokens,
+        soft_run_seconds and hard_run_seconds.
+        """
+        usage = await self.today(user_id)
+        state = "ok"
+        for level in ("soft", "hard"):
+            for counter in ("tokens", "run_seconds"):
+                limit = quotas.get(f"{level}_{counter}") or 0
+                if limit and usage[counter] >= limit:
+                    state = level
+        return {
+            "state": state,
+            "day": usage_day(),
+            "usage": usage,
+            "quotas": quotas,
+            "retry_after": seconds_until_reset()
+        }
+
+    async def history(self, user_id: str, days: int = 30) -> List[Dict[str, Any]]:
+        """Daily usage of a user, most recent day first"""
+        since = usage_day(datetime.now(timezone.utc) - timedelta(days=days - 1))
+        return await self.collection.find(
+            {"user_id": user_id, "day": {"$gte": since}},
+            {"_id": 0}
+        ).sort("day", -1).to_list(days)
+
+    async def top_users(self, day: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Heaviest users of a day by tokens"""
+        return await self.collection.find(
+            {"day": day or usage_day()},
+            {"_id": 0}
+        ).sort("tokens", -1).limit(limit).to_list(limit)
@@ -0,0 +1,46 @@
+"""
+Worker autonome des runs agentiques en arrière-plan.
+
+Réclame les runs de la collection `agent_jobs` par bail (voir job_service.py), sans servir
+l'API : on peut en lancer autant que voulu, sur autant de noeuds que voulu, à côté d'API
+démarrées avec AGENT_JOB_WORKERS=0.
+
+    python worker.py --workers 8
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+import server
+
+logger = logging.getLogger("worker")
+
+
+async def main(workers: int):
+    server.job_service.workers = workers
+    # Same LLM client, limits, caches and indexes as the API process
+    for handler in server.app.router.on_startup:
+        await handler()
+    logger.info(f"[Worker] {server.job_service.worker_id} draining agent_jobs with {workers} worker(s)")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopping.set)
+        except NotImplementedError:  # Windows
+            pass
+    await stopping.wait()
+
+    logger.info("[Worker] Stopping, handing held runs back to the queue")
+    for handler in server.app.router.on_shutdown:
+        await handler()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run agentic background jobs without serving the API")
+    parser.add_argument("--workers", type=int, default=server.settings.AGENT_JOB_WORKERS or 4,
+                        help="Runs executed concurrently by this process")
+    args = parser.parse_args()
+    asyncio.run(main(max(1, args.workers)))
@@ -205,6 +205,13 @@ const AdminPanel = () => {
     setConfig(prev => ({ ...prev, [field]: value }));
   };
 
+  const handleRoleModelChange = (role, value) => {
+    setConfig(prev => ({
+      ...prev,
+      agent_role_models: { ...(prev.agent_role_models || {}), [role]: value }
+    }));
+  };
+
   const saveConfig = async () => {
     setSaving(true);
     setMessage(null);
@@ -224,7 +231,8 @@ const AdminPanel = () => {
           resend_from_email: config.resend_from_email,
           subscription_price: parseFloat(config.subscription_price),
           free_trial_days: parseInt(config.free_trial_days),
-          max_failed_payments: parseInt(config.max_failed_payments)
+          max_failed_payments: parseInt(config.max_failed_payments),
+          agent_role_models: config.agent_role_models || null
         })
       });
 
@@ -804,6 +812,30 @@ const AdminPanel = () => {
               </div>
             </div>
 
+            {/* Agent Models */}
+            <div className="mb-8">
+              <h3 className="text-lg font-semibold text-white mb-4">🤖 Modèles des agents</h3>
+              <p className="text-sm text-gray-400 mb-4">
+                Laisser vide pour utiliser le modèle choisi par l'utilisateur.
+              </p>
+              <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
+                {['planner', 'coder', 'tester', 'reviewer'].map((role) => (
+                  <div key={role}>
+                    <label className="block text-sm font-medium text-gray-300 mb-2 capitalize">
+                      {role}
+                    </label>
+                    <input
+                      type="text"
+                      value={(config.agent_role_models || {})[role] || ''}
+                      onChange={(e) => handleRoleModelChange(role, e.target.value)}
+                      placeholder="openai/gpt-4o-mini"
+                      className="w-full px-4 py-2 bg-white/5 border border-white/10 rounded-lg text-white placeholder-gray-500 focus:ring-2 focus:ring-emerald-500 focus:border-transparent"
+                    />
+                  </div>
+                ))}
+              </div>
+            </div>
+
             {/* Save Button */}
             <div className="flex justify-end">
               <button
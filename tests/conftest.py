@@ -0,0 +1,113 @@
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# The backend is not an installed package: import its modules as server.py does
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+# Settings required to import server.py (no connection is opened at import time)
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("FRONTEND_URL", "http://localhost:3000")
+
+import fake_openrouter  # noqa: E402
+from agents.circuit_breaker import circuit_breakers  # noqa: E402
+from agents.llm_cache import llm_cache  # noqa: E402
+from agents.llm_client import llm_client  # noqa: E402
+from agents.rate_limiter import rate_limiter  # noqa: E402
+
+from .fake_mongo import FakeDatabase  # noqa: E402
+
+USER = {"user_id": "user-1", "email": "user@devora.local"}
+
+LIMITER_OPTIONS = ("max_concurrency", "rate_per_second", "burst", "max_retries", "backoff_base", "backoff_max")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db():
+    return FakeDatabase()
+
+
+@pytest.fixture
+async def fake_llm():
+    """Route every OpenRouter call to the in-process fake server
+
+    The response cache is disabled, breakers are forgotten and the limiter
+    backs off in milliseconds; every global is restored afterwards.
+    """
+    fake = fake_openrouter.fake
+    fake.default_profile = "instant"
+    fake.rules = []
+    fake.custom_profiles.clear()
+    fake.counters.clear()
+    fake.rng.seed(0)
+
+    cache_enabled = llm_cache.enabled
+    limiter = {option: getattr(rate_limiter, option) for option in LIMITER_OPTIONS}
+    breakers = (dict(circuit_breakers.options), circuit_breakers.fallback_model, dict(circuit_breakers.fallback_models))
+    llm_cache.configure(enabled=False)
+    rate_limiter.configure(rate_per_second=1000.0, burst=1000.0, backoff_base=0.001, backoff_max=0.01)
+    circuit_breakers.reset()
+
+    client = llm_client._client
+    llm_client._client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=fake_openrouter.app),
+        base_url="http://fake-openrouter/api/v1",
+        timeout=httpx.Timeout(30.0)
+    )
+    try:
+        yield fake
+    finally:
+        await llm_client._client.aclose()
+        llm_client._client = client
+        fake.rules = []
+        llm_cache.configure(enabled=cache_enabled)
+        rate_limiter.configure(**limiter)
+        circuit_breakers.options = breakers[0]
+        circuit_breakers.configure(fallback_model=breakers[1] or "", fallback_models=breakers[2])
+
+
+class QuotaConfig:
+    """Stand-in for ConfigService with fixed daily quotas (none by default)"""
+
+    def __init__(self, **quotas):
+        self.quotas = {"soft_tokens": 0, "hard_tokens": 0, "soft_run_seconds": 0, "hard_run_seconds": 0, **quotas}
+
+    async def get_agent_role_models(self):
+        return {}
+
+    async def get_usage_quotas(self):
+        return self.quotas
+
+
+@pytest.fixture
+def app(monkeypatch, db):
+    """The server module, its services backed by the fake database and USER logged in"""
+    import server
+    from auth import get_current_user
+    from checkpoint_service import CheckpointService
+    from job_service import JobService
+    from usage_service import UsageService
+
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "usage_service", UsageService(db))
+    monkeypatch.setattr(server, "checkpoint_service", CheckpointService(db))
+    monkeypatch.setattr(server, "job_service", JobService(db, server.run_agentic_job, workers=0))
+    monkeypatch.setattr(server, "trace_service", None)
+    monkeypatch.setattr(server, "config_service", QuotaConfig())
+    monkeypatch.setitem(server.app.dependency_overrides, get_current_user, lambda: USER)
+    return server
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app.app), base_url="http://devora") as client:
+        yield client
@@ -0,0 +1,243 @@
+"""In-memory stand-in for the motor collections used by the services
+
+Covers the subset of the query and update language the services rely on:
+equality (a missing field matches None), $lt/$lte/$gt/$gte/$ne/$in, $or,
+dotted paths, $set/$setOnInsert/$inc/$unset/$push ($each, $slice), upserts,
+unique indexes and sorted find_one_and_update.
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import copy
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+MISSING = object()
+
+
+def get_path(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+
+def set_path(document: Dict[str, Any], path: str, value: Any):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+def unset_path(document: Dict[str, Any], path: str):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(last, None)
+
+
+def matches_value(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for operator, operand in condition.items():
+            present = value is not MISSING and value is not None
+            if operator == "$ne" and (None if value is MISSING else value) == operand:
+                return False
+            if operator == "$in" and (None if value is MISSING else value) not in operand:
+                return False
+            if operator == "$lt" and not (present and value < operand):
+                return False
+            if operator == "$lte" and not (present and value <= operand):
+                return False
+            if operator == "$gt" and not (present and value > operand):
+                return False
+            if operator == "$gte" and not (present and value >= operand):
+                return False
+        return True
+    return (None if value is MISSING else value) == condition
+
+
+def matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(document, branch) for branch in condition):
+                return False
+        elif not matches_value(get_path(document, key), condition):
+            return False
+    return True
+
+
+def project(document: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    document = copy.deepcopy(document)
+    projection = dict(projection or {})
+    if not projection.pop("_id", 1):
+        document.pop("_id", None)
+    included = [path for path, flag in projection.items() if flag]
+    if included:
+        kept: Dict[str, Any] = {}
+        for path in included:
+            value = get_path(document, path)
+            if value is not MISSING:
+                set_path(kept, path, value)
+        if "_id" in document:
+            kept["_id"] = document["_id"]
+        return kept
+    for path in projection:
+        unset_path(document, path)
+    return document
+
+
+class FakeCursor:
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+
+    def sort(self, key, direction: int = 1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for path, order in reversed(keys):
+            self.documents.sort(key=lambda d: (get_path(d, path) is MISSING, get_path(d, path)), reverse=order < 0)
+        return self
+
+    def limit(self, count: int):
+        self.documents = self.documents[:count] if count else self.documents
+        return self
+
+    async def to_list(self, length: Optional[int] = None):
+        return self.documents[:length] if length else self.documents
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents: List[Dict[str, Any]] = []
+        self.unique: List[List[str]] = []
+        self._ids = 0
+
+    async def create_index(self, keys, unique: bool = False, **options):
+        fields = [keys] if isinstance(keys, str) else [field for field, _ in keys]
+        if unique:
+            self.unique.append(fields)
+
+    def _check_unique(self, document: Dict[str, Any], ignore: Optional[Dict[str, Any]] = None):
+        for fields in self.unique:
+            key = [get_path(document, field) for field in fields]
+            for other in self.documents:
+                if other is not ignore and other is not document and [get_path(other, f) for f in fields] == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key on {fields}")
+
+    def _insert(self, document: Dict[str, Any]):
+        self._check_unique(document)
+        self._ids += 1
+        document.setdefault("_id", self._ids)
+        self.documents.append(document)
+
+    async def insert_one(self, document: Dict[str, Any]):
+        document = copy.deepcopy(document)
+        self._insert(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    def _apply(self, document: Dict[str, Any], update: Dict[str, Any], inserting: bool = False):
+        updated = copy.deepcopy(document)
+        for path, value in update.get("$set", {}).items():
+            set_path(updated, path, copy.deepcopy(value))
+        if inserting:
+            for path, value in update.get("$setOnInsert", {}).items():
+                set_path(updated, path, copy.deepcopy(value))
+        for path, amount in update.get("$inc", {}).items():
+            current = get_path(updated, path)
+            set_path(updated, path, (0 if current is MISSING else current) + amount)
+        for path in update.get("$unset", {}):
+            unset_path(updated, path)
+        for path, value in update.get("$push", {}).items():
+            current = get_path(updated, path)
+            items = list(current) if current is not MISSING and current is not None else []
+            if isinstance(value, dict) and "$each" in value:
+                items.extend(copy.deepcopy(value["$each"]))
+                if "$slice" in value:
+                    items = items[value["$slice"]:] if value["$slice"] < 0 else items[:value["$slice"]]
+            else:
+                items.append(copy.deepcopy(value))
+            set_path(updated, path, items)
+        if not inserting:
+            self._check_unique(updated, ignore=document)
+        changed = updated != document
+        document.clear()
+        document.update(updated)
+        return changed
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+        document = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        self._apply(document, update, inserting=True)
+        self._insert(document)
+        return document
+
+    def _first(self, query: Dict[str, Any], sort=None) -> Optional[Dict[str, Any]]:
+        found = [document for document in self.documents if matches(document, query)]
+        if sort:
+            found = FakeCursor(found).sort(sort).documents
+        return found[0] if found else None
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        document = self._first(query)
+        if document is not None:
+            changed = self._apply(document, update)
+            return SimpleNamespace(matched_count=1, modified_count=int(changed), upserted_id=None)
+        if upsert:
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=self._upsert(query, update)["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any]):
+        found = [document for document in self.documents if matches(document, query)]
+        modified = sum(self._apply(document, update) for document in found)
+        return SimpleNamespace(matched_count=len(found), modified_count=modified)
+
+    async def find_one_and_update(
+        self,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        sort=None,
+        upsert: bool = False,
+        return_document=ReturnDocument.BEFORE
+    ):
+        document = self._first(query, sort)
+        if document is None:
+            if not upsert:
+                return None
+            document = self._upsert(query, update)
+            return project(document, projection) if return_document == ReturnDocument.AFTER else None
+        before = copy.deepcopy(document)
+        self._apply(document, update)
+        return project(document if return_document == ReturnDocument.AFTER else before, projection)
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None):
+        document = self._first(query)
+        return None if document is None else project(document, projection)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        return FakeCursor([project(d, projection) for d in self.documents if matches(d, query or {})])
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        return sum(1 for document in self.documents if matches(document, query))
+
+    async def delete_many(self, query: Dict[str, Any]):
+        kept = [document for document in self.documents if not matches(document, query)]
+        deleted = len(self.documents) - len(kept)
+        self.documents = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+
+class FakeDatabase:
+    """Collections are created on first access, like motor's"""
+
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, FakeCollection())
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        return getattr(self, name)
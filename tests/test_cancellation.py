@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from agents.cancellation import run_registry
+
+from .conftest import USER
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = {
+    "message": "Build a landing page",
+    "model": "fake/instant",
+    "api_key": "sk-test",
+    "use_cache": False
+}
+
+
+def active_runs():
+    return {run["run_id"] for run in run_registry.stats()["runs"]}
+
+
+def sse_events(body: str):
+    for block in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "event" in lines:
+            yield lines["event"], json.loads(lines["data"])
+
+
+async def test_stream_never_started_leaves_no_active_run(fake_llm, app):
+    response = await app.stream_agentic_generation(app.AgenticRequest(**REQUEST, run_id="run-gone"), USER)
+
+    # The client left before the body was iterated
+    assert "run-gone" not in active_runs()
+    await response.body_iterator.aclose()
+    assert "run-gone" not in active_runs()
+
+
+async def test_streamed_run_is_unregistered_once_finished(fake_llm, client):
+    response = await client.post("/api/generate/agentic/stream", json={**REQUEST, "run_id": "run-sse"})
+
+    events = list(sse_events(response.text))
+    result = next(data for event, data in events if event == "result")
+    assert result["success"], result
+    assert {data["name"] for event, data in events if event == "file"} == {"index.html", "script.js", "styles.css"}
+    assert "run-sse" not in active_runs()
+
+
+async def test_only_the_owner_can_cancel_a_run(app, client):
+    await app.checkpoint_service.start("run-other", REQUEST, user_id="user-2")
+    run_registry.register("run-other")
+    try:
+        response = await client.post("/api/agentic/runs/run-other/cancel")
+        assert response.status_code == 404
+        assert "run-other" in active_runs()
+    finally:
+        run_registry.unregister("run-other")
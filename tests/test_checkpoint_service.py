@@ -0,0 +1,63 @@
+import pytest
+
+from checkpoint_service import CheckpointService, RunIdConflict
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = {"message": "Build a landing page", "api_key": "sk-secret"}
+
+
+@pytest.fixture
+async def checkpoints(db):
+    service = CheckpointService(db)
+    await service.ensure_indexes()
+    return service
+
+
+async def finished_run(checkpoints, run_id="run-1", user_id="user-1"):
+    await checkpoints.start(run_id, REQUEST, user_id=user_id)
+    await checkpoints.save(run_id, "plan", {"plan": {"steps": []}, "iteration": 0})
+    await checkpoints.save(run_id, "code", {"iteration": 1, "files": [{"name": "index.html"}], "changed_files": ["index.html"]})
+    await checkpoints.finish(run_id, "failed", "boom")
+
+
+async def test_start_never_stores_the_api_key(checkpoints):
+    await checkpoints.start("run-1", REQUEST, user_id="user-1")
+
+    checkpoint = await checkpoints.load("run-1")
+    assert checkpoint["status"] == "running" and checkpoint["phase"] is None
+    assert "api_key" not in checkpoint["request"]
+
+
+async def test_reused_run_id_starts_from_scratch(checkpoints):
+    await finished_run(checkpoints)
+    created_at = (await checkpoints.load("run-1"))["created_at"]
+
+    await checkpoints.start("run-1", {"message": "Another page"}, user_id="user-1")
+
+    checkpoint = await checkpoints.load("run-1")
+    assert checkpoint["phase"] is None and checkpoint["error"] is None
+    assert checkpoint["request"] == {"message": "Another page"}
+    assert not {"plan", "iteration", "files", "changed_files"} & checkpoint.keys()
+    assert (await checkpoints.summary("run-1")).get("history") is None
+    assert checkpoint["created_at"] == created_at
+
+
+async def test_run_id_of_another_user_or_a_running_run_is_refused(checkpoints):
+    await finished_run(checkpoints)
+    with pytest.raises(RunIdConflict):
+        await checkpoints.start("run-1", REQUEST, user_id="user-2")
+
+    await checkpoints.start("run-2", REQUEST, user_id="user-1")
+    with pytest.raises(RunIdConflict):
+        await checkpoints.start("run-2", REQUEST, user_id="user-1")
+    # The refused start left the other user's checkpoint untouched
+    assert (await checkpoints.load("run-1"))["phase"] == "code"
+
+
+async def test_resume_is_claimed_once(checkpoints):
+    await finished_run(checkpoints)
+
+    assert await checkpoints.claim_resume("run-1", "user-1", stale_seconds=3600)
+    assert not await checkpoints.claim_resume("run-1", "user-1", stale_seconds=3600)
+    assert not await checkpoints.claim_resume("run-1", "user-2", stale_seconds=0)
@@ -0,0 +1,86 @@
+import anyio
+import pytest
+
+from agents.base_agent import BaseAgent
+from agents.circuit_breaker import CircuitOpenError, circuit_breakers
+from agents.llm_client import LLMError, LLMHTTPError
+from fake_openrouter import ScriptRule
+
+pytestmark = pytest.mark.anyio
+
+PRIMARY = "fake/broken"
+FALLBACK = "fake/instant"
+
+
+class ChatAgent(BaseAgent):
+    async def execute(self, task):
+        return {"success": True}
+
+
+def make_agent(model: str = PRIMARY) -> ChatAgent:
+    agent = ChatAgent("Chat", "sk-test", model)
+    agent.use_cache = False
+    return agent
+
+
+@pytest.fixture
+def broken_primary(fake_llm):
+    fake_llm.rules = [ScriptRule({"model": PRIMARY, "status": 503, "body": "Provider down", "profile": "instant"})]
+    circuit_breakers.configure(min_calls=2, error_rate_threshold=0.5, open_seconds=60, fallback_model="")
+    return fake_llm
+
+
+async def test_breaker_opens_on_upstream_errors(broken_primary):
+    # The limiter's retries trip the breaker, which then rejects the last retry
+    with pytest.raises(LLMError):
+        await make_agent().call_llm([{"role": "user", "content": "hello"}])
+
+    breaker = circuit_breakers.get(PRIMARY)
+    assert breaker.state == "open"
+    # Once open, calls are rejected without reaching OpenRouter
+    requests = broken_primary.rules[0].hits
+    with pytest.raises(CircuitOpenError):
+        await make_agent().call_llm([{"role": "user", "content": "hello"}])
+    assert broken_primary.rules[0].hits == requests
+
+
+async def test_open_breaker_falls_back_to_the_configured_model(broken_primary):
+    circuit_breakers.configure(fallback_model=FALLBACK)
+
+    content = await make_agent().call_llm([{"role": "user", "content": "hello"}])
+
+    assert "filename: index.html" in content
+    assert circuit_breakers.get(PRIMARY).state == "open"
+    assert circuit_breakers.get(FALLBACK).state == "closed"
+
+    # Later calls skip the broken model altogether
+    hits = broken_primary.rules[0].hits
+    assert await make_agent().call_llm([{"role": "user", "content": "again"}])
+    assert broken_primary.rules[0].hits == hits
+
+
+async def test_client_errors_do_not_open_the_breaker(fake_llm):
+    fake_llm.rules = [ScriptRule({"model": PRIMARY, "status": 401, "body": "Bad key", "profile": "instant"})]
+    circuit_breakers.configure(min_calls=2, fallback_model=FALLBACK)
+
+    for _ in range(3):
+        with pytest.raises(LLMHTTPError):
+            await make_agent().call_llm([{"role": "user", "content": "hello"}])
+
+    assert circuit_breakers.get(PRIMARY).state == "closed"
+
+
+async def test_half_open_breaker_without_free_probes_falls_back(broken_primary):
+    circuit_breakers.configure(open_seconds=0.01, half_open_max_calls=1, fallback_model=FALLBACK)
+    breaker = circuit_breakers.get(PRIMARY)
+    for _ in range(2):
+        breaker.record_failure(LLMHTTPError(503, "Provider down"))
+    await anyio.sleep(0.02)
+    # Another request holds the only probe
+    breaker.acquire()
+    assert breaker.state == "half_open" and not breaker.is_open
+
+    content = await make_agent().call_llm([{"role": "user", "content": "hello"}])
+
+    assert "filename: index.html" in content
+    assert broken_primary.rules[0].hits == 0
@@ -0,0 +1,91 @@
+import pytest
+
+from agents.code_parser import CodeBlockParser, parse_code_blocks
+
+RESPONSE = """Here is the project.
+
+```html
+<!-- filename: index.html -->
+<h1>Menu</h1>
+```
+
+```css
+/* styles.css */
+body { margin: 0; }
+```
+
+```markdown README.md
+# Coffee
+
+```bash
+npm start
+```
+
+Done.
+```
+
+```javascript
+// filename: script.js
+console.log("ready");
+```
+"""
+
+EXPECTED = [
+    {"name": "index.html", "content": "<h1>Menu</h1>", "language": "html"},
+    {"name": "styles.css", "content": "body { margin: 0; }", "language": "css"},
+    {"name": "README.md", "content": "# Coffee\n\n```bash\nnpm start\n```\n\nDone.", "language": "markdown"},
+    {"name": "script.js", "content": 'console.log("ready");', "language": "javascript"},
+]
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, 64, len(RESPONSE)])
+def test_chunk_boundaries_do_not_change_the_files(size):
+    parser = CodeBlockParser()
+    files = []
+    for chunk in chunked(RESPONSE, size):
+        files.extend(parser.feed(chunk))
+    files.extend(parser.close())
+
+    assert files == EXPECTED
+    assert parser.files == EXPECTED
+
+
+def test_files_are_returned_as_their_fence_closes():
+    parser = CodeBlockParser()
+
+    assert parser.feed("```html\n// filename: a.html\n<p>a</p>\n") == []
+    assert parser.feed("``") == []
+    assert parser.feed("`\n```css\n") == [{"name": "a.html", "content": "<p>a</p>", "language": "html"}]
+    assert parser.feed("/* b.css */\np {}\n```") == []
+    assert parser.close() == [{"name": "b.css", "content": "p {}", "language": "css"}]
+
+
+def test_unterminated_block_is_flushed_on_close():
+    parser = CodeBlockParser()
+    parser.feed("```js\n// filename: app.js\nlet a = 1;\nlet b")
+
+    assert parser.close() == [{"name": "app.js", "content": "let a = 1;\nlet b", "language": "javascript"}]
+
+
+@pytest.mark.parametrize("response, expected", [
+    ("```html index.html\n<p/>\n```", [("index.html", "html")]),
+    ("```js:app.js\nx\n```", [("app.js", "javascript")]),
+    ('```css title="theme.css"\nx\n```', [("theme.css", "css")]),
+    ("~~~python\n# file: main.py\nx\n~~~", [("main.py", "python")]),
+    # Untagged blocks without a filename are prose, not files
+    ("```\nnpm install\n```", []),
+    # Tagged blocks without a filename get a fallback name
+    ("```js\nx\n```", [("file.js", "javascript")]),
+])
+def test_filename_and_language_detection(response, expected):
+    assert [(f["name"], f["language"]) for f in parse_code_blocks(response)] == expected
+
+
+def test_unnamed_blocks_can_be_skipped():
+    response = "```js\nx\n```\n```css\n/* a.css */\ny\n```"
+
+    assert [f["name"] for f in parse_code_blocks(response, fallback_names=False)] == ["a.css"]
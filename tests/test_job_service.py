@@ -0,0 +1,146 @@
+from datetime import datetime, timezone, timedelta
+import asyncio
+
+import pytest
+
+from agents.orchestrator import OrchestratorAgent
+from job_service import JobService
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = {"message": "Build a landing page", "api_key": "sk-secret", "model": "fake/instant"}
+
+
+async def orchestrator_runner(job, progress_callback):
+    request = job["request"]
+    orchestrator = OrchestratorAgent(request["api_key"], model=request["model"], use_cache=False)
+    orchestrator.set_progress_callback(progress_callback)
+    return await orchestrator.execute(request["message"])
+
+
+def make_service(db, runner=orchestrator_runner, **options) -> JobService:
+    return JobService(db, runner, **{"workers": 1, "poll_seconds": 0.01, **options})
+
+
+async def expire_lease(db, job_id):
+    await db.agent_jobs.update_one(
+        {"id": job_id},
+        {"$set": {"lease_expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+    )
+
+
+async def wait_for(predicate, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+async def test_claimed_run_completes_and_drops_the_api_key(fake_llm, db):
+    service = make_service(db)
+    job_id = (await service.submit(REQUEST, user_id="user-1"))["job_id"]
+
+    job = await service._claim()
+    assert job["id"] == job_id and job["attempts"] == 1 and job["lease_owner"] == service.worker_id
+    # The lease is still valid: nobody else gets the run
+    assert await make_service(db)._claim() is None
+
+    await service._run(job)
+
+    stored = db.agent_jobs.documents[0]
+    assert stored["status"] == "completed"
+    assert stored["result"]["success"]
+    assert "api_key" not in stored["request"]
+    assert stored["expires_at"] > datetime.now(timezone.utc)
+    assert stored["last_event"]["event"] == "complete"
+    assert (await service.get(job_id)).keys().isdisjoint({"result", "expires_at", "_id"})
+    assert service.stats()["completed"] == 1
+
+
+async def test_expired_lease_is_reclaimed_and_stale_result_discarded(db):
+    release = asyncio.Event()
+
+    async def runner(job, progress_callback):
+        await release.wait()
+        return {"success": True, "files": []}
+
+    first, second = make_service(db, runner), make_service(db, runner)
+    job_id = (await first.submit(REQUEST))["job_id"]
+    job = await first._claim()
+    stalled = asyncio.create_task(first._run(job))
+
+    await expire_lease(db, job_id)
+    reclaimed = await second._claim()
+    assert reclaimed["attempts"] == 2 and reclaimed["lease_id"] != job["lease_id"]
+
+    release.set()
+    await stalled
+    stored = db.agent_jobs.documents[0]
+    # Only the current lease holder may complete the run
+    assert stored["status"] == "running" and stored["lease_id"] == reclaimed["lease_id"]
+    assert first.stats()["leases_lost"] == 1
+    assert first.stats()["completed"] == 0
+
+
+async def test_lost_lease_stops_the_local_run_and_counts_once(db):
+    async def runner(job, progress_callback):
+        await asyncio.sleep(30)
+        return {"success": True}
+
+    service = make_service(db, runner, lease_seconds=0.15)
+    await service.submit(REQUEST)
+    job = await service._claim()
+    run = asyncio.create_task(service._run(job))
+
+    await db.agent_jobs.update_one({"id": job["id"]}, {"$set": {"lease_id": "stolen"}})
+    await asyncio.wait_for(run, timeout=5)
+
+    assert service.stats()["leases_lost"] == 1
+    assert db.agent_jobs.documents[0]["lease_id"] == "stolen"
+
+
+async def test_reaper_fails_runs_out_of_attempts(db):
+    service = make_service(db, lease_seconds=0.05, max_attempts=2)
+    job_id = (await service.submit(REQUEST))["job_id"]
+    await db.agent_jobs.update_one({"id": job_id}, {"$set": {"status": "running", "attempts": 2}})
+    await expire_lease(db, job_id)
+    assert await service._claim() is None
+
+    reaper = asyncio.create_task(service._reaper())
+    try:
+        await wait_for(lambda: db.agent_jobs.count_documents({"status": "failed"}))
+    finally:
+        reaper.cancel()
+        await asyncio.gather(reaper, return_exceptions=True)
+
+    stored = db.agent_jobs.documents[0]
+    assert "after 2 attempt(s)" in stored["error"]
+    assert "api_key" not in stored["request"]
+
+
+async def test_stopped_worker_requeues_without_spending_an_attempt(db):
+    started = asyncio.Event()
+
+    async def runner(job, progress_callback):
+        started.set()
+        await asyncio.sleep(30)
+
+    service = make_service(db, runner)
+    await service.start()
+    job_id = (await service.submit(REQUEST))["job_id"]
+    await asyncio.wait_for(started.wait(), timeout=5)
+    await service.stop()
+
+    stored = await service.get(job_id)
+    assert stored["status"] == "queued"
+    assert stored["attempts"] == 0
+    assert stored["requeue_reason"] == "worker stopped"
+
+
+async def test_cancel_queued_run(db):
+    service = make_service(db)
+    job_id = (await service.submit(REQUEST))["job_id"]
+
+    assert await service.cancel(job_id) == "cancelled"
+    assert await service._claim() is None
+    assert await service.cancel("missing") is None
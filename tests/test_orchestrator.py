@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from agents.orchestrator import OrchestratorAgent
+from checkpoint_service import CheckpointService
+from fake_openrouter import ScriptRule
+
+pytestmark = pytest.mark.anyio
+
+MODEL = "fake/instant"
+
+
+def make_orchestrator(**options) -> OrchestratorAgent:
+    return OrchestratorAgent("sk-test", model=MODEL, use_cache=False, **options)
+
+
+async def test_run_codes_every_plan_step(fake_llm):
+    orchestrator = make_orchestrator()
+    events = []
+
+    async def progress(event, data):
+        events.append(event)
+
+    orchestrator.set_progress_callback(progress)
+    result = await orchestrator.execute("Build a landing page")
+
+    assert result["success"], result
+    assert sorted(f["name"] for f in result["files"]) == ["index.html", "script.js", "styles.css"]
+    assert result["steps_completed"] == result["steps_total"] == 2
+    assert result["trace"]["llm_calls"] >= 4
+    assert fake_llm.counters["requests.planner"] == 1
+    assert fake_llm.counters["requests.coder"] == 2
+    assert "code_complete" in events
+
+
+async def test_failing_step_is_retried_then_fails_the_run(fake_llm, db):
+    fake_llm.rules = [ScriptRule(dict(role="coder", contains="Only output these files: script.js", status=400))]
+    checkpoints = CheckpointService(db)
+    await checkpoints.ensure_indexes()
+    orchestrator = make_orchestrator(run_id="run-1", checkpoint_store=checkpoints)
+    await checkpoints.start("run-1", {"message": "Build a landing page"}, user_id="user-1")
+
+    result = await orchestrator.execute("Build a landing page")
+
+    assert not result["success"]
+    assert "failed" in result["error"]
+    assert (result["steps_completed"], result["steps_total"]) == (1, 2)
+    # One try in the DAG and one retry
+    assert fake_llm.rules[0].hits == 2
+    assert (await checkpoints.summary("run-1"))["status"] == "failed"
+
+
+async def test_streamed_files_keep_content_out_of_progress_events(fake_llm):
+    orchestrator = make_orchestrator()
+    streamed, ready = [], []
+
+    async def on_file(file, step=None):
+        streamed.append(file)
+
+    async def progress(event, data):
+        if event == "file_ready":
+            ready.append(data)
+
+    orchestrator.set_file_callback(on_file)
+    orchestrator.set_progress_callback(progress)
+    result = await orchestrator.execute("Build a landing page")
+
+    assert result["success"], result
+    assert sorted(f["name"] for f in streamed) == ["index.html", "script.js", "styles.css"]
+    assert sorted(event["file"] for event in ready) == ["index.html", "script.js", "styles.css"]
+    assert all("content" not in event and event["size"] > 0 for event in ready)
+
+
+async def test_unavailable_fix_instructions_keep_the_tested_files(fake_llm):
+    critical = {"file": "script.js", "severity": "critical", "message": "Broken handler", "suggestion": "Fix it"}
+    fake_llm.rules = [
+        ScriptRule(dict(role="tester", content=json.dumps({"overall_quality": "poor", "issues": [critical], "suggestions": []}))),
+        ScriptRule(dict(role="reviewer", status=429, body="Rate limited", retry_after=0))
+    ]
+    orchestrator = make_orchestrator()
+
+    result = await orchestrator.execute("Build a landing page")
+
+    assert result["success"], result
+    assert sorted(f["name"] for f in result["files"]) == ["index.html", "script.js", "styles.css"]
+    assert result["iterations"] == 1
+    assert fake_llm.rules[1].hits >= 1
+
+
+async def test_step_without_files_is_retried(fake_llm):
+    fake_llm.rules = [ScriptRule(dict(role="coder", contains="Only output these files: script.js", content="Sure, here you go!"))]
+
+    result = await make_orchestrator().execute("Build a landing page")
+
+    assert not result["success"]
+    assert "no files generated" in result["error"]
+    assert (result["steps_completed"], result["steps_total"]) == (1, 2)
+    assert fake_llm.rules[0].hits == 2
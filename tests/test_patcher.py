@@ -0,0 +1,171 @@
+import time
+
+import pytest
+
+from agents.patcher import Edit, PatchError, apply_edit, apply_edits, is_edit_block, parse_edits
+
+SOURCE = """<main>
+  <section class="hero">
+    <h1>Coffee Shop</h1>
+    <p>Fresh roasted every morning</p>
+  </section>
+  <section class="menu">
+    <ul>
+      <li>Espresso</li>
+      <li>Latte</li>
+    </ul>
+  </section>
+</main>
+"""
+
+
+@pytest.mark.parametrize("search, replace, expected_line", [
+    # Exact match
+    (
+        ["    <h1>Coffee Shop</h1>"],
+        ["    <h1>Corner Coffee</h1>"],
+        "    <h1>Corner Coffee</h1>"
+    ),
+    # Trailing whitespace drift
+    (
+        ["    <h1>Coffee Shop</h1>   "],
+        ["    <h1>Corner Coffee</h1>"],
+        "    <h1>Corner Coffee</h1>"
+    ),
+    # Indentation drift: the replacement is re-indented like the file
+    (
+        ["<ul>", "  <li>Espresso</li>"],
+        ["<ul>", "  <li>Ristretto</li>"],
+        "      <li>Ristretto</li>"
+    ),
+    # Blank lines around the SEARCH part are ignored
+    (
+        ["", "      <li>Latte</li>", ""],
+        ["", "      <li>Flat white</li>", ""],
+        "      <li>Flat white</li>"
+    ),
+    # Fuzzy: a small typo in a block of several lines
+    (
+        ["  <section class=\"hero\">", "    <h1>Cofee Shop</h1>", "    <p>Fresh roasted every morning</p>"],
+        ["  <section class=\"hero\">", "    <h1>Coffee Shop</h1>", "    <p>Roasted on site</p>"],
+        "    <p>Roasted on site</p>"
+    ),
+])
+def test_apply_edit_locates_block(search, replace, expected_line):
+    result = apply_edit(SOURCE, Edit(search, replace))
+
+    assert expected_line in result.splitlines()
+    assert result.endswith("\n")
+    assert result.count("<section") == 2
+
+
+@pytest.mark.parametrize("search", [
+    ["    <h1>Tea House</h1>"],
+    # Too short to be matched fuzzily
+    ["    <h1>Cofee Shop</h1>"],
+    ["<footer>", "  <p>Contact</p>", "</footer>"],
+])
+def test_apply_edit_rejects_unknown_block(search):
+    with pytest.raises(PatchError):
+        apply_edit(SOURCE, Edit(search, ["x"]))
+
+
+def test_apply_edit_prefers_occurrence_closest_to_hint():
+    content = "a\nx\nb\nx\nc"
+
+    assert apply_edit(content, Edit(["x"], ["y"], hint=3)) == "a\nx\nb\ny\nc"
+    assert apply_edit(content, Edit(["x"], ["y"])) == "a\ny\nb\nx\nc"
+
+
+def test_fuzzy_search_is_bounded_on_large_files():
+    lines = [f"  const value{i} = compute({i}, 'seed-{i * 7919 % 1000}');" for i in range(4000)]
+    drifted = [line.replace("compute", "computeX") + " // changed" for line in lines[1000:1020]]
+
+    started = time.monotonic()
+    result = apply_edit("\n".join(lines), Edit(drifted, ["x"])).splitlines()
+
+    # Used to take minutes: one quadratic ratio() per window
+    assert time.monotonic() - started < 10
+    assert result[1000] == "x"
+    assert result[1001] == lines[1020]
+
+
+UNIFIED_DIFF = """--- a/script.js
++++ b/script.js
+@@ -1,4 +1,4 @@
+ function greet(name) {
+-  return "Hello " + name;
++  return `Hello ${name}!`;
+ }
+ 
+@@ -6,2 +6,3 @@
+ greet("world");
++greet("coffee");
+"""
+
+SCRIPT = """function greet(name) {
+  return "Hello " + name;
+}
+
+// usage
+greet("world");
+"""
+
+
+def test_unified_diff_applies_every_hunk():
+    edits = parse_edits(UNIFIED_DIFF)
+
+    assert list(edits) == ["script.js"]
+    assert [edit.hint for edit in edits["script.js"]] == [0, 5]
+    updated, failed = apply_edits([{"name": "script.js", "content": SCRIPT}], edits)
+    assert failed == []
+    assert updated["script.js"] == """function greet(name) {
+  return `Hello ${name}!`;
+}
+
+// usage
+greet("world");
+greet("coffee");
+"""
+
+
+@pytest.mark.parametrize("response, expected", [
+    (
+        "// filename: index.html\n<<<<<<< SEARCH\n<h1>A</h1>\n=======\n<h1>B</h1>\n>>>>>>> REPLACE\n",
+        {"index.html": [(["<h1>A</h1>"], ["<h1>B</h1>"])]}
+    ),
+    (
+        "<!-- file: a.html -->\n<<<<<<< SEARCH\n1\n=======\n2\n>>>>>>> REPLACE\n"
+        "<<<<<<< SEARCH\n3\n=======\n4\n>>>>>>> REPLACE\n",
+        {"a.html": [(["1"], ["2"]), (["3"], ["4"])]}
+    ),
+    # Blocks without a filename are dropped
+    ("<<<<<<< SEARCH\n1\n=======\n2\n>>>>>>> REPLACE\n", {}),
+])
+def test_parse_search_replace_blocks(response, expected):
+    edits = parse_edits(response)
+
+    assert {name: [(e.search, e.replace) for e in blocks] for name, blocks in edits.items()} == expected
+
+
+def test_apply_edits_is_all_or_nothing_per_file():
+    files = [{"name": "a.txt", "content": "one\ntwo\n"}, {"name": "b.txt", "content": "three\n"}]
+    edits = {
+        "a.txt": [Edit(["one"], ["1"]), Edit(["missing"], ["x"])],
+        "b.txt": [Edit(["three"], ["3"])],
+        "new.txt": [Edit([], ["created"])]
+    }
+
+    updated, failed = apply_edits(files, edits)
+
+    assert failed == ["a.txt"]
+    assert updated == {"b.txt": "3\n", "new.txt": "created"}
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("<<<<<<< SEARCH\na\n=======\nb\n>>>>>>> REPLACE", True),
+    (UNIFIED_DIFF, True),
+    ("<h1>Plain file</h1>\n", False),
+])
+def test_is_edit_block(content, expected):
+    assert is_edit_block(content) is expected
@@ -0,0 +1,79 @@
+import pytest
+
+from usage_service import UsageService
+
+from .conftest import USER, QuotaConfig
+
+pytestmark = pytest.mark.anyio
+
+REQUEST = {
+    "message": "Build a landing page",
+    "model": "fake/instant",
+    "api_key": "sk-test",
+    "use_cache": False
+}
+
+
+@pytest.fixture(autouse=True)
+def quotas(app, monkeypatch):
+    monkeypatch.setattr(app, "config_service", QuotaConfig(soft_tokens=1000, hard_tokens=5000))
+
+
+async def charge(usage: UsageService, tokens: int):
+    await usage.record(USER["user_id"], {"prompt_tokens": tokens, "llm_calls": 1}, 1.0)
+
+
+async def test_quota_state_follows_the_ledger(db):
+    usage = UsageService(db)
+    quotas = {"soft_tokens": 100, "hard_tokens": 200, "soft_run_seconds": 0, "hard_run_seconds": 0}
+
+    assert (await usage.check(USER["user_id"], quotas))["state"] == "ok"
+    await charge(usage, 120)
+    assert (await usage.check(USER["user_id"], quotas))["state"] == "soft"
+    await charge(usage, 120)
+    quota = await usage.check(USER["user_id"], quotas)
+    assert quota["state"] == "hard"
+    assert quota["usage"]["tokens"] == 240 and quota["usage"]["requests"] == 2
+    assert 0 < quota["retry_after"] <= 86400
+
+
+async def test_run_is_charged_to_the_ledger(fake_llm, app, client):
+    response = await client.post("/api/generate/agentic", json=REQUEST)
+    await app.usage_service.flush()
+
+    assert response.status_code == 200 and response.json()["success"]
+    usage = await app.usage_service.today(USER["user_id"])
+    assert usage["requests"] == 1
+    assert usage["tokens"] > 0 and usage["llm_calls"] >= 4
+
+
+async def test_soft_quota_throttles_the_run(fake_llm, app, client):
+    await charge(app.usage_service, 2000)
+
+    response = await client.post("/api/generate/agentic", json=REQUEST)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"]
+    assert "throttled" in [event["event"] for event in body["progress_events"]]
+
+
+async def test_hard_quota_refuses_the_run_before_any_llm_call(fake_llm, app, client):
+    await charge(app.usage_service, 6000)
+
+    response = await client.post("/api/generate/agentic", json=REQUEST)
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert not fake_llm.counters
+
+
+async def test_ledger_outage_fails_open(fake_llm, app, client, monkeypatch):
+    async def unavailable(user_id, quotas):
+        raise ConnectionError("ledger down")
+
+    monkeypatch.setattr(app.usage_service, "check", unavailable)
+
+    response = await client.post("/api/generate/agentic", json=REQUEST)
+
+    assert response.status_code == 200 and response.json()["success"]
@@ -0,0 +1,123 @@
+import pytest
+
+from agents import static_analysis
+from agents.static_analysis import analyze_files, analyze_files_async
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(static_analysis, "_cache", static_analysis.OrderedDict())
+    monkeypatch.setattr(static_analysis, "cache_stats", {"hits": 0, "misses": 0})
+
+
+def js(name: str, content: str):
+    return {"name": name, "content": content, "language": "javascript"}
+
+
+async def test_each_miss_is_counted_once():
+    files = [js("a.js", "const a = 1;"), js("b.js", "const b = {;")]
+
+    report = await analyze_files_async(files)
+
+    assert static_analysis.cache_stats == {"hits": 0, "misses": 2}
+    assert [issue["file"] for issue in report["issues"]] == ["b.js"]
+
+
+async def test_unchanged_content_is_served_from_the_cache():
+    files = [js("a.js", "const a = {;"), js("copy.js", "const a = {;")]
+
+    first = await analyze_files_async(files)
+    second = await analyze_files_async(files)
+
+    assert first == second
+    assert [issue["file"] for issue in second["issues"]] == ["a.js", "copy.js"]
+    # Duplicate content is analysed once, then hit once per call
+    assert static_analysis.cache_stats == {"hits": 1, "misses": 1}
+
+
+async def test_report_survives_eviction(monkeypatch):
+    monkeypatch.setattr(static_analysis, "CACHE_MAX_ENTRIES", 1)
+    files = [js("broken.js", "function f() {"), js("ok.js", "const ok = 1;")]
+
+    report = await analyze_files_async(files)
+
+    # broken.js was evicted by ok.js before the report was built
+    assert list(static_analysis._cache) == [static_analysis.content_key("javascript", "const ok = 1;")]
+    assert [issue["file"] for issue in report["issues"]] == ["broken.js"]
+    assert analyze_files(files) == report
+
+
+@pytest.mark.parametrize("source", [
+    pytest.param('const open = "{"; const close = \'}\';', id="braces-in-strings"),
+    pytest.param("const re = /[{(]+/g; const back = /\\}/;", id="braces-in-regex"),
+    pytest.param("// closing } here\n/* and { there ( */\nlet x = 1;", id="braces-in-comments"),
+    pytest.param("const t = `a { ${obj.map(o => `${o}}`).join(')')} b`;", id="nested-template-literals"),
+    pytest.param("const half = total / 2; const ratio = (a) / (b) / 4;", id="division-not-regex"),
+    pytest.param("if (ok) return /}/.test(s);\nfunction f() { return x; }", id="regex-after-keyword"),
+    pytest.param('const url = "http://example.com/{id}"; // trailing }', id="slashes-in-strings"),
+    pytest.param("const s = 'it\\'s {';", id="escaped-quote"),
+])
+def test_javascript_false_positives(source):
+    assert static_analysis.check_javascript(source) == []
+
+
+@pytest.mark.parametrize("source, message", [
+    ("function f() {\n  return 1;\n", "Unclosed '{'"),
+    ("const a = [1, 2;\n", "Unclosed '['"),
+    ("const a = 1;\n}", "Unexpected closing '}'"),
+    ("const s = 'open;\n", "Unterminated string literal"),
+    ("const t = `never closed;\n", "Unterminated template literal"),
+    ("/* never closed", "Unterminated block comment"),
+])
+def test_javascript_errors(source, message):
+    issues = static_analysis.check_javascript(source)
+    assert issues and issues[0]["severity"] == "critical"
+    assert issues[0]["message"].startswith(message)
+
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="utf-8">
+  <link rel="stylesheet" href="styles.css">
+  <title>Page</title>
+</head>
+<body>
+  <ul><li>One<li>Two</ul>
+  <p>First<p>Second
+  <img src="a.png" alt=""><br>
+  <script>const html = "</div>"; if (a < b && c > d) {}</script>
+</body>
+</html>"""
+
+
+def test_html_structure_false_positives():
+    assert static_analysis.check_html(PAGE) == []
+
+
+def test_html_structure_errors():
+    messages = [issue["message"] for issue in static_analysis.check_html("<div><span>text</div>")]
+    assert "Missing <html> tag" in messages
+    assert any("span" in message for message in messages)
+
+
+@pytest.mark.parametrize("source", [
+    pytest.param('a::after { content: "}"; }', id="brace-in-string"),
+    pytest.param("/* } */ body { margin: 0; }", id="brace-in-comment"),
+    pytest.param("@media (max-width: 600px) { .a { color: red; } }", id="nested-at-rule"),
+    pytest.param(".a { background: url(data:image/png;base64,AAAA); }", id="semicolon-in-url"),
+])
+def test_css_false_positives(source):
+    assert static_analysis.check_css(source) == []
+
+
+@pytest.mark.parametrize("source, message", [
+    (".a { color: red;", "Unclosed '{'"),
+    (".a { color: red; } }", "Unexpected closing '}'"),
+    ("/* never closed", "Unterminated comment"),
+])
+def test_css_errors(source, message):
+    issues = static_analysis.check_css(source)
+    assert issues and issues[0]["message"].startswith(message)